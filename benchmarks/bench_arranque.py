@@ -0,0 +1,146 @@
+"""Mide el arranque de la aplicación: importación, create_app() y primera petición.
+
+Cada repetición se hace en un intérprete nuevo (como el arranque de un
+worker): se mide cuánto tarda `import app`, `create_app()` y la primera
+petición con el cliente de pruebas, y se comprueba que crear la aplicación
+no ha abierto la base de datos. Después se ejecuta una vez con
+`python -X importtime` y se muestran los módulos que más tardan en
+importarse, por tiempo propio y agrupados por paquete.
+
+Uso:
+    python benchmarks/bench_arranque.py [--repeticiones 5] [--top 15] [--salida arranque.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+
+DIR_SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+# Se ejecuta en el intérprete hijo; imprime las medidas en JSON
+HIJO = """
+import json, os, sys, time
+inicio = time.perf_counter()
+import app
+importado = time.perf_counter()
+aplicacion = app.create_app()
+creada = time.perf_counter()
+bd_abierta = os.path.exists(os.environ["RUTA_BD"])
+aplicacion.test_client().get("/login")
+respondida = time.perf_counter()
+print(json.dumps({
+    "importar_ms": (importado - inicio) * 1000,
+    "create_app_ms": (creada - importado) * 1000,
+    "primera_peticion_ms": (respondida - creada) * 1000,
+    "total_ms": (respondida - inicio) * 1000,
+    "bd_abierta": bd_abierta,
+    "modulos": len(sys.modules),
+}))
+"""
+
+
+def _entorno(directorio):
+    ruta_bd = os.path.join(directorio, "arranque.db")
+    return {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{ruta_bd}",
+        "RUTA_BD": ruta_bd,
+        "COLA_TRABAJADORES": "0",
+    }
+
+
+def medir_arranque(repeticiones):
+    medidas = []
+    for _ in range(repeticiones):
+        with tempfile.TemporaryDirectory(prefix="bench-arranque-") as directorio:
+            salida = subprocess.run(
+                [sys.executable, "-c", HIJO],
+                cwd=DIR_SRC,
+                env=_entorno(directorio),
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+        medidas.append(json.loads(salida.stdout.strip().splitlines()[-1]))
+
+    resumen = {
+        clave: statistics.median(m[clave] for m in medidas)
+        for clave in ("importar_ms", "create_app_ms", "primera_peticion_ms", "total_ms")
+    }
+    resumen["bd_abierta"] = any(m["bd_abierta"] for m in medidas)
+    resumen["modulos"] = medidas[-1]["modulos"]
+    return resumen
+
+
+def medir_importaciones():
+    """Tiempos de `-X importtime` de una creación de la app: (módulo, propio µs, acumulado µs)."""
+
+    with tempfile.TemporaryDirectory(prefix="bench-arranque-") as directorio:
+        salida = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import app; app.create_app()"],
+            cwd=DIR_SRC,
+            env=_entorno(directorio),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    modulos = []
+    for linea in salida.stderr.splitlines():
+        if not linea.startswith("import time:") or "self [us]" in linea:
+            continue
+        propio, acumulado, nombre = linea[len("import time:") :].split("|")
+        modulos.append((nombre.strip(), int(propio), int(acumulado)))
+    return modulos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Módulos a mostrar.")
+    parser.add_argument("--salida", help="Fichero JSON donde guardar los resultados.")
+    args = parser.parse_args()
+
+    arranque = medir_arranque(args.repeticiones)
+    print(f"Mediana de {args.repeticiones} arranques en intérpretes nuevos:")
+    for clave in ("importar_ms", "create_app_ms", "primera_peticion_ms", "total_ms"):
+        print(f"  {clave:<22}{arranque[clave]:>9.1f}")
+    print(f"  {'módulos cargados':<22}{arranque['modulos']:>9}")
+    print(f"  {'BD abierta al crear':<22}{'sí' if arranque['bd_abierta'] else 'no':>9}")
+
+    modulos = medir_importaciones()
+    por_paquete = defaultdict(int)
+    for nombre, propio, _ in modulos:
+        por_paquete[nombre.split(".")[0]] += propio
+
+    print(f"\n{'módulo (tiempo propio)':<45}{'ms':>8}{'acumulado':>11}")
+    for nombre, propio, acumulado in sorted(modulos, key=lambda m: -m[1])[: args.top]:
+        print(f"{nombre:<45}{propio / 1000:>8.1f}{acumulado / 1000:>11.1f}")
+    print(f"\n{'paquete':<45}{'ms':>8}")
+    for paquete, propio in sorted(por_paquete.items(), key=lambda p: -p[1])[: args.top]:
+        print(f"{paquete:<45}{propio / 1000:>8.1f}")
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "arranque": arranque,
+                    "paquetes_ms": {p: v / 1000 for p, v in por_paquete.items()},
+                    "modulos": [
+                        {"modulo": n, "propio_ms": p / 1000, "acumulado_ms": a / 1000}
+                        for n, p, a in modulos
+                    ],
+                },
+                f,
+                indent=2,
+                ensure_ascii=False,
+            )
+        print(f"Resultados guardados en {args.salida}.")
+
+
+if __name__ == "__main__":
+    main()
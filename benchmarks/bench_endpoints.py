@@ -0,0 +1,266 @@
+"""Mide las rutas principales de la aplicación sobre una base de datos sembrada de tamaño fijo.
+
+Crea una base de datos temporal con el mismo generador que `flask seed`
+(usuarios, tarjetas, transferencias y recargas a partir de una semilla:
+mismos parámetros = mismos datos, con resúmenes y puntos de control) y lanza
+peticiones reales con el cliente de pruebas de Flask: login, página
+principal, gráficos de cada rango, historial, ingresos, tarjetas y
+transferencias. De cada escenario se obtienen latencias p50/p95/p99,
+consultas SQL por petición y peticiones por segundo.
+
+Los resultados se guardan en JSON (con el commit y los parámetros) para
+comparar ejecuciones entre commits con --comparar.
+
+Uso:
+    python benchmarks/bench_endpoints.py [--usuarios 200] [--transacciones 100000]
+        [--peticiones 200] [--semilla 42] [--salida resultados.json] [--comparar anterior.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+DIR_TEMPORAL = tempfile.mkdtemp(prefix="bench-endpoints-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(DIR_TEMPORAL, 'bench.db')}"
+
+from sqlalchemy import event  # noqa: E402
+
+from app import create_app  # noqa: E402
+from cache import configurar_cache  # noqa: E402
+from database import db  # noqa: E402
+from services import generar_datos_ficticios  # noqa: E402
+
+app = create_app()
+
+CLAVE = "clave123"
+RANGOS = ("semanal", "mensual", "anual")
+
+
+# --- DATOS --- #
+
+
+def poblar(num_usuarios, num_transacciones, semilla):
+    """Siembra la base de datos (como `flask seed`); misma semilla, mismos datos."""
+
+    db.drop_all()
+    db.create_all()
+    generar_datos_ficticios(num_usuarios, num_transacciones, semilla=semilla, contrasena=CLAVE)
+
+
+# --- ESCENARIOS --- #
+
+
+def _sesion(num_usuarios, n):
+    """Cliente con la sesión iniciada como el usuario n (cíclico)."""
+
+    usuario = n % num_usuarios + 1
+    cliente = app.test_client()
+    cliente.post("/login", data={"nombre_usuario": f"usuario{usuario}", "contraseña": CLAVE})
+    return cliente, usuario
+
+
+def escenarios(num_usuarios):
+    """Nombre y función (cliente, usuario, i) -> respuesta de cada escenario."""
+
+    def tarjeta_nueva(cliente, usuario, i):
+        return cliente.post(
+            "/configuracion/anadir-tarjeta",
+            data={
+                "propietario": f"Usuario {usuario}",
+                "numero": f"5{usuario:07d}{i:08d}",
+                "caducidad": "11/29",
+                "cvc": "321",
+            },
+        )
+
+    lista = [
+        (
+            "login",
+            lambda cliente, usuario, i: cliente.post(
+                "/login", data={"nombre_usuario": f"usuario{usuario}", "contraseña": CLAVE}
+            ),
+        ),
+        ("index", lambda cliente, usuario, i: cliente.get("/")),
+    ]
+    lista += [
+        (f"grafico_{rango}", lambda cliente, usuario, i, rango=rango: cliente.get(f"/api/grafico/{rango}"))
+        for rango in RANGOS
+    ]
+    lista += [
+        ("historial", lambda cliente, usuario, i: cliente.get("/historial")),
+        ("api_historial", lambda cliente, usuario, i: cliente.get("/api/historial?draw=1&length=25")),
+        (
+            "ingresar",
+            lambda cliente, usuario, i: cliente.post(
+                "/ingresar", data={"cantidad_transferir": "10", "ingresarcartera": ""}
+            ),
+        ),
+        ("tarjetas_anadir", tarjeta_nueva),
+        ("tarjetas_listar", lambda cliente, usuario, i: cliente.get("/configuracion/mis-tarjetas")),
+        (
+            "transferir",
+            lambda cliente, usuario, i: cliente.post(
+                "/transferir",
+                data={
+                    "usu_transferir": f"usuario{(usuario + i) % num_usuarios + 1}",
+                    "cantidad_transferir": "1",
+                },
+            ),
+        ),
+    ]
+    return lista
+
+
+def _percentil(ordenadas, p):
+    if len(ordenadas) == 1:
+        return ordenadas[0]
+    return statistics.quantiles(ordenadas, n=100, method="inclusive")[p - 1]
+
+
+def medir(funcion, peticiones, num_usuarios, clientes):
+    """Lanza `peticiones` peticiones rotando entre los clientes y resume latencias y consultas."""
+
+    consultas = [0]
+
+    def _contar(conn, cursor, statement, parameters, context, executemany):
+        consultas[0] += 1
+
+    with app.app_context():
+        motor = db.engine
+    event.listen(motor, "before_cursor_execute", _contar)
+
+    latencias = []
+    por_peticion = []
+    errores = 0
+    try:
+        for i in range(peticiones):
+            cliente, usuario = clientes[i % len(clientes)]
+            consultas[0] = 0
+            inicio = time.perf_counter()
+            respuesta = funcion(cliente, usuario, i)
+            latencias.append(time.perf_counter() - inicio)
+            por_peticion.append(consultas[0])
+            errores += respuesta.status_code >= 400
+    finally:
+        event.remove(motor, "before_cursor_execute", _contar)
+
+    ordenadas = sorted(latencias)
+    return {
+        "peticiones": peticiones,
+        "errores": errores,
+        "p50_ms": _percentil(ordenadas, 50) * 1000,
+        "p95_ms": _percentil(ordenadas, 95) * 1000,
+        "p99_ms": _percentil(ordenadas, 99) * 1000,
+        "media_ms": statistics.fmean(latencias) * 1000,
+        "consultas_media": statistics.fmean(por_peticion),
+        "consultas_max": max(por_peticion),
+        "peticiones_s": peticiones / sum(latencias),
+    }
+
+
+# --- RESULTADOS --- #
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def imprimir(resultados, anterior=None):
+    cabecera = (
+        f"{'escenario':<18}{'p50 (ms)':>10}{'p95 (ms)':>10}{'p99 (ms)':>10}"
+        f"{'consultas':>11}{'pet/s':>9}{'errores':>9}"
+    )
+    if anterior:
+        cabecera += f"{'p50 antes':>11}{'cambio':>9}"
+    print(cabecera)
+    for nombre, r in resultados.items():
+        linea = (
+            f"{nombre:<18}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+            f"{r['consultas_media']:>11.1f}{r['peticiones_s']:>9.0f}{r['errores']:>9}"
+        )
+        previo = (anterior or {}).get(nombre)
+        if previo:
+            linea += f"{previo['p50_ms']:>11.2f}{r['p50_ms'] / previo['p50_ms'] - 1:>+9.0%}"
+        print(linea)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--usuarios", type=int, default=200)
+    parser.add_argument("--transacciones", type=int, default=100_000)
+    parser.add_argument("--peticiones", type=int, default=200, help="Peticiones por escenario.")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument(
+        "--metodo-hash",
+        default=app.config["PASSWORD_HASH_METHOD"],
+        help="Hash de las contraseñas sembradas (el de producción por defecto).",
+    )
+    parser.add_argument("--sin-cache", action="store_true", help="Desactiva la caché de gráficos.")
+    parser.add_argument("--escenarios", nargs="+", help="Solo estos escenarios.")
+    parser.add_argument("--salida", help="Fichero JSON donde guardar los resultados.")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior con el que comparar.")
+    args = parser.parse_args()
+
+    app.config.update(PASSWORD_HASH_METHOD=args.metodo_hash)
+    if args.sin_cache:
+        app.config["CACHE_GRAFICOS_MAX_ENTRADAS"] = 0
+    configurar_cache(app)
+
+    with app.app_context():
+        inicio = time.perf_counter()
+        poblar(args.usuarios, args.transacciones, args.semilla)
+        print(f"Datos sembrados en {time.perf_counter() - inicio:.1f} s ({DIR_TEMPORAL}).")
+
+    clientes = [_sesion(args.usuarios, n) for n in range(min(args.usuarios, 20))]
+    resultados = {}
+    for nombre, funcion in escenarios(args.usuarios):
+        if args.escenarios and nombre not in args.escenarios:
+            continue
+        funcion(*clientes[0], -1)  # Calentamiento: plantillas, sentencias preparadas...
+        resultados[nombre] = medir(funcion, args.peticiones, args.usuarios, clientes)
+
+    anterior = None
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            anterior = json.load(f)["resultados"]
+    imprimir(resultados, anterior)
+
+    if args.salida:
+        informe = {
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "commit": _commit(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "parametros": {
+                clave: valor
+                for clave, valor in vars(args).items()
+                if clave not in ("salida", "comparar")
+            },
+            "resultados": resultados,
+        }
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(informe, f, indent=2, ensure_ascii=False)
+        print(f"Resultados guardados en {args.salida}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Compara pagos concurrentes a una cartera de comercio con saldo en una fila o fraccionado.
+
+Crea una base de datos temporal con una cartera de comercio y muchos clientes
+y lanza a la vez hilos que pagan al comercio con `transferir` (el camino
+real de la aplicación: BEGIN IMMEDIATE, cargo condicionado, abono, registro
+y resumen diario) e hilos que leen su saldo a través del modelo `Cartera`.
+Se mide con el saldo en una sola fila y con N fracciones.
+
+En SQLite todas las escrituras comparten un único cerrojo de base de datos,
+así que fraccionar no puede quitar la espera entre escritores: aquí sirve
+para comprobar que el modo fraccionado no cuesta más. La ganancia aparece
+en motores con bloqueo por fila, donde los abonos a fracciones distintas
+no se esperan entre sí.
+
+Uso:
+    python benchmarks/bench_fracciones.py [--segundos 5] [--pagadores 8] [--lectores 2] [--fracciones 1 8]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+DIR_TEMPORAL = tempfile.mkdtemp(prefix="bench-fracciones-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(DIR_TEMPORAL, 'bench.db')}"
+
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+from app import create_app  # noqa: E402
+from database import db  # noqa: E402
+from models import Cartera  # noqa: E402
+from services import compactar_fracciones, fraccionar_cartera, transferir  # noqa: E402
+
+app = create_app()
+
+NUM_CLIENTES = 200
+COMERCIO = 1
+
+
+def poblar():
+    db.drop_all()
+    db.create_all()
+    conexion = db.session.connection()
+    conexion.exec_driver_sql(
+        'INSERT INTO "USUARIOS" (id, dni, nombre, apellidos, usuario, contrasena, gmail) '
+        "VALUES (?, ?, 'Bench', 'Bench', ?, 'x', ?)",
+        [(i, f"{i:08d}B", f"u{i}", f"u{i}@bench") for i in range(1, NUM_CLIENTES + 2)],
+    )
+    # Céntimos: un millón de euros por cliente, para no quedarse sin saldo
+    conexion.exec_driver_sql(
+        'INSERT INTO "CARTERAS" (id, cantidad, id_usuario, version, fracciones) '
+        "VALUES (?, ?, ?, 0, 0)",
+        [(i, 0 if i == COMERCIO else 10**8, i) for i in range(1, NUM_CLIENTES + 2)],
+    )
+    db.session.commit()
+
+
+def pagador(n, fin, contadores):
+    with app.app_context():
+        cliente = 2 + n % NUM_CLIENTES
+        while time.perf_counter() < fin:
+            try:
+                transferir(cliente, COMERCIO, "1")
+                contadores["pagos"] += 1
+            except OperationalError:
+                contadores["bloqueos"] += 1
+        db.session.remove()
+
+
+def lector(fin, contadores):
+    with app.app_context():
+        while time.perf_counter() < fin:
+            db.session.expire_all()
+            db.session.get(Cartera, COMERCIO).cantidad
+            contadores["lecturas"] += 1
+        db.session.remove()
+
+
+def medir(fracciones, segundos, pagadores, lectores):
+    with app.app_context():
+        poblar()
+        if fracciones > 1:
+            fraccionar_cartera(COMERCIO, fracciones)
+
+    contadores = {"pagos": 0, "lecturas": 0, "bloqueos": 0}
+    fin = time.perf_counter() + segundos
+    hilos = [
+        threading.Thread(target=pagador, args=(n, fin, contadores)) for n in range(pagadores)
+    ] + [threading.Thread(target=lector, args=(fin, contadores)) for _ in range(lectores)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    with app.app_context():
+        inicio = time.perf_counter()
+        compactar_fracciones()
+        compactacion = (time.perf_counter() - inicio) * 1000
+        saldo = db.session.get(Cartera, COMERCIO).cantidad
+    assert saldo == contadores["pagos"], (saldo, contadores["pagos"])
+    return {**{c: v / segundos for c, v in contadores.items()}, "compactacion": compactacion}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--segundos", type=float, default=5)
+    parser.add_argument("--pagadores", type=int, default=8)
+    parser.add_argument("--lectores", type=int, default=2)
+    parser.add_argument("--fracciones", type=int, nargs="+", default=[1, 8])
+    args = parser.parse_args()
+
+    print(
+        f"{'fracciones':>10}{'pagos/s':>12}{'lecturas/s':>12}"
+        f"{'bloqueos/s':>12}{'compactar (ms)':>16}"
+    )
+    for fracciones in args.fracciones:
+        r = medir(fracciones, args.segundos, args.pagadores, args.lectores)
+        print(
+            f"{fracciones:>10}{r['pagos']:>12.0f}{r['lecturas']:>12.0f}"
+            f"{r['bloqueos']:>12.1f}{r['compactacion']:>16.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Compara el cálculo de la serie de saldo: tres consultas + Python frente a una consulta con ventanas.
+
+Para cada tamaño crea una base de datos temporal con ese número de
+transacciones repartidas en el último año (una parte de ellas en la cartera
+medida) y cronometra, para cada rango, la implementación anterior
+(`_cierres_tres_consultas`, copiada abajo como referencia) y la sentencia
+con `SUM() OVER (ORDER BY dia)` que usan los gráficos cuando el resumen
+diario no cubre el periodo.
+
+Uso:
+    python benchmarks/bench_grafico_saldo.py [--tamanos 10000 100000 1000000] [--repeticiones 5]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+DIR_TEMPORAL = tempfile.mkdtemp(prefix="bench-grafico-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(DIR_TEMPORAL, 'bench.db')}"
+
+from sqlalchemy import func, text  # noqa: E402
+
+from app import create_app  # noqa: E402
+from database import db  # noqa: E402
+from models import Cartera, Transaccion  # noqa: E402
+from utils.grafico_utils import _ejecutar_movimientos  # noqa: E402
+
+app = create_app()
+
+NUM_CARTERAS = 100
+RANGOS = {
+    "semanal": lambda hoy: (hoy - timedelta(days=hoy.weekday())).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    ),
+    "mensual": lambda hoy: datetime(hoy.year, hoy.month, 1),
+    "anual": lambda hoy: datetime(hoy.year, 1, 1),
+}
+
+
+def _cierres_tres_consultas(cartera_id, rango, inicio):
+    """Implementación anterior: saldo, ingresos y gastos por separado y cruce en Python."""
+
+    cartera = db.session.get(Cartera, cartera_id)
+    saldo_actual = float(cartera.cantidad) if cartera else 0.0
+
+    group_by_sql = (
+        func.strftime("%Y-%m", Transaccion.fecha)
+        if rango == "anual"
+        else func.date(Transaccion.fecha)
+    )
+    q_ingresos = (
+        db.session.query(group_by_sql.label("f"), func.sum(Transaccion.cantidad))
+        .filter(Transaccion.id_cartera_recibido == cartera_id, Transaccion.fecha >= inicio)
+        .group_by("f")
+        .all()
+    )
+    q_gastos = (
+        db.session.query(group_by_sql.label("f"), func.sum(Transaccion.cantidad))
+        .filter(Transaccion.id_cartera_enviado == cartera_id, Transaccion.fecha >= inicio)
+        .group_by("f")
+        .all()
+    )
+
+    balances_periodo = {}
+    for f, cant in q_ingresos:
+        balances_periodo[f] = balances_periodo.get(f, 0.0) + float(cant)
+    for f, cant in q_gastos:
+        balances_periodo[f] = balances_periodo.get(f, 0.0) - float(cant)
+
+    saldo_apertura = saldo_actual - sum(balances_periodo.values())
+    cierres = {}
+    saldo = saldo_apertura
+    for f in sorted(balances_periodo):
+        saldo += balances_periodo[f]
+        clave = f if rango == "anual" else datetime.strptime(f, "%Y-%m-%d").date()
+        cierres[clave] = saldo
+    return saldo_apertura, cierres
+
+
+def poblar(num_transacciones, proporcion):
+    db.drop_all()
+    db.create_all()
+    conexion = db.session.connection()
+    conexion.exec_driver_sql(
+        'INSERT INTO "USUARIOS" (id, dni, nombre, apellidos, usuario, contrasena, gmail) '
+        "VALUES (?, ?, 'Bench', 'Bench', ?, 'x', ?)",
+        [(i, f"{i:08d}B", f"u{i}", f"u{i}@bench") for i in range(1, NUM_CARTERAS + 1)],
+    )
+    conexion.exec_driver_sql(
+        'INSERT INTO "CARTERAS" (id, cantidad, id_usuario, version) VALUES (?, 100000000, ?, 0)',
+        [(i, i) for i in range(1, NUM_CARTERAS + 1)],
+    )
+
+    rnd = random.Random(42)
+    ahora = datetime.now()
+    filas = []
+    for _ in range(num_transacciones):
+        origen, destino = rnd.sample(range(2, NUM_CARTERAS + 1), 2)
+        if rnd.random() < proporcion:
+            origen, destino = (1, destino) if rnd.random() < 0.5 else (origen, 1)
+        fecha = ahora - timedelta(seconds=rnd.randrange(365 * 24 * 3600))
+        # Importes en céntimos, como los guarda el tipo Dinero
+        filas.append((rnd.randrange(100, 10001), fecha.isoformat(" "), origen, destino))
+    conexion.exec_driver_sql(
+        'INSERT INTO "TRANSACCIONES" (cantidad, fecha, id_cartera_enviado, id_cartera_recibido) '
+        "VALUES (?, ?, ?, ?)",
+        filas,
+    )
+    db.session.execute(text("ANALYZE"))
+    db.session.commit()
+
+
+def cronometrar(funcion, repeticiones):
+    mejores = []
+    for _ in range(repeticiones):
+        # Sin objetos en el mapa de identidad: cada medida consulta de verdad
+        db.session.expunge_all()
+        inicio = time.perf_counter()
+        funcion()
+        mejores.append(time.perf_counter() - inicio)
+    return min(mejores) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument(
+        "--proporcion", type=float, default=0.1, help="Fracción de transacciones de la cartera medida."
+    )
+    args = parser.parse_args()
+
+    print(f"{'transacciones':>14}{'rango':>10}{'anterior (ms)':>16}{'ventana (ms)':>15}{'mejora':>9}")
+    with app.app_context():
+        for tamano in args.tamanos:
+            poblar(tamano, args.proporcion)
+            hoy = datetime.now()
+            for rango, calcular_inicio in RANGOS.items():
+                inicio = calcular_inicio(hoy)
+                anterior = cronometrar(
+                    lambda: _cierres_tres_consultas(1, rango, inicio), args.repeticiones
+                )
+                ventana = cronometrar(
+                    lambda: _ejecutar_movimientos("transacciones", 1, inicio), args.repeticiones
+                )
+                print(
+                    f"{tamano:>14}{rango:>10}{anterior:>16.2f}{ventana:>15.2f}"
+                    f"{anterior / ventana:>8.1f}x"
+                )
+
+
+if __name__ == "__main__":
+    main()
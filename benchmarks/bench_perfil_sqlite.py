@@ -0,0 +1,139 @@
+"""Compara el rendimiento lectura/escritura de SQLite con y sin el perfil de producción.
+
+Crea una base de datos temporal por perfil, la llena con carteras y lanza a
+la vez hilos escritores (transferencias con BEGIN IMMEDIATE y UPDATE
+condicionada) e hilos lectores (saldo e historial reciente de una cartera)
+durante unos segundos. Imprime operaciones por segundo y errores de cerrojo.
+
+Uso:
+    python benchmarks/bench_perfil_sqlite.py [--segundos 5] [--escritores 4] [--lectores 8]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+
+import models  # noqa: F401  (registra las tablas en db.metadata)
+from database import PERFIL_SQLITE, aplicar_pragmas, db
+
+NUM_CARTERAS = 200
+
+
+def crear_motor(ruta, perfil):
+    motor = create_engine(f"sqlite:///{ruta}", pool_size=32)
+    if perfil:
+
+        @event.listens_for(motor, "connect")
+        def _al_conectar(conexion_dbapi, registro):
+            aplicar_pragmas(conexion_dbapi, PERFIL_SQLITE)
+
+    db.metadata.create_all(motor)
+    with motor.begin() as conexion:
+        conexion.exec_driver_sql(
+            'INSERT INTO "USUARIOS" (id, dni, nombre, apellidos, usuario, contrasena, gmail) '
+            "VALUES (?, ?, 'Bench', 'Bench', ?, 'x', ?)",
+            [(i, f"{i:08d}B", f"u{i}", f"u{i}@bench") for i in range(1, NUM_CARTERAS + 1)],
+        )
+        conexion.exec_driver_sql(
+            'INSERT INTO "CARTERAS" (id, cantidad, id_usuario) VALUES (?, 1000, ?)',
+            [(i, i) for i in range(1, NUM_CARTERAS + 1)],
+        )
+    return motor
+
+
+def escritor(motor, fin, contadores):
+    with motor.connect() as conexion:
+        bruta = conexion.connection.dbapi_connection
+        while time.perf_counter() < fin:
+            origen, destino = random.sample(range(1, NUM_CARTERAS + 1), 2)
+            try:
+                bruta.execute("BEGIN IMMEDIATE")
+                bruta.execute(
+                    'UPDATE "CARTERAS" SET cantidad = cantidad - 1 WHERE id = ? AND cantidad >= 1',
+                    (origen,),
+                )
+                bruta.execute(
+                    'UPDATE "CARTERAS" SET cantidad = cantidad + 1 WHERE id = ?', (destino,)
+                )
+                bruta.execute(
+                    'INSERT INTO "TRANSACCIONES" (cantidad, fecha, id_cartera_enviado, '
+                    "id_cartera_recibido) VALUES (1, datetime('now'), ?, ?)",
+                    (origen, destino),
+                )
+                bruta.commit()
+                contadores["escrituras"] += 1
+            except Exception as e:
+                bruta.rollback()
+                if "locked" not in str(e):
+                    raise
+                contadores["bloqueos"] += 1
+
+
+def lector(motor, fin, contadores):
+    with motor.connect() as conexion:
+        while time.perf_counter() < fin:
+            cartera = random.randint(1, NUM_CARTERAS)
+            try:
+                conexion.exec_driver_sql(
+                    'SELECT cantidad FROM "CARTERAS" WHERE id = ?', (cartera,)
+                ).all()
+                conexion.exec_driver_sql(
+                    'SELECT id, cantidad FROM "TRANSACCIONES" WHERE id_cartera_enviado = ? '
+                    "ORDER BY fecha DESC LIMIT 25",
+                    (cartera,),
+                ).all()
+                conexion.commit()
+                contadores["lecturas"] += 1
+            except OperationalError as e:
+                conexion.rollback()
+                if "locked" not in str(e):
+                    raise
+                contadores["bloqueos"] += 1
+
+
+def medir(perfil, segundos, escritores, lectores):
+    with tempfile.TemporaryDirectory(prefix="bench-sqlite-") as directorio:
+        motor = crear_motor(os.path.join(directorio, "bench.db"), perfil)
+        contadores = {"escrituras": 0, "lecturas": 0, "bloqueos": 0}
+        fin = time.perf_counter() + segundos
+        hilos = [
+            threading.Thread(target=escritor, args=(motor, fin, contadores))
+            for _ in range(escritores)
+        ] + [
+            threading.Thread(target=lector, args=(motor, fin, contadores))
+            for _ in range(lectores)
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        motor.dispose()
+    return {clave: valor / segundos for clave, valor in contadores.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--segundos", type=float, default=5)
+    parser.add_argument("--escritores", type=int, default=4)
+    parser.add_argument("--lectores", type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"{'perfil':<14}{'escrituras/s':>14}{'lecturas/s':>14}{'bloqueos/s':>14}")
+    for nombre, perfil in (("por defecto", False), ("producción", True)):
+        r = medir(perfil, args.segundos, args.escritores, args.lectores)
+        print(
+            f"{nombre:<14}{r['escrituras']:>14.0f}{r['lecturas']:>14.0f}{r['bloqueos']:>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
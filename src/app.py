@@ -1,52 +1,97 @@
 import os
+
 from flask import Flask
-from routes.config import config_bp  # Importa tu nuevo archivo
-from routes.main import main_bp  # Importa tu nuevo archivo
-from routes.auth import auth_bp  # Importa tu nuevo archivo
 
-from sqlalchemy import func
-from database import db
-from datetime import datetime
-from services import esta_autenticado, obtener_usuario_actual
 
+def configuracion_por_defecto():
+    """
+    Configuración de la aplicación a partir de las variables de entorno.
+
+    Returns:
+        dict: Claves de `app.config` con su valor por defecto.
+    """
+
+    return {
+        # --- BASE DE DATOS ---
+        "SQLALCHEMY_DATABASE_URI": os.getenv("DATABASE_URL", "sqlite:///proyecto.db"),
+        "SQLALCHEMY_TRACK_MODIFICATIONS": False,
+        # Coste del hash de contraseñas y tamaño del pool de procesos que lo calcula.
+        # Los hashes con parámetros antiguos se actualizan en el siguiente login.
+        "PASSWORD_HASH_METHOD": os.getenv("PASSWORD_HASH_METHOD", "pbkdf2:sha256:600000"),
+        "PASSWORD_HASH_WORKERS": int(os.getenv("PASSWORD_HASH_WORKERS", 0)) or None,
+        "PASSWORD_HASH_MAX_COLA": int(os.getenv("PASSWORD_HASH_MAX_COLA", 0)) or None,
+        # Hilos que procesan la cola de tareas dentro de este proceso (arrancan con la
+        # primera tarea encolada). Con 0 solo las procesa `flask trabajador-cola`.
+        "COLA_TRABAJADORES": int(os.getenv("COLA_TRABAJADORES", 2)),
+        # Medición de consultas por petición (cabecera Server-Timing) y registro de
+        # sentencias lentas. Desactivada por defecto: INSTRUMENTACION_SQL=1 para activarla.
+        "INSTRUMENTACION_SQL": os.getenv("INSTRUMENTACION_SQL") == "1",
+        "CONSULTAS_LENTAS_MS": float(os.getenv("CONSULTAS_LENTAS_MS", 100)),
+        "CONSULTAS_LENTAS_FICHERO": os.getenv("CONSULTAS_LENTAS_FICHERO"),
+        # Con varios procesos, directorio donde cada uno vuelca sus métricas para
+        # que /metrics devuelva la suma de todos (`servidor.py` lo fija solo)
+        "METRICAS_DIRECTORIO": os.getenv("METRICAS_DIRECTORIO") or None,
+        "METRICAS_INTERVALO": float(os.getenv("METRICAS_INTERVALO", 5)),
+        # Acceso a /metrics: con token, cabecera "Authorization: Bearer <token>";
+        # sin él, solo peticiones desde la propia máquina (127.0.0.1 / ::1)
+        "METRICAS_TOKEN": os.getenv("METRICAS_TOKEN") or None,
+    }
 
-app = Flask(__name__)
-app.secret_key = "dw2"  # Necesaria para session y flash
 
-# --- CONFIGURACIÓN DE LA BASE DE DATOS ---
-# Asegúrate de tener una URI configurada, de lo contrario dará error
-app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv(
-    "DATABASE_URL", "sqlite:///proyecto.db"
-)
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+def create_app(config=None):
+    """
+    Crea y configura una instancia de la aplicación.
 
-# Inicializar la extensión con la app
+    Importar este módulo no hace nada más que importar Flask: los
+    blueprints, los modelos y los servicios se importan aquí, al crear la
+    aplicación, y nada toca la base de datos hasta la primera consulta. El
+    esquema ya no se crea al arrancar: `flask actualizar-esquema` crea las
+    tablas que falten y pone al día las existentes.
 
+    Args:
+        config (dict | None): Claves de `app.config` que sustituyen a las
+            de `configuracion_por_defecto()` (tests, benchmarks...).
 
-db.init_app(app)
-app.register_blueprint(config_bp)
-app.register_blueprint(main_bp)
-app.register_blueprint(auth_bp)
+    Returns:
+        Flask: La aplicación lista para servir.
 
-# --- SOLUCIÓN AL ERROR: Crear tablas dentro del contexto de la app ---
+    Example:
+        >>> app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///prueba.db"})
+    """
 
+    from cache import configurar_cache
+    from commands import registrar_comandos
+    from database import configurar_motor, db
+    from instrumentacion import configurar_instrumentacion
+    from metricas import configurar_metricas
+    from routes.auth import auth_bp
+    from routes.config import config_bp
+    from routes.main import main_bp
+    from services import esta_autenticado, obtener_usuario_actual
 
-with app.app_context():
-    # Esto ahora funcionará porque tiene el contexto de la aplicación activo
-    db.create_all()
+    app = Flask(__name__)
+    app.secret_key = "dw2"  # Necesaria para session y flash
+    app.config.update(configuracion_por_defecto())
+    app.config.update(config or {})
 
+    db.init_app(app)
+    configurar_motor(app)
+    configurar_cache(app)
+    configurar_instrumentacion(app)
+    configurar_metricas(app)
+    app.register_blueprint(config_bp)
+    app.register_blueprint(main_bp)
+    app.register_blueprint(auth_bp)
+    registrar_comandos(app)
 
-@app.context_processor
-def inject_user():
-    # Esto hace que 'usuario' y 'autenticado' funcionen en CUALQUIER HTML
-    # sin tener que ponerlos en el return render_template(...)
-    return dict(
-        usuario=obtener_usuario_actual(),
-        autenticado=esta_autenticado(),
-        # hoy=datetime.now(),
-    )
+    @app.context_processor
+    def inject_user():
+        # Esto hace que 'usuario' y 'autenticado' funcionen en CUALQUIER HTML
+        # sin tener que ponerlos en el return render_template(...)
+        return dict(
+            usuario=obtener_usuario_actual(),
+            autenticado=esta_autenticado(),
+        )
 
+    return app
 
-if __name__ == "__main__":
-    app.run(debug=True)
-    print(app.url_map)
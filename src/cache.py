@@ -0,0 +1,207 @@
+# cache.py
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+# ---------------------------- BACKENDS ------------------------------ #
+
+
+class BackendCache(ABC):
+    """
+    Interfaz mínima de un almacén clave/valor con caducidad.
+
+    Cualquier almacén compartido (Redis, memcached...) se puede enchufar
+    implementando estos tres métodos y pasándolo en
+    `app.config["CACHE_GRAFICOS_BACKEND"]`.
+    """
+
+    @abstractmethod
+    def obtener(self, clave):
+        """Devuelve el valor guardado o None si no existe o ha caducado."""
+
+    @abstractmethod
+    def guardar(self, clave, valor, ttl):
+        """Guarda `valor` durante `ttl` segundos."""
+
+    @abstractmethod
+    def borrar(self, clave):
+        """Elimina la clave si existe."""
+
+
+class CacheLRU(BackendCache):
+    """Caché en memoria del proceso, limitada a `max_entradas` (LRU) y con TTL."""
+
+    def __init__(self, max_entradas=1024):
+        self.max_entradas = max_entradas
+        self._datos = OrderedDict()
+        self._cerrojo = threading.Lock()
+
+    def obtener(self, clave):
+        with self._cerrojo:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            valor, caduca = entrada
+            if caduca <= time.monotonic():
+                del self._datos[clave]
+                return None
+            self._datos.move_to_end(clave)
+            return valor
+
+    def guardar(self, clave, valor, ttl):
+        with self._cerrojo:
+            self._datos[clave] = (valor, time.monotonic() + ttl)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def borrar(self, clave):
+        with self._cerrojo:
+            self._datos.pop(clave, None)
+
+    def __len__(self):
+        return len(self._datos)
+
+
+class CacheCompartidaLocal(BackendCache):
+    """
+    Sustituto local de un backend compartido, para tests y desarrollo.
+
+    Como un almacén externo, guarda los valores serializados en JSON: lo que
+    funciona con él funcionará con Redis o memcached. Al pasar de
+    `max_entradas` descarta primero las caducadas y después las más antiguas.
+    """
+
+    def __init__(self, max_entradas=1024):
+        self.max_entradas = max_entradas
+        self._datos = {}
+        self._cerrojo = threading.Lock()
+
+    def obtener(self, clave):
+        with self._cerrojo:
+            entrada = self._datos.get(clave)
+        if entrada is None or entrada[1] <= time.monotonic():
+            return None
+        return json.loads(entrada[0])
+
+    def guardar(self, clave, valor, ttl):
+        ahora = time.monotonic()
+        with self._cerrojo:
+            # Reinsertada al final: el orden del dict es el de guardado
+            self._datos.pop(clave, None)
+            self._datos[clave] = (json.dumps(valor), ahora + ttl)
+            if len(self._datos) > self.max_entradas:
+                for vieja in [c for c, (_, caduca) in self._datos.items() if caduca <= ahora]:
+                    del self._datos[vieja]
+            while len(self._datos) > self.max_entradas:
+                del self._datos[next(iter(self._datos))]
+
+    def borrar(self, clave):
+        with self._cerrojo:
+            self._datos.pop(clave, None)
+
+    def __len__(self):
+        return len(self._datos)
+
+
+# ---------------------------- CACHÉ DE GRÁFICOS ------------------------------ #
+
+
+class CacheResultados:
+    """
+    Caché de resultados calculados por cartera, con contadores de aciertos y fallos.
+
+    La clave incluye la versión de la cartera (CARTERAS.version), que se
+    incrementa en la misma transacción que cada transferencia o recarga: en
+    cuanto se confirma un movimiento las entradas anteriores de esa cartera
+    dejan de ser alcanzables, en todos los procesos que compartan backend.
+    """
+
+    def __init__(self, prefijo, backend=None, ttl=300):
+        self.prefijo = prefijo
+        self.backend = backend or CacheLRU()
+        self.ttl = ttl
+        self.aciertos = 0
+        self.fallos = 0
+        self._cerrojo = threading.Lock()
+
+    def configurar(self, backend=None, ttl=None):
+        if backend is not None:
+            self.backend = backend
+        if ttl is not None:
+            self.ttl = ttl
+        self.reiniciar_contadores()
+
+    def clave(self, cartera, *partes):
+        return ":".join(
+            str(p) for p in (self.prefijo, cartera.id, cartera.version or 0, *partes)
+        )
+
+    def obtener_o_calcular(self, cartera, partes, calcular):
+        """
+        Devuelve el resultado guardado para (cartera, versión, partes) o lo calcula.
+
+        Args:
+            cartera (Cartera): Cartera ya cargada (se usa su id y su versión).
+            partes (tuple): Resto de la clave (rango, periodo...).
+            calcular (Callable[[], object]): Cálculo a ejecutar si no está guardado.
+
+        Returns:
+            object: El resultado, de la caché o recién calculado.
+        """
+
+        clave = self.clave(cartera, *partes)
+        valor = self.backend.obtener(clave)
+        with self._cerrojo:
+            if valor is None:
+                self.fallos += 1
+            else:
+                self.aciertos += 1
+        if valor is None:
+            valor = calcular()
+            self.backend.guardar(clave, valor, self.ttl)
+        return valor
+
+    def estadisticas(self):
+        with self._cerrojo:
+            total = self.aciertos + self.fallos
+            return {
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "ratio_aciertos": self.aciertos / total if total else 0.0,
+            }
+
+    def reiniciar_contadores(self):
+        with self._cerrojo:
+            self.aciertos = self.fallos = 0
+
+
+cache_graficos = CacheResultados("grafico")
+# Total de movimientos de cada cartera para el historial (recordsTotal de DataTables)
+cache_movimientos = CacheResultados("movimientos")
+
+
+def configurar_cache(app):
+    """
+    Ajusta la caché de gráficos (y la de totales del historial) con la configuración.
+
+    Claves admitidas: `CACHE_GRAFICOS_BACKEND` (instancia de BackendCache;
+    por defecto una CacheLRU en memoria), `CACHE_GRAFICOS_MAX_ENTRADAS` y
+    `CACHE_GRAFICOS_TTL` (segundos).
+
+    Args:
+        app (Flask): La aplicación.
+
+    Returns:
+        None
+    """
+
+    # `is None` y no `or`: un backend vacío (len 0) es falso
+    backend = app.config.get("CACHE_GRAFICOS_BACKEND")
+    if backend is None:
+        backend = CacheLRU(app.config.get("CACHE_GRAFICOS_MAX_ENTRADAS", 1024))
+    cache_graficos.configurar(backend, app.config.get("CACHE_GRAFICOS_TTL", 300))
+    # Mismo almacén (los prefijos separan las claves) y misma caducidad
+    cache_movimientos.configurar(backend, app.config.get("CACHE_GRAFICOS_TTL", 300))
@@ -0,0 +1,280 @@
+import time
+
+import click
+from flask import current_app
+from sqlalchemy import Integer, MetaData, inspect
+from sqlalchemy.schema import CreateColumn, CreateTable
+
+from database import Dinero, db
+from services import (
+    carteras_con_resumen_incompleto,
+    compactar_fracciones,
+    ejecutar_trabajador,
+    estadisticas_cola,
+    fraccionar_cartera,
+    generar_datos_ficticios,
+    generar_puntos_control,
+    iniciar_trabajadores,
+    procesar_tareas,
+    reconstruir_saldos_diarios,
+)
+
+# ---------------------------- COMANDOS FLASK ------------------------------ #
+
+
+def registrar_comandos(app):
+    """
+    Registra en la aplicación los comandos de mantenimiento (`flask <comando>`).
+
+    Args:
+        app (Flask): La aplicación sobre la que se añaden los comandos.
+
+    Returns:
+        None
+    """
+
+    app.cli.add_command(reconstruir_saldos)
+    app.cli.add_command(crear_indices)
+    app.cli.add_command(actualizar_esquema)
+    app.cli.add_command(fraccionar)
+    app.cli.add_command(compactar)
+    app.cli.add_command(puntos_control)
+    app.cli.add_command(trabajador_cola)
+    app.cli.add_command(estado_cola)
+    app.cli.add_command(sembrar)
+
+
+@click.command("reconstruir-saldos")
+@click.option("--cartera", type=int, default=None, help="Reconstruir solo esta cartera.")
+def reconstruir_saldos(cartera):
+    """Regenera las tablas SALDOS_DIARIOS y RESUMENES_MENSUALES a partir del historial existente."""
+
+    filas = reconstruir_saldos_diarios(cartera)
+    click.echo(f"Resumen diario reconstruido: {filas} filas.")
+
+
+@click.command("fraccionar-cartera")
+@click.argument("cartera", type=int)
+@click.argument("fracciones", type=int)
+def fraccionar(cartera, fracciones):
+    """Reparte los abonos de una cartera muy concurrida en N filas (0 para desactivar)."""
+
+    try:
+        fraccionar_cartera(cartera, fracciones)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Cartera {cartera}: {fracciones} fracciones.")
+
+
+@click.command("compactar-fracciones")
+@click.option("--cartera", type=int, default=None, help="Compactar solo esta cartera.")
+def compactar(cartera):
+    """Junta el saldo de las fracciones en CARTERAS (para ejecutar periódicamente)."""
+
+    carteras = compactar_fracciones(cartera)
+    click.echo(f"Fracciones compactadas: {carteras} carteras.")
+
+
+@click.command("generar-puntos-control")
+@click.option("--cartera", type=int, default=None, help="Generar solo para esta cartera.")
+def puntos_control(cartera):
+    """Añade los puntos de control de saldo mensuales que falten (para ejecutar periódicamente)."""
+
+    filas = generar_puntos_control(cartera)
+    click.echo(f"Puntos de control escritos: {filas}.")
+
+
+@click.command("trabajador-cola")
+@click.option("--hilos", type=int, default=1, help="Hilos trabajadores.")
+@click.option("--una-vez", is_flag=True, help="Vaciar la cola disponible y salir.")
+def trabajador_cola(hilos, una_vez):
+    """Procesa la cola de tareas en primer plano (trabajador independiente del servidor)."""
+
+    if una_vez:
+        total = 0
+        while procesadas := procesar_tareas():
+            total += procesadas
+        click.echo(f"Tareas procesadas: {total}.")
+        return
+
+    app = current_app._get_current_object()
+    if hilos > 1:
+        iniciar_trabajadores(app, hilos - 1)
+    click.echo(f"Procesando la cola con {hilos} hilos (Ctrl+C para salir).")
+    ejecutar_trabajador(app)
+
+
+@click.command("estado-cola")
+def estado_cola():
+    """Muestra la profundidad de la cola de tareas."""
+
+    for clave, valor in estadisticas_cola().items():
+        click.echo(f"{clave}: {valor}")
+
+
+@click.command("seed")
+@click.option("--usuarios", type=int, default=1000, show_default=True)
+@click.option("--transacciones", type=int, default=100_000, show_default=True)
+@click.option("--anios", type=int, default=3, show_default=True, help="Años de historial.")
+@click.option("--semilla", type=int, default=42, show_default=True)
+@click.option("--contrasena", default="clave123", show_default=True, help="Contraseña de todos.")
+@click.option("--vaciar", is_flag=True, help="Borrar antes todos los datos existentes.")
+def sembrar(usuarios, transacciones, anios, semilla, contrasena, vaciar):
+    """Genera datos ficticios de tamaño real (usuarios, tarjetas, transferencias y recargas)."""
+
+    if vaciar:
+        db.drop_all()
+        db.create_all()
+    inicio = time.perf_counter()
+    try:
+        filas = generar_datos_ficticios(usuarios, transacciones, anios, semilla, contrasena)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    resumen = ", ".join(f"{valor} {tabla}" for tabla, valor in filas.items())
+    click.echo(f"Datos generados en {time.perf_counter() - inicio:.1f} s: {resumen}.")
+
+
+@click.command("crear-indices")
+def crear_indices():
+    """Crea los índices de los modelos que falten en una base de datos ya existente."""
+
+    # db.create_all() no añade índices a tablas que ya existen
+    for tabla in db.metadata.sorted_tables:
+        for indice in tabla.indexes:
+            indice.create(db.engine, checkfirst=True)
+            click.echo(f"Índice comprobado: {indice.name}")
+
+
+# Índices de versiones anteriores sustituidos por otros más completos
+INDICES_OBSOLETOS = (
+    "ix_transacciones_enviado_fecha",  # Ahora ix_transacciones_enviado_fecha_cantidad
+    "ix_transacciones_recibido_fecha",  # Ahora ix_transacciones_recibido_fecha_cantidad
+)
+
+
+@click.command("actualizar-esquema")
+def actualizar_esquema():
+    """Pone al día una base de datos existente: columnas, índices y resúmenes diarios."""
+
+    migrar_dinero_a_centimos()
+
+    # db.create_all() tampoco añade columnas a tablas que ya existen
+    inspector = inspect(db.engine)
+    with db.engine.begin() as conexion:
+        for tabla in db.metadata.sorted_tables:
+            if not inspector.has_table(tabla.name):
+                continue
+            existentes = {c["name"] for c in inspector.get_columns(tabla.name)}
+            for columna in tabla.columns:
+                if columna.name in existentes:
+                    continue
+                definicion = CreateColumn(columna).compile(dialect=db.engine.dialect)
+                conexion.exec_driver_sql(f'ALTER TABLE "{tabla.name}" ADD COLUMN {definicion}')
+                click.echo(f"Columna añadida: {tabla.name}.{columna.name}")
+
+    db.create_all()
+    crear_indices.callback()
+
+    # Historial anterior a los resúmenes (o sin reconstruir): los gráficos lo
+    # leerían de TRANSACCIONES hasta que se reconstruyan
+    incompletas = carteras_con_resumen_incompleto()
+    if incompletas:
+        filas = reconstruir_saldos_diarios()
+        click.echo(f"Resúmenes reconstruidos ({len(incompletas)} carteras incompletas): {filas} filas.")
+
+    # Solo los índices que el modelo sustituyó: los creados a mano no se tocan
+    existentes = {
+        i["name"]
+        for t in db.metadata.sorted_tables
+        if inspector.has_table(t.name)
+        for i in inspector.get_indexes(t.name)
+    }
+    with db.engine.begin() as conexion:
+        for nombre in INDICES_OBSOLETOS:
+            if nombre in existentes:
+                conexion.exec_driver_sql(f'DROP INDEX "{nombre}"')
+                click.echo(f"Índice obsoleto eliminado: {nombre}")
+
+
+def _tablas_con_dinero_antiguo(inspector):
+    """Tablas existentes con algún importe guardado aún como decimal (NUMERIC/FLOAT)."""
+
+    tablas = []
+    for tabla in db.metadata.sorted_tables:
+        importes = {c.name for c in tabla.columns if isinstance(c.type, Dinero)}
+        if not importes or not inspector.has_table(tabla.name):
+            continue
+        if any(
+            c["name"] in importes and not isinstance(c["type"], Integer)
+            for c in inspector.get_columns(tabla.name)
+        ):
+            tablas.append(tabla)
+    return tablas
+
+
+def migrar_dinero_a_centimos():
+    """
+    Convierte los importes de una base de datos antigua a céntimos enteros.
+
+    SQLite no permite cambiar el tipo de una columna, así que cada tabla con
+    importes en NUMERIC/FLOAT se rehace como indica su documentación: tabla
+    nueva con el esquema actual, copia de los datos (importes × 100,
+    redondeados), borrado de la antigua, renombrado e índices. Todo en una
+    transacción y con las claves foráneas desactivadas mientras dura. Si ya
+    está migrada no hace nada.
+
+    Returns:
+        list[str]: Nombres de las tablas convertidas.
+    """
+
+    tablas = _tablas_con_dinero_antiguo(inspect(db.engine))
+    if not tablas:
+        return []
+
+    with db.engine.connect() as conexion:
+        # Solo tiene efecto fuera de una transacción
+        conexion.exec_driver_sql("PRAGMA foreign_keys = OFF")
+        try:
+            conexion.exec_driver_sql("BEGIN IMMEDIATE")
+            inspector = inspect(conexion)
+            # Copia del esquema para que las claves foráneas de la tabla nueva se resuelvan
+            esquema = MetaData()
+            for tabla in db.metadata.sorted_tables:
+                tabla.to_metadata(esquema)
+            for tabla in tablas:
+                existentes = {c["name"] for c in inspector.get_columns(tabla.name)}
+                nueva = tabla.to_metadata(esquema, name=f"{tabla.name}__nueva")
+                conexion.execute(CreateTable(nueva))
+
+                columnas = [c for c in tabla.columns if c.name in existentes]
+                destino = ", ".join(f'"{c.name}"' for c in columnas)
+                origen = ", ".join(
+                    f'CAST(ROUND("{c.name}" * 100) AS INTEGER)'
+                    if isinstance(c.type, Dinero)
+                    else f'"{c.name}"'
+                    for c in columnas
+                )
+                conexion.exec_driver_sql(
+                    f'INSERT INTO "{nueva.name}" ({destino}) '
+                    f'SELECT {origen} FROM "{tabla.name}"'
+                )
+                conexion.exec_driver_sql(f'DROP TABLE "{tabla.name}"')
+                conexion.exec_driver_sql(
+                    f'ALTER TABLE "{nueva.name}" RENAME TO "{tabla.name}"'
+                )
+                for indice in tabla.indexes:
+                    indice.create(conexion)
+                click.echo(f"Importes en céntimos: {tabla.name}")
+
+            errores = conexion.exec_driver_sql("PRAGMA foreign_key_check").fetchall()
+            if errores:
+                raise click.ClickException(f"Claves foráneas rotas tras migrar: {errores}")
+            conexion.commit()
+        except Exception:
+            conexion.rollback()
+            raise
+        finally:
+            conexion.exec_driver_sql("PRAGMA foreign_keys = ON")
+
+    return [tabla.name for tabla in tablas]
+
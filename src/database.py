@@ -1,5 +1,10 @@
 # database.py
+from decimal import ROUND_HALF_UP, Decimal
+from flask import current_app, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import Integer, event, type_coerce
+from sqlalchemy.orm import Session, raiseload
+from sqlalchemy.types import TypeDecorator
 import os
 
 # Instancia de SQLAlchemy vacía por ahora.
@@ -9,3 +14,159 @@ db = SQLAlchemy()
 DATA_DIR = "data"
 DB_FILE_NAME = "proyecto.db"
 DB_PATH = os.path.join(os.getcwd(), DATA_DIR, DB_FILE_NAME)
+
+
+# --- DINERO EN CÉNTIMOS --- #
+
+
+def a_centimos(valor):
+    """
+    Convierte un importe en euros (Decimal, str, int o float) a céntimos enteros.
+
+    Redondea al céntimo (mitad hacia arriba). Pasa por `str` para que un float
+    como 0.1 no arrastre su error binario.
+
+    Example:
+        >>> a_centimos("30.505")
+        3051
+    """
+
+    return int((Decimal(str(valor)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def a_euros(centimos):
+    """
+    Convierte céntimos enteros a un Decimal en euros con dos decimales.
+
+    Example:
+        >>> a_euros(3050)
+        Decimal('30.50')
+    """
+
+    return Decimal(int(round(centimos))).scaleb(-2)
+
+
+def centimos(expresion):
+    """
+    Trata una columna o expresión `Dinero` como el entero que hay en la BD.
+
+    Para agregados y cálculos en SQL cuyo resultado se procesa en bucles: la
+    consulta devuelve céntimos (int) y la conversión a euros se hace una sola
+    vez, al presentar el dato.
+
+    Example:
+        >>> select(func.sum(centimos(Transaccion.cantidad)))
+    """
+
+    return type_coerce(expresion, Integer)
+
+
+class Dinero(TypeDecorator):
+    """
+    Importe monetario guardado como céntimos enteros (INTEGER).
+
+    En Python se lee y se escribe en euros como Decimal con dos decimales;
+    en la base de datos las sumas y ventanas operan sobre enteros exactos.
+    """
+
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, valor, dialecto):
+        return None if valor is None else a_centimos(valor)
+
+    def process_result_value(self, valor, dialecto):
+        return None if valor is None else a_euros(valor)
+
+
+# --- PERFIL DEL MOTOR SQLITE --- #
+
+# PRAGMAs que se aplican a cada conexión nueva. Se pueden ajustar con
+# `app.config["SQLITE_PRAGMAS"]` (se mezclan con estos valores).
+PERFIL_SQLITE = {
+    # Lectores y escritor no se bloquean entre sí
+    "journal_mode": "WAL",
+    # Con WAL basta sincronizar en cada checkpoint, no en cada commit
+    "synchronous": "NORMAL",
+    # Milisegundos que se espera al cerrojo antes de "database is locked"
+    "busy_timeout": 5000,
+    # Negativo = KiB de caché de páginas por conexión
+    "cache_size": -20000,
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+    "foreign_keys": "ON",
+}
+
+
+def aplicar_pragmas(conexion_dbapi, pragmas):
+    """
+    Ejecuta los PRAGMA indicados sobre una conexión sqlite3 recién abierta.
+
+    Args:
+        conexion_dbapi (sqlite3.Connection): Conexión cruda del driver.
+        pragmas (dict[str, object]): Nombre del PRAGMA y valor a fijar.
+
+    Returns:
+        None
+    """
+
+    cursor = conexion_dbapi.cursor()
+    try:
+        for nombre, valor in pragmas.items():
+            cursor.execute(f"PRAGMA {nombre} = {valor}")
+    finally:
+        cursor.close()
+
+
+def configurar_motor(app):
+    """
+    Aplica el perfil de producción a cada conexión SQLite del motor de la app.
+
+    Debe llamarse después de `db.init_app(app)`. Si la base de datos no es
+    SQLite no hace nada.
+
+    Args:
+        app (Flask): Aplicación ya registrada en `db`.
+
+    Returns:
+        None
+
+    Example:
+        >>> app.config["SQLITE_PRAGMAS"] = {"cache_size": -64000}
+        >>> db.init_app(app)
+        >>> configurar_motor(app)
+    """
+
+    pragmas = {**PERFIL_SQLITE, **app.config.get("SQLITE_PRAGMAS", {})}
+
+    with app.app_context():
+        motor = db.engine
+    if motor.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(motor, "connect")
+    def _al_conectar(conexion_dbapi, registro):
+        aplicar_pragmas(conexion_dbapi, pragmas)
+
+
+# --- MODO ESTRICTO DE CARGAS (TESTS) --- #
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _prohibir_cargas_perezosas(estado):
+    """
+    Con `SQLALCHEMY_RAISELOAD = True` cualquier relación no cargada explícitamente
+    lanza una excepción al acceder a ella en lugar de hacer una consulta más.
+
+    Sirve para detectar N+1 en los tests: las relaciones que una consulta
+    necesita deben pedirse con `joinedload`/`selectinload`.
+    """
+
+    if (
+        estado.is_select
+        and not estado.is_column_load
+        and not estado.is_relationship_load
+        and has_app_context()
+        and current_app.config.get("SQLALCHEMY_RAISELOAD")
+    ):
+        estado.statement = estado.statement.options(raiseload("*"))
@@ -0,0 +1,162 @@
+# instrumentacion.py
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from logging.handlers import RotatingFileHandler
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+
+from database import db
+
+# ---------------------------- INSTRUMENTACIÓN SQL ------------------------------ #
+
+registro_lentas = logging.getLogger("consultas_lentas")
+registro_lentas.propagate = False
+_cerrojo_registro = threading.Lock()
+
+
+def _activa():
+    return has_app_context() and current_app.config.get("INSTRUMENTACION_SQL", False)
+
+
+def _ruta_actual():
+    """Ruta que está ejecutando la sentencia, para el registro ('-' fuera de una petición)."""
+
+    if not has_request_context():
+        return "-"
+    regla = request.url_rule.rule if request.url_rule else request.path
+    return f"{request.method} {regla} ({request.endpoint})"
+
+
+def _preparar_registro(fichero):
+    """Añade (una sola vez por fichero) el manejador rotativo del registro de lentas."""
+
+    with _cerrojo_registro:
+        if any(getattr(h, "baseFilename", None) == fichero for h in registro_lentas.handlers):
+            return
+        for manejador in list(registro_lentas.handlers):
+            registro_lentas.removeHandler(manejador)
+            manejador.close()
+        os.makedirs(os.path.dirname(fichero) or ".", exist_ok=True)
+        manejador = RotatingFileHandler(
+            fichero,
+            maxBytes=current_app.config.get("CONSULTAS_LENTAS_MAX_BYTES", 5 * 1024 * 1024),
+            backupCount=current_app.config.get("CONSULTAS_LENTAS_COPIAS", 3),
+            encoding="utf-8",
+        )
+        manejador.setFormatter(logging.Formatter("%(asctime)s | %(message)s"))
+        registro_lentas.addHandler(manejador)
+        registro_lentas.setLevel(logging.INFO)
+
+
+def _antes_de_ejecutar(conexion, cursor, sentencia, parametros, contexto, executemany):
+    if _activa():
+        conexion.info.setdefault("inicios_sentencia", []).append(time.perf_counter())
+
+
+def _despues_de_ejecutar(conexion, cursor, sentencia, parametros, contexto, executemany):
+    inicios = conexion.info.get("inicios_sentencia")
+    if not inicios or not _activa():
+        return
+    duracion = time.perf_counter() - inicios.pop()
+
+    medidas = g.get("_sql") if has_request_context() else None
+    if medidas is not None:
+        medidas["consultas"] += 1
+        medidas["tiempo"] += duracion
+        medidas["sentencias"][sentencia] += 1
+
+    umbral = current_app.config.get("CONSULTAS_LENTAS_MS", 100)
+    if umbral is not None and duracion * 1000 >= umbral:
+        _preparar_registro(
+            current_app.config.get("CONSULTAS_LENTAS_FICHERO")
+            or os.path.join(current_app.instance_path, "consultas_lentas.log")
+        )
+        # Sin parámetros: pueden llevar hashes de contraseña o datos de tarjetas
+        registro_lentas.info(
+            "%.1f ms | %s | %s", duracion * 1000, _ruta_actual(), " ".join(sentencia.split())
+        )
+
+
+def _al_fallar(contexto_excepcion):
+    # Sin after_cursor_execute: se descarta el inicio para no descuadrar la pila
+    conexion = contexto_excepcion.connection
+    if conexion is not None and conexion.info.get("inicios_sentencia"):
+        conexion.info["inicios_sentencia"].pop()
+
+
+def _al_empezar_peticion():
+    if current_app.config.get("INSTRUMENTACION_SQL", False):
+        g._sql = {
+            "inicio": time.perf_counter(),
+            "consultas": 0,
+            "tiempo": 0.0,
+            "sentencias": Counter(),
+        }
+
+
+def _al_terminar_peticion(respuesta):
+    medidas = g.pop("_sql", None)
+    if medidas is None:
+        return respuesta
+
+    total = (time.perf_counter() - medidas["inicio"]) * 1000
+    sentencia, repeticiones = (medidas["sentencias"].most_common(1) or [(None, 0)])[0]
+    descripcion = f"{medidas['consultas']} consultas"
+    if repeticiones > 1:
+        descripcion += f", max. {repeticiones} iguales"
+    respuesta.headers.add(
+        "Server-Timing",
+        f'db;dur={medidas["tiempo"] * 1000:.2f};desc="{descripcion}", total;dur={total:.2f}',
+    )
+
+    # La firma de un N+1: la misma sentencia una y otra vez en la misma petición
+    aviso = current_app.config.get("INSTRUMENTACION_AVISO_REPETIDAS", 5)
+    if aviso and repeticiones >= aviso:
+        current_app.logger.warning(
+            "Posible N+1 en %s: %d veces la misma sentencia: %s",
+            _ruta_actual(),
+            repeticiones,
+            " ".join(sentencia.split())[:300],
+        )
+    return respuesta
+
+
+def configurar_instrumentacion(app):
+    """
+    Mide las consultas SQL de cada petición cuando `INSTRUMENTACION_SQL` está activo.
+
+    Con la opción activa, cada respuesta lleva una cabecera `Server-Timing`
+    con el número de sentencias, el tiempo total en la base de datos y el
+    tiempo de la petición (visibles en la pestaña de red del navegador); si
+    una misma sentencia se repite `INSTRUMENTACION_AVISO_REPETIDAS` veces o
+    más en una petición (un N+1), se avisa en el log de la aplicación. Las
+    sentencias que tardan `CONSULTAS_LENTAS_MS` o más, dentro o fuera de una
+    petición, se añaden con su ruta a un fichero rotativo
+    (`CONSULTAS_LENTAS_FICHERO`, por defecto `consultas_lentas.log` en la
+    carpeta instance). Desactivada, cada sentencia solo paga la comprobación
+    de la opción.
+
+    Debe llamarse después de `db.init_app(app)`.
+
+    Args:
+        app (Flask): Aplicación ya registrada en `db`.
+
+    Returns:
+        None
+
+    Example:
+        >>> app.config["INSTRUMENTACION_SQL"] = True
+        >>> configurar_instrumentacion(app)
+    """
+
+    with app.app_context():
+        motor = db.engine
+    event.listen(motor, "before_cursor_execute", _antes_de_ejecutar)
+    event.listen(motor, "after_cursor_execute", _despues_de_ejecutar)
+    event.listen(motor, "handle_error", _al_fallar)
+    app.before_request(_al_empezar_peticion)
+    app.after_request(_al_terminar_peticion)
@@ -1,7 +1,11 @@
-import os
-import services
+from app import create_app
+from database import db
 
-# Asegúrate de importar 'engine' para poder cerrarlo al final
-from database import DB_PATH
-from app import app
+# Punto de entrada: `python main.py` (desarrollo) o `flask --app main <comando>`
+app = create_app()
 
+if __name__ == "__main__":
+    # Solo en desarrollo: en producción el esquema lo crea `flask actualizar-esquema`
+    with app.app_context():
+        db.create_all()
+    app.run(debug=True)
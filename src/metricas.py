@@ -0,0 +1,562 @@
+# metricas.py
+import hmac
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import Response, current_app, g, request
+from sqlalchemy import event
+
+from cache import cache_graficos
+from database import db
+
+# ---------------------------- MÉTRICAS ------------------------------ #
+
+# Límites superiores (segundos) de las cubetas de cada histograma
+LIMITES_PETICION = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LIMITES_CONEXION = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+LIMITES_HASH = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0)
+
+HISTOGRAMAS = {
+    "app_peticion_duracion_segundos": (
+        "Duración de las peticiones HTTP por endpoint.",
+        LIMITES_PETICION,
+    ),
+    "app_bd_espera_conexion_segundos": (
+        "Tiempo en obtener una conexión del pool (espera incluida).",
+        LIMITES_CONEXION,
+    ),
+    "app_hash_contrasena_segundos": (
+        "Duración del cálculo o la verificación de un hash de contraseña (cola incluida).",
+        LIMITES_HASH,
+    ),
+}
+CONTADORES = {
+    "app_peticiones_total": "Peticiones HTTP atendidas por endpoint y código de estado.",
+    "app_bd_conexiones_total": "Conexiones obtenidas del pool.",
+    "app_bd_reintentos_escritura_total": "Transacciones de escritura repetidas por 'database is locked'.",
+    "app_transferencias_total": "Transferencias por tipo y resultado.",
+    "app_hash_contrasena_rechazos_total": "Hashes de contraseña rechazados por cola llena.",
+}
+
+
+class _Acumulador:
+    """Contadores e histogramas de un solo hilo: se escriben sin cerrojo."""
+
+    __slots__ = ("contadores", "histogramas")
+
+    def __init__(self):
+        self.contadores = {}
+        self.histogramas = {}  # clave -> [cubeta0, ..., +Inf, suma, total]
+
+
+_hilo = threading.local()
+_acumuladores = []  # (hilo, acumulador) de cada hilo que ha registrado algo
+_retirados = _Acumulador()  # Lo acumulado por hilos que ya han terminado
+_cerrojo = threading.Lock()
+
+
+def _acumulador():
+    try:
+        return _hilo.acumulador
+    except AttributeError:
+        acumulador = _hilo.acumulador = _Acumulador()
+        with _cerrojo:  # Solo la primera vez en cada hilo
+            _acumuladores.append((threading.current_thread(), acumulador))
+        return acumulador
+
+
+def incrementar(nombre, cantidad=1, **etiquetas):
+    """
+    Suma `cantidad` a un contador de `CONTADORES` con las etiquetas dadas.
+
+    Example:
+        >>> incrementar("app_transferencias_total", tipo="individual", resultado="confirmada")
+    """
+
+    contadores = _acumulador().contadores
+    clave = (nombre, tuple(sorted(etiquetas.items())))
+    contadores[clave] = contadores.get(clave, 0) + cantidad
+
+
+def observar(nombre, valor, **etiquetas):
+    """
+    Anota una medida (en segundos) en un histograma de `HISTOGRAMAS`.
+
+    Example:
+        >>> observar("app_peticion_duracion_segundos", 0.012, endpoint="main.index")
+    """
+
+    histogramas = _acumulador().histogramas
+    clave = (nombre, tuple(sorted(etiquetas.items())))
+    cubetas = histogramas.get(clave)
+    limites = HISTOGRAMAS[nombre][1]
+    if cubetas is None:
+        cubetas = histogramas[clave] = [0] * (len(limites) + 3)
+    cubetas[bisect_left(limites, valor)] += 1
+    cubetas[-2] += valor
+    cubetas[-1] += 1
+
+
+def _sumar(destino, origen):
+    for clave, valor in list(origen.contadores.items()):
+        destino.contadores[clave] = destino.contadores.get(clave, 0) + valor
+    for clave, cubetas in list(origen.histogramas.items()):
+        actual = destino.histogramas.setdefault(clave, [0] * len(cubetas))
+        for i, valor in enumerate(list(cubetas)):
+            actual[i] += valor
+
+
+def recoger():
+    """
+    Suma los acumuladores de todos los hilos en uno solo.
+
+    Los de hilos que ya han terminado se pasan a un acumulador común y se
+    olvidan, para que la lista no crezca con cada hilo que muere.
+
+    Returns:
+        _Acumulador: Totales del proceso.
+    """
+
+    total = _Acumulador()
+    with _cerrojo:
+        vivos = []
+        for hilo, acumulador in _acumuladores:
+            if hilo.is_alive():
+                vivos.append((hilo, acumulador))
+            else:
+                _sumar(_retirados, acumulador)
+        _acumuladores[:] = vivos
+        _sumar(total, _retirados)
+        for _, acumulador in vivos:
+            _sumar(total, acumulador)
+    return total
+
+
+def reiniciar():
+    """Pone todas las métricas a cero (tests)."""
+
+    with _cerrojo:
+        for _, acumulador in _acumuladores:
+            acumulador.contadores.clear()
+            acumulador.histogramas.clear()
+        _retirados.contadores.clear()
+        _retirados.histogramas.clear()
+
+
+def _tras_bifurcar():
+    """En un proceso hijo recién bifurcado: cerrojo nuevo y métricas a cero.
+
+    Lo acumulado por el padre ya lo cuenta el padre; el cerrojo podía estar
+    tomado por otro hilo del padre en el momento del fork.
+    """
+
+    global _cerrojo, _cerrojo_volcado, _parar_volcado, _hilo_volcado, _pid_volcado
+    _cerrojo = threading.Lock()
+    _cerrojo_volcado = threading.Lock()
+    _parar_volcado = threading.Event()
+    _hilo_volcado = _pid_volcado = None  # El hilo del padre no existe aquí
+    reiniciar()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_tras_bifurcar)
+
+
+# --- VARIOS PROCESOS --- #
+
+# Con varios procesos (gunicorn) cada uno tiene sus propios acumuladores. Si
+# se fija `METRICAS_DIRECTORIO`, cada proceso vuelca sus totales en
+# `<pid>.json` cada `METRICAS_INTERVALO` segundos y `/metrics` suma los
+# ficheros de todos. Los procesos que terminan pasan lo suyo a
+# `retirados.json`, así que los contadores nunca bajan al reciclar procesos.
+
+FICHERO_RETIRADOS = "retirados.json"
+
+_pid_volcado = None
+_hilo_volcado = None
+_parar_volcado = threading.Event()
+_cerrojo_volcado = threading.Lock()
+
+
+def _serializar(acumulador):
+    return {
+        "contadores": [[n, pares, v] for (n, pares), v in acumulador.contadores.items()],
+        "histogramas": [[n, pares, c] for (n, pares), c in acumulador.histogramas.items()],
+    }
+
+
+def _deserializar(datos):
+    acumulador = _Acumulador()
+    for nombre, pares, valor in datos["contadores"]:
+        acumulador.contadores[(nombre, tuple(map(tuple, pares)))] = valor
+    for nombre, pares, cubetas in datos["histogramas"]:
+        acumulador.histogramas[(nombre, tuple(map(tuple, pares)))] = cubetas
+    return acumulador
+
+
+def _escribir(ruta, acumulador):
+    # Fichero temporal y renombrado: quien lee nunca ve uno a medio escribir
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(_serializar(acumulador), f)
+    os.replace(temporal, ruta)
+
+
+def _leer(ruta):
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            return _deserializar(json.load(f))
+    except FileNotFoundError:
+        return None
+
+
+@contextmanager
+def _bloqueo(directorio, exclusivo):
+    """Cerrojo entre procesos: compartido para leer, exclusivo para retirar un proceso."""
+
+    import fcntl  # Solo POSIX, como gunicorn
+
+    with open(os.path.join(directorio, ".cerrojo"), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def volcar(directorio):
+    """Escribe los totales de este proceso en `<directorio>/<pid>.json`."""
+
+    _escribir(os.path.join(directorio, f"{os.getpid()}.json"), recoger())
+
+
+def recoger_procesos(directorio):
+    """
+    Suma los totales volcados por todos los procesos, con los de este al día.
+
+    Los de los demás procesos tienen como mucho `METRICAS_INTERVALO`
+    segundos de retraso.
+
+    Args:
+        directorio (str): Directorio compartido por los procesos.
+
+    Returns:
+        _Acumulador: Totales de todos los procesos, vivos y terminados.
+    """
+
+    volcar(directorio)
+    total = _Acumulador()
+    with _bloqueo(directorio, exclusivo=False):
+        for nombre in sorted(os.listdir(directorio)):
+            if nombre.endswith(".json"):
+                acumulador = _leer(os.path.join(directorio, nombre))
+                if acumulador is not None:
+                    _sumar(total, acumulador)
+    return total
+
+
+def retirar_proceso(directorio):
+    """
+    Pasa los totales de este proceso a `retirados.json` y borra su fichero.
+
+    Se llama al terminar un proceso (ver `servidor.al_terminar`). Un proceso
+    que muere sin llamarla deja su último volcado, que se sigue sumando.
+
+    Args:
+        directorio (str): Directorio compartido por los procesos.
+
+    Returns:
+        None
+    """
+
+    detener_volcado()
+    retirados = os.path.join(directorio, FICHERO_RETIRADOS)
+    with _bloqueo(directorio, exclusivo=True):
+        total = _leer(retirados) or _Acumulador()
+        _sumar(total, recoger())
+        _escribir(retirados, total)
+        reiniciar()  # Ya cuentan como retirados: no se vuelven a volcar
+        try:
+            os.remove(os.path.join(directorio, f"{os.getpid()}.json"))
+        except FileNotFoundError:
+            pass
+
+
+def limpiar_directorio(directorio):
+    """Crea el directorio de métricas o borra los volcados de una ejecución anterior."""
+
+    os.makedirs(directorio, exist_ok=True)
+    for nombre in os.listdir(directorio):
+        if nombre.endswith((".json", ".tmp")):
+            os.remove(os.path.join(directorio, nombre))
+
+
+def _volcar_periodicamente(directorio, intervalo):
+    while not _parar_volcado.wait(intervalo):
+        try:
+            volcar(directorio)
+        except OSError:
+            pass  # Se reintenta en el siguiente intervalo
+
+
+def _arrancar_volcado(directorio, intervalo):
+    """Arranca el hilo de volcado del proceso (una vez por proceso, también tras un fork)."""
+
+    global _pid_volcado, _hilo_volcado
+    pid = os.getpid()
+    if _pid_volcado == pid:
+        return
+    with _cerrojo_volcado:
+        if _pid_volcado == pid:
+            return
+        _parar_volcado.clear()
+        _hilo_volcado = threading.Thread(
+            target=_volcar_periodicamente,
+            args=(directorio, intervalo),
+            name="metricas-volcado",
+            daemon=True,
+        )
+        _hilo_volcado.start()
+        _pid_volcado = pid
+
+
+def detener_volcado():
+    """Para el hilo de volcado de este proceso (si lo hay) y espera a que termine."""
+
+    global _pid_volcado, _hilo_volcado
+    with _cerrojo_volcado:
+        _parar_volcado.set()
+        hilo, _hilo_volcado = _hilo_volcado, None
+        if hilo is not None:
+            hilo.join()
+        _pid_volcado = None
+
+
+# --- FORMATO DE TEXTO DE PROMETHEUS --- #
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquetas(pares):
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{nombre}="{_escapar(valor)}"' for nombre, valor in pares) + "}"
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def exponer(medidores=None, directorio=None):
+    """
+    Devuelve todas las métricas en el formato de texto de Prometheus (0.0.4).
+
+    Args:
+        medidores (dict[str, tuple[str, list]] | None): Medidores (gauges)
+            calculados en el momento: nombre -> (ayuda, [(etiquetas, valor)]).
+        directorio (str | None): Directorio de volcados; con él se suman los
+            contadores e histogramas de todos los procesos, sin él solo los
+            de este.
+
+    Returns:
+        str: El cuerpo de la respuesta de `/metrics`.
+    """
+
+    total = recoger_procesos(directorio) if directorio else recoger()
+    lineas = []
+
+    for nombre, ayuda in CONTADORES.items():
+        lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} counter"]
+        for (clave, pares), valor in sorted(total.contadores.items()):
+            if clave == nombre:
+                lineas.append(f"{nombre}{_etiquetas(pares)} {_numero(valor)}")
+
+    for nombre, (ayuda, limites) in HISTOGRAMAS.items():
+        lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} histogram"]
+        for (clave, pares), cubetas in sorted(total.histogramas.items()):
+            if clave != nombre:
+                continue
+            acumulado = 0
+            for limite, cuenta in zip((*limites, "+Inf"), cubetas):
+                acumulado += cuenta
+                le = limite if limite == "+Inf" else repr(float(limite))
+                lineas.append(f"{nombre}_bucket{_etiquetas((*pares, ('le', le)))} {acumulado}")
+            lineas.append(f"{nombre}_sum{_etiquetas(pares)} {_numero(float(cubetas[-2]))}")
+            lineas.append(f"{nombre}_count{_etiquetas(pares)} {cubetas[-1]}")
+
+    for nombre, (ayuda, valores) in (medidores or {}).items():
+        lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} gauge"]
+        for pares, valor in valores:
+            lineas.append(f"{nombre}{_etiquetas(tuple(pares.items()))} {_numero(valor)}")
+
+    return "\n".join(lineas) + "\n"
+
+
+# --- INTEGRACIÓN CON FLASK Y SQLALCHEMY --- #
+
+
+def _al_empezar_peticion():
+    g._inicio_metricas = time.perf_counter()
+    directorio = current_app.config.get("METRICAS_DIRECTORIO")
+    if directorio:
+        _arrancar_volcado(directorio, current_app.config.get("METRICAS_INTERVALO", 5))
+
+
+def _anotar_peticion(codigo):
+    inicio = g.pop("_inicio_metricas", None)
+    if inicio is None:
+        return
+    endpoint = request.endpoint or "sin_ruta"
+    observar("app_peticion_duracion_segundos", time.perf_counter() - inicio, endpoint=endpoint)
+    incrementar("app_peticiones_total", endpoint=endpoint, codigo=codigo)
+
+
+def _al_terminar_peticion(respuesta):
+    _anotar_peticion(respuesta.status_code)
+    return respuesta
+
+
+def _al_desmontar_peticion(error):
+    # Solo queda el inicio si la petición acabó en una excepción sin manejar
+    if error is not None:
+        _anotar_peticion(500)
+
+
+def _medir_pool(pool):
+    """Envuelve `pool.connect` para medir cuánto tarda en entregar una conexión."""
+
+    connect = pool.connect
+
+    def connect_medido():
+        inicio = time.perf_counter()
+        conexion = connect()
+        observar("app_bd_espera_conexion_segundos", time.perf_counter() - inicio)
+        incrementar("app_bd_conexiones_total")
+        return conexion
+
+    pool.connect = connect_medido
+
+
+def _medidores(por_proceso=False):
+    """
+    Valores instantáneos: pool de conexiones, caché de gráficos y cola de tareas.
+
+    El pool y la caché son de cada proceso: con `por_proceso` llevan la
+    etiqueta `pid` del proceso que responde. La cola se lee de la base de
+    datos y es la misma para todos.
+    """
+
+    # Aquí y no arriba: los servicios importan este módulo para anotar sus métricas
+    from services import estadisticas_cola
+
+    proceso = {"pid": os.getpid()} if por_proceso else {}
+    pool = db.engine.pool
+    medidores = {}
+    if hasattr(pool, "checkedout"):
+        medidores["app_bd_conexiones_en_uso"] = (
+            "Conexiones del pool prestadas ahora mismo.",
+            [(proceso, pool.checkedout())],
+        )
+    cache = cache_graficos.estadisticas()
+    medidores["app_cache_graficos_aciertos"] = (
+        "Aciertos de la caché de gráficos desde el arranque.",
+        [(proceso, cache["aciertos"])],
+    )
+    medidores["app_cache_graficos_fallos"] = (
+        "Fallos de la caché de gráficos desde el arranque.",
+        [(proceso, cache["fallos"])],
+    )
+    cola = estadisticas_cola()
+    medidores["app_cola_tareas"] = (
+        "Tareas en la cola por estado.",
+        [({"estado": estado}, cola[estado]) for estado in ("pendientes", "en_curso", "fallidas")],
+    )
+    medidores["app_cola_retraso_segundos"] = (
+        "Antigüedad de la tarea pendiente más antigua.",
+        [({}, cola["retraso_s"] or 0)],
+    )
+    return medidores
+
+
+# Con METRICAS_TOKEN sin configurar, /metrics solo responde a estas direcciones
+DIRECCIONES_LOCALES = ("127.0.0.1", "::1")
+
+
+def _acceso_metricas():
+    """Código de error si la petición no puede leer `/metrics`; None si puede."""
+
+    token = current_app.config.get("METRICAS_TOKEN")
+    if token:
+        cabecera = request.headers.get("Authorization", "")
+        # Comparación en tiempo constante: no da pistas del token por la latencia
+        if not hmac.compare_digest(cabecera.encode(), f"Bearer {token}".encode()):
+            return 401
+    elif request.remote_addr not in DIRECCIONES_LOCALES:
+        return 403
+    return None
+
+
+def vista_metricas():
+    """Endpoint `/metrics` para Prometheus (con token o solo desde la propia máquina)."""
+
+    if not current_app.config.get("METRICAS_ACTIVAS", True):
+        return "", 404
+    codigo = _acceso_metricas()
+    if codigo == 401:
+        return "", 401, {"WWW-Authenticate": 'Bearer realm="metrics"'}
+    if codigo:
+        return "", codigo
+    directorio = current_app.config.get("METRICAS_DIRECTORIO")
+    texto = exponer(_medidores(por_proceso=bool(directorio)), directorio)
+    return Response(texto, mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+
+def configurar_metricas(app):
+    """
+    Registra la recogida de métricas de la aplicación y el endpoint `/metrics`.
+
+    Mide la latencia de cada petición por endpoint del blueprint
+    (`main.index`, `auth.login`...) y el tiempo en obtener conexiones del
+    pool; el resto de contadores (transferencias, hashes de contraseña) los
+    anotan los propios servicios con `incrementar` y `observar`. Cada hilo
+    acumula en sus propios diccionarios sin cerrojo y `/metrics` los suma al
+    leer, así que anotar una medida no compite con otros hilos.
+    `METRICAS_ACTIVAS = False` oculta el endpoint. Con `METRICAS_TOKEN` hay
+    que enviar `Authorization: Bearer <token>`; sin él, `/metrics` solo
+    responde a peticiones desde la propia máquina.
+
+    Con varios procesos, `METRICAS_DIRECTORIO` (un directorio local
+    compartido por todos) hace que `/metrics` devuelva la suma de todos los
+    procesos y no solo la del que atiende la petición.
+
+    Debe llamarse después de `db.init_app(app)`.
+
+    Args:
+        app (Flask): Aplicación ya registrada en `db`.
+
+    Returns:
+        None
+    """
+
+    if app.config.get("METRICAS_DIRECTORIO"):
+        os.makedirs(app.config["METRICAS_DIRECTORIO"], exist_ok=True)
+
+    with app.app_context():
+        motor = db.engine
+    _medir_pool(motor.pool)
+
+    @event.listens_for(motor, "engine_disposed")
+    def _pool_nuevo(motor):
+        # dispose() sustituye el pool: se vuelve a envolver el nuevo
+        _medir_pool(motor.pool)
+
+    app.before_request(_al_empezar_peticion)
+    app.after_request(_al_terminar_peticion)
+    app.teardown_request(_al_desmontar_peticion)
+    app.add_url_rule("/metrics", "metricas", vista_metricas)
@@ -1,5 +1,10 @@
 from .cartera import Cartera
+from .fraccion_saldo import FraccionSaldo
+from .punto_control import PuntoControl
 from .recargar import Recargar
+from .resumen_mensual import ResumenMensual
+from .saldo_diario import SaldoDiario
+from .tarea import Tarea
 from .tarjeta import Tarjeta
 from .transaccion import Transaccion
 from .usuario import Usuario
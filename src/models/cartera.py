@@ -1,14 +1,74 @@
-from database import db
+from sqlalchemy import case, func, select, type_coerce
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import column_property
+
+from database import Dinero, centimos, db
+from .fraccion_saldo import FraccionSaldo
 
 # ---------------------------- CARTERA ------------------------------ #
 
 
+def _de_fracciones(agregado, id_cartera):
+    """Subconsulta correlacionada con un agregado de las fracciones de la cartera."""
+
+    return (
+        select(agregado).where(FraccionSaldo.id_cartera == id_cartera).scalar_subquery()
+    )
+
+
 class Cartera(db.Model):
     __tablename__ = "CARTERAS"
 
     id = db.Column(db.Integer, primary_key=True)
-    cantidad = db.Column(db.Numeric(10, 2, asdecimal=True), default=0.00)
-    id_usuario = db.Column(db.Integer, db.ForeignKey("USUARIOS.id", ondelete="CASCADE"))
+    # Saldo de la propia fila; las UPDATE de saldo escriben aquí
+    cantidad_base = db.Column("cantidad", Dinero, default=0.00)
+    id_usuario = db.Column(
+        db.Integer, db.ForeignKey("USUARIOS.id", ondelete="CASCADE"), index=True
+    )
+    # Cambian con cada movimiento de saldo: validadores HTTP (ETag / Last-Modified)
+    version_base = db.Column(
+        "version", db.Integer, nullable=False, default=0, server_default="0"
+    )
+    modificada_base = db.Column("modificada", db.DateTime)
+    # 0: saldo en una sola fila. N > 0: abonos repartidos en N filas de FRACCIONES_SALDO
+    fracciones = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+    # Totales de una cartera fraccionada (fila + fracciones). Diferidos: las
+    # cargas normales no llevan las subconsultas y solo las carteras con
+    # fracciones los leen, los tres en una SELECT aparte (ver `cantidad`).
+    cantidad_total = column_property(
+        type_coerce(
+            centimos(cantidad_base)
+            + _de_fracciones(
+                func.coalesce(func.sum(centimos(FraccionSaldo.cantidad)), 0), id
+            ),
+            Dinero,
+        ),
+        deferred=True,
+        group="fracciones",
+    )
+    version_total = column_property(
+        version_base
+        + _de_fracciones(func.coalesce(func.sum(FraccionSaldo.version), 0), id),
+        deferred=True,
+        group="fracciones",
+    )
+    modificada_total = column_property(
+        type_coerce(
+            # max() de SQLite con dos argumentos: el más reciente de ambos
+            func.max(
+                func.coalesce(
+                    modificada_base, _de_fracciones(func.max(FraccionSaldo.modificada), id)
+                ),
+                func.coalesce(
+                    _de_fracciones(func.max(FraccionSaldo.modificada), id), modificada_base
+                ),
+            ),
+            db.DateTime,
+        ),
+        deferred=True,
+        group="fracciones",
+    )
 
     propietario = db.relationship("Usuario", back_populates="cartera")
     recargas = db.relationship("Recargar", back_populates="cartera")
@@ -19,3 +79,45 @@ class Cartera(db.Model):
     transacciones_recibidas = db.relationship(
         "Transaccion", foreign_keys="Transaccion.id_cartera_recibido"
     )
+
+    # Lo que lee el resto de la aplicación. Sin fracciones (casi todas las
+    # carteras) es la propia fila; en SQL, el CASE evita las subconsultas.
+
+    @hybrid_property
+    def cantidad(self):
+        """Saldo de la cartera: el de su fila, más el de sus fracciones si las tiene."""
+
+        return self.cantidad_total if self.fracciones else self.cantidad_base
+
+    @cantidad.inplace.expression
+    @classmethod
+    def _cantidad_sql(cls):
+        return case((cls.fracciones > 0, cls.cantidad_total), else_=cls.cantidad_base)
+
+    @hybrid_property
+    def version(self):
+        """Versión del saldo (validadores HTTP): la de la fila más la de sus fracciones."""
+
+        return self.version_total if self.fracciones else self.version_base
+
+    @version.inplace.expression
+    @classmethod
+    def _version_sql(cls):
+        return case((cls.fracciones > 0, cls.version_total), else_=cls.version_base)
+
+    @hybrid_property
+    def modificada(self):
+        """Último cambio de saldo: de la fila o, si está fraccionada, de cualquier fracción."""
+
+        return self.modificada_total if self.fracciones else self.modificada_base
+
+    @modificada.inplace.expression
+    @classmethod
+    def _modificada_sql(cls):
+        return case((cls.fracciones > 0, cls.modificada_total), else_=cls.modificada_base)
+
+    def __init__(self, cantidad=None, **kwargs):
+        # `cantidad` es de solo lectura (suma); al crear la cartera va a la fila
+        if cantidad is not None:
+            kwargs["cantidad_base"] = cantidad
+        super().__init__(**kwargs)
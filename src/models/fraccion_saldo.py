@@ -0,0 +1,25 @@
+from database import Dinero, db
+
+# ---------------------------- FRACCIÓN DE SALDO ------------------------------ #
+
+
+class FraccionSaldo(db.Model):
+    """Una de las N partes en que se reparte el saldo de una cartera muy concurrida.
+
+    Con `Cartera.fracciones = N` los abonos van a una fracción al azar en lugar
+    de a la fila de CARTERAS, de modo que muchos pagos simultáneos a la misma
+    cartera no se ponen en cola sobre una sola fila. El saldo de la cartera es
+    el de su fila más la suma de sus fracciones (`Cartera.cantidad` ya lo da
+    sumado); `compactar_fracciones` lo vuelve a juntar en la fila de CARTERAS.
+    """
+
+    __tablename__ = "FRACCIONES_SALDO"
+
+    id_cartera = db.Column(
+        db.Integer, db.ForeignKey("CARTERAS.id", ondelete="CASCADE"), primary_key=True
+    )
+    fraccion = db.Column(db.Integer, primary_key=True)  # 0 .. N-1
+    cantidad = db.Column(Dinero, nullable=False, default=0)
+    # Cada abono a la fracción la cambia, como CARTERAS.version
+    version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    modificada = db.Column(db.DateTime)
@@ -0,0 +1,21 @@
+from database import Dinero, db
+
+# ---------------------------- PUNTO DE CONTROL ------------------------------ #
+
+
+class PuntoControl(db.Model):
+    """Saldo de una cartera al comienzo de un día (00:00), guardado de una vez.
+
+    Los escribe `generar_puntos_control` al principio de cada mes y
+    `crear_punto_control` en cualquier fecha. Para saber el saldo en un
+    momento T basta con el último punto anterior a T más los movimientos
+    entre ambos, sin recorrer todo el historial.
+    """
+
+    __tablename__ = "PUNTOS_CONTROL"
+
+    id_cartera = db.Column(
+        db.Integer, db.ForeignKey("CARTERAS.id", ondelete="CASCADE"), primary_key=True
+    )
+    fecha = db.Column(db.Date, primary_key=True)
+    saldo = db.Column(Dinero, nullable=False)
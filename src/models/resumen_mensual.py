@@ -0,0 +1,21 @@
+from database import Dinero, db
+
+# ---------------------------- RESUMEN MENSUAL ------------------------------ #
+
+
+class ResumenMensual(db.Model):
+    """Contadores mensuales de una cartera: total ingresado y gastado en el mes.
+
+    Se mantienen en la misma transacción que cada movimiento, junto con
+    SALDOS_DIARIOS, para que la página principal lea los gastos del mes con
+    una búsqueda por clave primaria en lugar de sumar TRANSACCIONES.
+    """
+
+    __tablename__ = "RESUMENES_MENSUALES"
+
+    id_cartera = db.Column(
+        db.Integer, db.ForeignKey("CARTERAS.id", ondelete="CASCADE"), primary_key=True
+    )
+    mes = db.Column(db.Date, primary_key=True)  # Día 1 del mes
+    ingresos = db.Column(Dinero, nullable=False, default=0)
+    gastos = db.Column(Dinero, nullable=False, default=0)
@@ -0,0 +1,22 @@
+from database import Dinero, db
+
+# ---------------------------- SALDO DIARIO ------------------------------ #
+
+
+class SaldoDiario(db.Model):
+    """Resumen diario de una cartera: entradas, salidas y saldo al cierre del día.
+
+    Se mantiene en la misma transacción que cada movimiento (transferencia o
+    recarga) para que los gráficos lean unas pocas filas en lugar de recorrer
+    toda la tabla TRANSACCIONES.
+    """
+
+    __tablename__ = "SALDOS_DIARIOS"
+
+    id_cartera = db.Column(
+        db.Integer, db.ForeignKey("CARTERAS.id", ondelete="CASCADE"), primary_key=True
+    )
+    fecha = db.Column(db.Date, primary_key=True)
+    entradas = db.Column(Dinero, nullable=False, default=0)
+    salidas = db.Column(Dinero, nullable=False, default=0)
+    saldo_cierre = db.Column(Dinero, nullable=False, default=0)
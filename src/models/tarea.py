@@ -0,0 +1,27 @@
+from database import db
+
+# ---------------------------- TAREA EN COLA ------------------------------ #
+
+
+class Tarea(db.Model):
+    """Trabajo pendiente de la cola local (ver `services.cola_service`).
+
+    Las tareas se añaden en la misma transacción que el cambio que las origina
+    y los trabajadores las reservan por lotes del mismo tipo. Mientras una
+    tarea está reservada, `disponible_en` marca cuándo vence la reserva: si el
+    trabajador muere sin terminarla, otro la vuelve a tomar. Las terminadas se
+    borran; las que agotan los reintentos quedan como 'fallida'.
+    """
+
+    __tablename__ = "TAREAS"
+    # Reserva: estado + vencimiento + tipo, sin tocar la tabla; también las métricas
+    __table_args__ = (db.Index("ix_tareas_estado_disponible_tipo", "estado", "disponible_en", "tipo"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(50), nullable=False)
+    datos = db.Column(db.Text, nullable=False, default="{}")  # JSON
+    estado = db.Column(db.String(10), nullable=False, default="pendiente")  # pendiente/en_curso/fallida
+    intentos = db.Column(db.Integer, nullable=False, default=0)
+    disponible_en = db.Column(db.DateTime, nullable=False)
+    creada = db.Column(db.DateTime, server_default=db.func.now())
+    error = db.Column(db.Text)
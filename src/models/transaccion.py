@@ -1,13 +1,29 @@
-from database import db
+from database import Dinero, db
 
 # ---------------------------- TRANSACCION ------------------------------ #
 
 
 class Transaccion(db.Model):
     __tablename__ = "TRANSACCIONES"
+    __table_args__ = (
+        # Historial, índice y gráficos filtran por cartera y ordenan/acotan por fecha;
+        # con la cantidad incluida, las sumas por periodo no tocan la tabla
+        db.Index(
+            "ix_transacciones_enviado_fecha_cantidad",
+            "id_cartera_enviado",
+            "fecha",
+            "cantidad",
+        ),
+        db.Index(
+            "ix_transacciones_recibido_fecha_cantidad",
+            "id_cartera_recibido",
+            "fecha",
+            "cantidad",
+        ),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    cantidad = db.Column(db.Float(asdecimal=True), nullable=False)
+    cantidad = db.Column(Dinero, nullable=False)
     fecha = db.Column(db.DateTime, server_default=db.func.now())
 
     id_cartera_enviado = db.Column(db.Integer, db.ForeignKey("CARTERAS.id"))
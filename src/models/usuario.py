@@ -8,7 +8,7 @@ class Usuario(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     dni = db.Column(db.String(9), unique=True, nullable=False)
-    nombre = db.Column(db.String(50), nullable=False)
+    nombre = db.Column(db.String(50), nullable=False, index=True)
     apellidos = db.Column(db.String(75), nullable=False)
     usuario = db.Column(db.String(50), unique=True, nullable=False)
     contrasena = db.Column(db.String, nullable=False)
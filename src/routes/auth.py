@@ -1,5 +1,5 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
-from services import login_usuario, logout_usuario, crear_usuario
+from services import login_usuario, logout_usuario, crear_usuario, HashingSaturado
 
 auth_bp = Blueprint("auth", __name__)
 # =================================== USUARIO ================================= #
@@ -23,6 +23,7 @@ def login():
             - Redirección a `main.index` si el login es exitoso.
             - Renderiza la plantilla `usuario/login.html` con mensajes flash si falla la validación
               o si el método es GET.
+            - La misma plantilla con estado 503 si el pool de hashing está saturado.
     """
 
     if request.method == "POST":
@@ -30,7 +31,11 @@ def login():
         user_input = request.form.get("nombre_usuario")
         pass_input = request.form.get("contraseña")
 
-        usuario = login_usuario(user_input, pass_input)
+        try:
+            usuario = login_usuario(user_input, pass_input)
+        except HashingSaturado as e:
+            flash(str(e), "danger")
+            return render_template("usuario/login.html"), 503
 
         if usuario:
             flash(f"Bienvenido de nuevo, {usuario.nombre}", "success")
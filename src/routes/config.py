@@ -1,5 +1,6 @@
 # routes/config.py
 from flask import Blueprint, render_template, redirect, url_for, flash, request
+from sqlalchemy.exc import IntegrityError
 from database import db
 from models import Usuario
 from models import Tarjeta
@@ -8,13 +9,11 @@ from services import (
     obtener_usuario_actual,
     registrada_tarjeta,
     guardar_tarjeta_en_db,
-    obtener_tarjetas_por_usuario
+    hash_password,
+    verificar_hash,
+    HashingSaturado,
 )
 
-
-from werkzeug.security import generate_password_hash, check_password_hash
-
-from services import obtener_tarjetas_por_usuario
 from utils import validar_datos_tarjeta_form
 
 # Creamos el Blueprint
@@ -98,7 +97,8 @@ def actualizar_contrasena():
         None (explícito en la función, pero espera datos de formulario en 'request')
 
     Returns:
-        redirect: Una redirección a la página de la cuenta.
+        redirect: Una redirección a la página de la cuenta, o la página con
+            estado 503 si el pool de hashing está saturado.
     """
 
     pass_actual = request.form.get("pass_actual")
@@ -106,10 +106,18 @@ def actualizar_contrasena():
     pass_confirmar = request.form.get("pass_confirmar")
     usuario_actual = obtener_usuario_actual()
 
-    # Verificar la contraseña actual (suponiendo que usaste generate_password_hash al crear al usuario)
+    # Verificar la contraseña actual (el hash se calcula en el pool de procesos)
     if pass_nuevo == pass_confirmar:
-        if check_password_hash(usuario_actual.contrasena, pass_actual):  # type: ignore
-            usuario_actual.contrasena = generate_password_hash(pass_nuevo)  # type: ignore
+        try:
+            correcta = verificar_hash(usuario_actual.contrasena, pass_actual)  # type: ignore
+            if correcta:
+                usuario_actual.contrasena = hash_password(pass_nuevo)  # type: ignore
+        except HashingSaturado as e:
+            db.session.rollback()
+            flash(str(e), "danger")
+            return render_template("configuracion/cuenta.html"), 503
+
+        if correcta:
             db.session.commit()
             flash("Contraseña actualizada correctamente.", "success")
         else:
@@ -145,7 +153,7 @@ def notificaciones():
 @config_bp.route("/opciones-de-pago")
 def opciones_de_pago():
     usuario_actual = obtener_usuario_actual()
-    tarjetas = obtener_tarjetas_por_usuario(usuario_actual.id)
+    tarjetas = usuario_actual.tarjetas
     return render_template("configuracion/opciones-de-pago.html", tarjetas=tarjetas)
 
 
@@ -195,7 +203,7 @@ def anadir_tarjeta():
 @config_bp.route("/mis-tarjetas", methods=["GET", "POST"])
 def mis_tarjetas():
     usuario_actual = obtener_usuario_actual()
-    tarjetas = obtener_tarjetas_por_usuario(usuario_actual.id)
+    tarjetas = usuario_actual.tarjetas
     
     # Para no depender de funciones inexistentes, solo mostramos tarjetas
     return render_template(
@@ -212,11 +220,17 @@ def mis_tarjetas():
 def eliminar_tarjeta():
     tarjeta_id = request.form.get("tarjeta_id")
     if tarjeta_id:
-        t = Tarjeta.query.get(tarjeta_id)
+        t = db.session.get(Tarjeta, tarjeta_id)
         if t:
             db.session.delete(t)
-            db.session.commit()
-            flash("Tarjeta eliminada correctamente", "success")
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # Con foreign_keys=ON no se borra una tarjeta con recargas que la citan
+                db.session.rollback()
+                flash("No se puede eliminar una tarjeta con recargas registradas", "danger")
+            else:
+                flash("Tarjeta eliminada correctamente", "success")
         else:
             flash("Tarjeta no encontrada", "danger")
     else:
@@ -239,7 +253,7 @@ def compartir_tarjeta():
         mensaje = f"El usuario '{usuario_nombre}' no existe"
         return render_template(
             "configuracion/mis-tarjetas.html",
-            tarjetas=obtener_tarjetas_por_usuario(obtener_usuario_actual().id),
+            tarjetas=obtener_usuario_actual().tarjetas,
             mensaje=mensaje
         )
 
@@ -249,6 +263,6 @@ def compartir_tarjeta():
 
     return render_template(
         "configuracion/mis-tarjetas.html",
-        tarjetas=obtener_tarjetas_por_usuario(obtener_usuario_actual().id),
+        tarjetas=obtener_usuario_actual().tarjetas,
         mensaje=mensaje
     )
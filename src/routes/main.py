@@ -1,12 +1,47 @@
 from decimal import Decimal, InvalidOperation
-from flask import Blueprint, render_template, redirect, url_for, jsonify, request, flash
+from flask import (
+    Blueprint,
+    Response,
+    render_template,
+    redirect,
+    url_for,
+    jsonify,
+    request,
+    flash,
+    stream_with_context,
+)
+from cache import cache_movimientos
 from database import db
-from datetime import datetime
-from sqlalchemy import func
-from models import Transaccion, Usuario, Cartera
-from services import esta_autenticado, obtener_usuario_actual
-from utils import traducir_mes, obtener_datos_grafico_saldo_evolutivo
-from services import obtener_tarjetas_por_usuario
+from datetime import datetime, time
+from models import Transaccion, Usuario, Cartera, Recargar
+from services import (
+    esta_autenticado,
+    obtener_usuario_actual,
+    obtener_id_cartera_por_usuario,
+    recargar_cartera,
+    transferir,
+    transferir_lote,
+    leer_lote_csv,
+    TransferenciaRechazada,
+    obtener_pagina_historial,
+    contar_movimientos,
+    exportar_historial,
+    FORMATOS_EXPORTACION,
+    obtener_gastos_mes,
+)
+from utils import (
+    traducir_mes,
+    obtener_datos_graficos_cacheado,
+    obtener_serie_grafico_cacheado,
+    calendario_serie,
+    METRICAS_GRAFICO,
+    RANGOS_GRAFICO,
+    GRANULARIDADES,
+    etag_cartera,
+    respuesta_no_modificada,
+    con_validadores,
+    comprimir_gzip,
+)
 
 main_bp = Blueprint("main", __name__)
 
@@ -25,7 +60,8 @@ def verificar_sesion():
 def index():
     """Renderiza la página de inicio de la cuenta, mostrando los gastos mensuales del usuario.
 
-    Recupera el total de transacciones enviadas por el usuario en el mes y año actual.
+    Recupera el total de transacciones enviadas por el usuario en el mes y año actual
+    desde el contador mensual de su cartera (RESUMENES_MENSUALES).
 
     Args:
         None (espera parámetros de contexto estándar de Flask/Jinja si los hubiera)
@@ -38,17 +74,8 @@ def index():
     usuario_actual = obtener_usuario_actual()
 
     # --- GASTOS MENSUALES ---
-    # Suma las transacciones ENVIADAS por el usuario en el mes y año actual
-    gastos_mensuales = (
-        db.session.query(func.sum(Transaccion.cantidad))
-        .filter(
-            Transaccion.id_cartera_enviado == usuario_actual.cartera.id,  # type: ignore
-            func.extract("month", Transaccion.fecha) == hoy.month,
-            func.extract("year", Transaccion.fecha) == hoy.year,
-        )
-        .scalar()
-        or 0.0
-    )
+    # Contador mensual de la cartera (clave primaria), mantenido con cada movimiento
+    gastos_mensuales = obtener_gastos_mes(usuario_actual.cartera.id, hoy)  # type: ignore
 
     # Obtener el nombre del mes actual en español (ej. "enero")
     # %B formatea el nombre completo del mes, y .capitalize() pone la primera en mayúscula
@@ -68,21 +95,163 @@ def api_grafico(rango):
     """Endpoint API para obtener datos del gráfico de evolución de saldo.
 
     Requiere autenticación. Devuelve datos formateados en JSON para ser consumidos por JavaScript.
+    Admite peticiones condicionales: si la cartera no ha cambiado (mismo ETag
+    o sin cambios desde If-Modified-Since) responde 304 sin calcular el gráfico.
+    Si hay que enviarlo, se calcula como la serie 'saldo' de `/api/graficos`
+    (y comparte con ella la caché de gráficos).
 
     Args:
-        rango (str): El rango de tiempo para el cual obtener los datos (ej. 'semana', 'mes', 'año').
+        rango (str): El rango de tiempo del gráfico: 'semanal', 'mensual' o 'anual'.
 
     Returns:
-        jsonify: Un objeto JSON con los datos del gráfico o un mensaje de error 401 si no está autenticado.
+        jsonify: Un objeto JSON con 'labels' y 'values', un 304 si el cliente ya lo
+            tiene, un 400 si el rango no es válido o un error 401 si no está autenticado.
     """
 
     if not esta_autenticado():
         return jsonify({"error": "No autorizado"}), 401
+    if rango not in RANGOS_GRAFICO:
+        return jsonify({"error": "Rango no válido", "rangos": list(RANGOS_GRAFICO)}), 400
 
-    usuario_actual = obtener_usuario_actual()
+    cartera = obtener_usuario_actual().cartera  # type: ignore
+
+    # El gráfico depende también del día actual (ventana y etiquetas)
+    hoy = datetime.now().date()
+    etag = etag_cartera(cartera, rango, hoy)
+    modificada = max(cartera.modificada or datetime.min, datetime.combine(hoy, time.min))
+
+    no_modificada = respuesta_no_modificada(etag, modificada)
+    if no_modificada:
+        return no_modificada
+
+    serie = obtener_datos_graficos_cacheado(cartera, ["saldo"], [rango])[rango]
+    datos = {"labels": serie["labels"], "values": serie["saldo"]}
+    return con_validadores(jsonify(datos), etag, modificada)
+
+
+def _lista_parametro(nombre, admitidos):
+    """Lee un parámetro 'a,b,c' de la URL; sin él, todos los admitidos. None si hay alguno inválido."""
+
+    valor = request.args.get(nombre)
+    if not valor:
+        return list(admitidos)
+    pedidos = list(dict.fromkeys(p.strip() for p in valor.split(",") if p.strip()))
+    if not pedidos or any(p not in admitidos for p in pedidos):
+        return None
+    return pedidos
+
+
+@main_bp.route("/api/graficos")
+def api_graficos():
+    """Endpoint API con varias series del panel (saldo, ingresos, gastos) a la vez.
+
+    Las métricas y rangos se piden por la URL, p. ej.
+    `/api/graficos?metricas=saldo,gastos&rangos=semanal,anual` (sin ellos, todos).
+    Todas las series salen de una sola lectura de los movimientos de la cartera
+    y, como `/api/grafico/<rango>`, admite peticiones condicionales y se sirve
+    desde la caché de gráficos.
+
+    Returns:
+        jsonify: Un objeto JSON con, por rango, 'labels' y una lista por métrica;
+            un 304 si el cliente ya lo tiene o un 400 si algún nombre no es válido.
+    """
+
+    if not esta_autenticado():
+        return jsonify({"error": "No autorizado"}), 401
+
+    metricas = _lista_parametro("metricas", METRICAS_GRAFICO)
+    rangos = _lista_parametro("rangos", RANGOS_GRAFICO)
+    if metricas is None or rangos is None:
+        return (
+            jsonify(
+                {
+                    "error": "Parámetros no válidos",
+                    "metricas": list(METRICAS_GRAFICO),
+                    "rangos": list(RANGOS_GRAFICO),
+                }
+            ),
+            400,
+        )
+
+    cartera = obtener_usuario_actual().cartera  # type: ignore
 
-    datos = obtener_datos_grafico_saldo_evolutivo(usuario_actual.cartera.id, rango)  # type: ignore
-    return jsonify(datos)
+    hoy = datetime.now().date()
+    etag = etag_cartera(cartera, "panel", ",".join(metricas), ",".join(rangos), hoy)
+    modificada = max(cartera.modificada or datetime.min, datetime.combine(hoy, time.min))
+
+    no_modificada = respuesta_no_modificada(etag, modificada)
+    if no_modificada:
+        return no_modificada
+
+    datos = obtener_datos_graficos_cacheado(cartera, metricas, rangos)
+    return con_validadores(jsonify(datos), etag, modificada)
+
+
+@main_bp.route("/api/graficos/serie")
+def api_serie_grafico():
+    """Endpoint API con las series de una ventana de fechas cualquiera.
+
+    Parámetros: `desde` (obligatorio) y `hasta` (por defecto, ahora) en ISO
+    8601, `granularidad` ('hora', 'dia', 'semana' o 'mes'; por defecto 'dia')
+    y `metricas` como en `/api/graficos`, p. ej.
+    `/api/graficos/serie?desde=2026-01-01&granularidad=semana&metricas=gastos`.
+    Si la ventana tiene demasiados puntos se devuelve con una granularidad
+    más gruesa (la respuesta indica la usada).
+
+    Returns:
+        jsonify: Un objeto JSON con 'granularidad', 'desde', 'hasta', 'labels'
+            y una lista por métrica; un 304 si el cliente ya lo tiene o un 400
+            si algún parámetro no es válido.
+    """
+
+    if not esta_autenticado():
+        return jsonify({"error": "No autorizado"}), 401
+
+    metricas = _lista_parametro("metricas", METRICAS_GRAFICO)
+    granularidad = request.args.get("granularidad", "dia")
+    try:
+        desde = datetime.fromisoformat(request.args.get("desde", ""))
+        hasta = datetime.fromisoformat(request.args.get("hasta") or datetime.now().isoformat())
+        # Las fechas de la BD son locales, sin zona horaria
+        if metricas is None or desde.tzinfo or hasta.tzinfo:
+            raise ValueError("Parámetros no válidos")
+        # Ventana ajustada a las cubetas: peticiones equivalentes comparten ETag y caché
+        granularidad, limites, _ = calendario_serie(desde, hasta, granularidad)
+    except ValueError as e:
+        return (
+            jsonify(
+                {
+                    "error": str(e),
+                    "metricas": list(METRICAS_GRAFICO),
+                    "granularidades": list(GRANULARIDADES),
+                }
+            ),
+            400,
+        )
+    desde, hasta = limites[0], limites[-1]
+
+    cartera = obtener_usuario_actual().cartera  # type: ignore
+
+    # Si la ventana llega al presente, la respuesta cambia también cada hora
+    ahora = datetime.now()
+    hora = ahora.replace(minute=0, second=0, microsecond=0) if hasta > ahora else None
+    etag = etag_cartera(
+        cartera,
+        "serie",
+        desde.isoformat(),
+        hasta.isoformat(),
+        granularidad,
+        ",".join(metricas),
+        hora.isoformat() if hora else "",
+    )
+    modificada = max(filter(None, (cartera.modificada, hora)), default=None)
+
+    no_modificada = respuesta_no_modificada(etag, modificada)
+    if no_modificada:
+        return no_modificada
+
+    datos = obtener_serie_grafico_cacheado(cartera, desde, hasta, granularidad, metricas)
+    return con_validadores(jsonify(datos), etag, modificada)
 
 
 # =================================== PÁGINA PRINCIPAL ================================= #
@@ -99,19 +268,19 @@ def transferencias():
 
     error_transferencia = ""
 
-    # 🔹 OBTENER TARJETAS DEL USUARIO
-    tarjetas = obtener_tarjetas_por_usuario(usuario_actual.id)
+    # 🔹 OBTENER TARJETAS DEL USUARIO (ya cargadas junto al usuario)
+    tarjetas = usuario_actual.tarjetas
 
     if request.method == "POST":
-        cantidad = request.form.get("cantidad_transferir")
-        id_tarjeta = request.form.get("tarjeta_destino")
+        cantidad_form = request.form.get("cantidad_transferir")
+        nombre_destino = (request.form.get("usu_transferir") or "").strip()
 
         # Validar cantidad
         try:
-            cantidad = float(cantidad)
+            cantidad = Decimal(cantidad_form)
             if cantidad <= 0:
                 raise ValueError
-        except (ValueError, TypeError):
+        except (ValueError, TypeError, InvalidOperation):
             error_transferencia = "Cantidad inválida"
             return render_template(
                 "cuenta/transferir.html",
@@ -120,8 +289,9 @@ def transferencias():
                 error_transferencia=error_transferencia,
             )
 
-        if not id_tarjeta:
-            error_transferencia = "Debes seleccionar una tarjeta"
+        id_cartera_destino = obtener_id_cartera_por_usuario(nombre_destino)
+        if id_cartera_destino is None:
+            error_transferencia = "El usuario de destino no existe"
             return render_template(
                 "cuenta/transferir.html",
                 usuario=usuario_actual,
@@ -129,8 +299,13 @@ def transferencias():
                 error_transferencia=error_transferencia,
             )
 
-
-        error_transferencia = "Transferencia realizada con éxito"
+        try:
+            transferir(usuario_actual.cartera.id, id_cartera_destino, cantidad)
+            error_transferencia = "Transferencia realizada con éxito"
+        except TransferenciaRechazada as e:
+            error_transferencia = str(e)
+        except Exception as e:
+            error_transferencia = f"Error al realizar la transferencia: {str(e)}"
 
     return render_template(
         "cuenta/transferir.html",
@@ -139,6 +314,55 @@ def transferencias():
         error_transferencia=error_transferencia,
     )
 
+@main_bp.route("/api/transferir-lote", methods=["POST"])
+def api_transferir_lote():
+    """Endpoint para pagos masivos desde la cartera del usuario.
+
+    Acepta un JSON con una lista de objetos `{"destinatario", "cantidad"}`
+    (el destinatario puede ser el usuario o el gmail) o un CSV
+    `destinatario,cantidad`, ya sea como cuerpo `text/csv` o como fichero en
+    el campo `fichero` de un formulario.
+
+    Args:
+        None (lee el lote del cuerpo de la petición)
+
+    Returns:
+        jsonify: Resumen (`correctas`, `erroneas` y `total`, la suma de los
+            importes movidos ya redondeados a céntimos) y el informe por
+            línea, o un error 400 si el lote no se puede leer.
+    """
+
+    usuario_actual = obtener_usuario_actual()
+
+    if request.is_json:
+        datos = request.get_json(silent=True)
+        if not isinstance(datos, list) or not all(isinstance(d, dict) for d in datos):
+            return jsonify({"error": "Se esperaba una lista de {destinatario, cantidad}"}), 400
+        lineas = [(d.get("destinatario"), d.get("cantidad")) for d in datos]
+    elif "fichero" in request.files:
+        lineas = leer_lote_csv(request.files["fichero"].read().decode("utf-8-sig"))
+    else:
+        lineas = leer_lote_csv(request.get_data(as_text=True))
+
+    if not lineas:
+        return jsonify({"error": "El lote está vacío"}), 400
+
+    try:
+        informe = transferir_lote(usuario_actual.cartera.id, lineas)  # type: ignore
+    except TransferenciaRechazada as e:
+        return jsonify({"error": str(e)}), 400
+
+    correctas = [fila for fila in informe if fila["estado"] == "ok"]
+    return jsonify(
+        {
+            "correctas": len(correctas),
+            "erroneas": len(informe) - len(correctas),
+            "total": f"{sum(Decimal(f['importe']) for f in correctas):.2f}",
+            "lineas": informe,
+        }
+    )
+
+
 # ingresar 
 # =================================== INGRESAR DINERO ================================= #
 @main_bp.route("/ingresar", methods=["GET", "POST"])
@@ -161,14 +385,11 @@ def ingresar():
             error_transferencia = "Cantidad inválida"
             return render_template("cuenta/ingresar.html", usuario=usuario_actual, error_transferencia=error_transferencia)
 
-        # Sumar a la cartera
-        usuario_actual.cartera.cantidad += cantidad
-
+        # Sumar a la cartera (UPDATE atómica), dejar constancia de la recarga y actualizar el resumen diario
         try:
-            db.session.commit()
+            recargar_cartera(usuario_actual.cartera.id, cantidad)
             error_transferencia = f"Ingreso de {cantidad:.2f} € realizado con éxito"
         except Exception as e:
-            db.session.rollback()
             error_transferencia = f"Error al ingresar el dinero: {str(e)}"
 
     return render_template("cuenta/ingresar.html", usuario=usuario_actual, error_transferencia=error_transferencia)
@@ -177,44 +398,106 @@ def ingresar():
 # historial #
 @main_bp.route("/historial")
 def historial():
-    """Renderiza la página del historial de transacciones del usuario."""
+    """Renderiza la página del historial de transacciones del usuario.
+
+    La tabla se rellena desde `/api/historial` (procesamiento en servidor de
+    DataTables), así que aquí no se consulta ninguna transacción.
+    """
     if not esta_autenticado():
         return redirect(url_for("login"))
 
-    usuario_actual = obtener_usuario_actual()
-    cartera_id = usuario_actual.cartera.id  # type: ignore
-
-    # Obtener todas las transacciones donde el usuario sea emisor o receptor
-    transacciones = (
-        db.session.query(Transaccion)
-        .filter(
-            (Transaccion.id_cartera_enviado == cartera_id) |
-            (Transaccion.id_cartera_recibido == cartera_id)
-        )
-        .order_by(Transaccion.fecha.desc())
-        .all()
+    return render_template("cuenta/historial.html", usuario=obtener_usuario_actual())
+
+
+@main_bp.route("/api/historial")
+def api_historial():
+    """Endpoint JSON del historial en el formato server-side de DataTables.
+
+    Devuelve `draw`, `recordsTotal`, `recordsFiltered` y `data` como espera el
+    plugin, más `cursor` para pedir la página siguiente. La paginación es por
+    cursor (fecha, id): el cliente envía el `cursor` recibido en la página
+    anterior en lugar de un desplazamiento. Como `/api/grafico`, responde 304
+    si la cartera no ha cambiado desde el ETag que envía el cliente.
+
+    Args:
+        None (lee 'draw', 'length' y 'cursor' de request.args)
+
+    Returns:
+        jsonify: Página del historial, un 304 si no hay cambios o un error 400 si el
+            cursor no es válido.
+    """
+
+    cartera = obtener_usuario_actual().cartera  # type: ignore
+    cartera_id = cartera.id
+
+    draw = request.args.get("draw", 0, type=int)
+    limite = min(max(request.args.get("length", 25, type=int), 1), 100)
+    cursor = request.args.get("cursor") or None
+
+    # Sin movimientos nuevos la página es la misma: 304 sin consultar el historial.
+    # `draw` solo se devuelve en el cuerpo: si formase parte del ETag no habría 304
+    etag = etag_cartera(cartera, limite, cursor or "")
+    no_modificada = respuesta_no_modificada(etag, cartera.modificada)
+    if no_modificada:
+        return no_modificada
+
+    try:
+        filas, siguiente = obtener_pagina_historial(cartera_id, limite, cursor)
+    except ValueError:
+        return jsonify({"draw": draw, "error": "Cursor no válido"}), 400
+
+    # El total no depende de la página: una vez por versión de la cartera
+    total = cache_movimientos.obtener_o_calcular(
+        cartera, (), lambda: contar_movimientos(cartera_id)
+    )
+    respuesta = jsonify(
+        {
+            "draw": draw,
+            "recordsTotal": total,
+            "recordsFiltered": total,
+            "data": filas,
+            "cursor": siguiente,
+        }
     )
+    return con_validadores(respuesta, etag, cartera.modificada)
 
-    # Preparar datos para la tabla
-    historial = []
-    for t in transacciones:
-        tipo = "Enviado" if t.id_cartera_enviado == cartera_id else "Recibido"
-        otra_parte_id = t.id_cartera_recibido if tipo == "Enviado" else t.id_cartera_enviado
 
-        # Buscar el nombre del usuario receptor/emisor
-        otra_cartera = db.session.query(Usuario).join(Usuario.cartera)\
-            .filter(Usuario.cartera.has(id=otra_parte_id)).first()
-        otra_parte_nombre = otra_cartera.nombre if otra_cartera else "Desconocido"
+@main_bp.route("/historial/exportar")
+def exportar_historial_cartera():
+    """Descarga el historial completo de la cartera en CSV o JSON lines.
 
-        historial.append({
-            "fecha": t.fecha.strftime("%d/%m/%Y %H:%M"),
-            "tipo": tipo,
-            "usuario": otra_parte_nombre,
-            "cantidad": f"{t.cantidad:.2f} €"
-        })
+    La respuesta se envía en streaming a medida que se leen los movimientos,
+    de modo que la memoria del servidor no crece con el tamaño del historial.
+    Si el cliente acepta gzip, se comprime al vuelo.
 
-    return render_template(
-        "cuenta/historial.html",
-        usuario=usuario_actual,
-        historial=historial
+    Args:
+        None (lee 'formato' de request.args: 'csv' por defecto o 'jsonl')
+
+    Returns:
+        Response: Fichero adjunto en streaming, o un error 400 si el formato no es válido.
+    """
+
+    formato = request.args.get("formato", "csv")
+    if formato not in FORMATOS_EXPORTACION:
+        return (
+            jsonify({"error": "Formato no válido", "formatos": FORMATOS_EXPORTACION}),
+            400,
+        )
+
+    cartera_id = obtener_usuario_actual().cartera.id  # type: ignore
+    cuerpo = exportar_historial(cartera_id, formato)
+    nombre = f"historial-{datetime.now():%Y%m%d}.{formato}"
+    cabeceras = {
+        "Content-Disposition": f'attachment; filename="{nombre}"',
+        "Vary": "Accept-Encoding",
+    }
+    if request.accept_encodings["gzip"]:
+        cuerpo = comprimir_gzip(cuerpo)
+        cabeceras["Content-Encoding"] = "gzip"
+
+    return Response(
+        stream_with_context(cuerpo),
+        mimetype="text/csv" if formato == "csv" else "application/x-ndjson",
+        headers=cabeceras,
     )
+
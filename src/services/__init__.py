@@ -1,4 +1,8 @@
-# from .cartera_service import
+from .cartera_service import (
+    obtener_id_cartera_por_usuario,
+    obtener_ids_cartera_por_destinatario,
+)
+
 from .auth_service import (
     login_usuario,
     logout_usuario,
@@ -8,15 +12,67 @@ from .auth_service import (
     generar_token_recuperacion,
 )
 
-# from .recargar_service import
-# from .recargar_service import
+from .cola_service import (
+    manejador_tarea,
+    encolar,
+    procesar_tareas,
+    estadisticas_cola,
+    ejecutar_trabajador,
+    iniciar_trabajadores,
+    detener_trabajadores,
+)
+
+from .contrasena_service import (
+    HashingSaturado,
+    calcular_hash,
+    verificar_hash,
+    necesita_rehash,
+    cerrar_pool,
+)
+
+from .datos_service import generar_datos_ficticios
+
+from .fraccion_service import (
+    compactar_fracciones,
+    fraccionar_cartera,
+)
+
+from .historial_service import (
+    obtener_pagina_historial,
+    contar_movimientos,
+    exportar_historial,
+    FORMATOS_EXPORTACION,
+)
+
+from .punto_control_service import (
+    obtener_saldo_en,
+    crear_punto_control,
+    generar_puntos_control,
+)
+
+from .recargar_service import recargar_cartera
+
+from .saldo_service import (
+    registrar_movimiento,
+    reconstruir_saldos_diarios,
+    obtener_gastos_mes,
+    resumen_completo_desde,
+    carteras_con_resumen_incompleto,
+)
+
 from .tarjeta_service import (
     obtener_tarjetas_por_usuario,
     registrada_tarjeta,
     guardar_tarjeta_en_db,
 )
 
-# from .transaccion_service import
+from .transaccion_service import (
+    TransferenciaRechazada,
+    transferir,
+    transferir_lote,
+    leer_lote_csv,
+    ejecutar_escritura,
+)
 
 from .usuario_service import (
     crear_usuario,
@@ -1,7 +1,13 @@
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask import session
 
+from database import db
 from models import Usuario
+from services.contrasena_service import (
+    HashingSaturado,
+    calcular_hash,
+    necesita_rehash,
+    verificar_hash,
+)
 
 # --- FUNCIONES DE CONTROL DE ACCESO ---
 
@@ -12,6 +18,8 @@ def login_usuario(identificador, password):
 
     Busca coincidencias en la base de datos tanto por nombre de usuario como por
     correo electrónico. Si las credenciales son válidas, inicializa la sesión.
+    Si el hash guardado usa parámetros antiguos se recalcula con los actuales;
+    si el pool de hashing está saturado se deja para el siguiente login.
 
     Args:
         identificador (str): El nombre de usuario o dirección de correo electrónico.
@@ -21,6 +29,9 @@ def login_usuario(identificador, password):
         Usuario | None: El objeto de la clase Usuario si la autenticación es
             exitosa; None si el usuario no existe o la contraseña es incorrecta.
 
+    Raises:
+        HashingSaturado: Si el pool de hashing no admite la verificación.
+
     Example:
         >>> user = login_usuario("paco_admin", "12345")
         >>> if user:
@@ -33,7 +44,15 @@ def login_usuario(identificador, password):
         (Usuario.usuario == identificador) | (Usuario.gmail == identificador)
     ).first()
 
-    if usuario and check_password_hash(usuario.contrasena, password):
+    if usuario and verificar_hash(usuario.contrasena, password):
+        # Actualización transparente del hash al cambiar el coste configurado
+        if necesita_rehash(usuario.contrasena):
+            try:
+                usuario.contrasena = calcular_hash(password)
+                db.session.commit()
+            except HashingSaturado:
+                pass  # La contraseña es correcta: el login no debe fallar por esto
+
         # Guardamos datos mínimos en la sesión (cookie encriptada)
         session.clear()
         session["usuario_id"] = usuario.id
@@ -96,8 +115,9 @@ def hash_password(password_plano):
     """
     Transforma una contraseña en texto plano en un hash seguro y único.
 
-    Utiliza el algoritmo de derivación de claves PBKDF2 con SHA256 y un
-    salt aleatorio para proteger las credenciales contra ataques de fuerza bruta.
+    Utiliza el algoritmo de derivación de claves configurado (PBKDF2 con SHA256
+    por defecto) y un salt aleatorio para proteger las credenciales contra
+    ataques de fuerza bruta. El cálculo se hace en el pool de procesos.
 
     Args:
         password_plano (str): La contraseña original proporcionada por el usuario.
@@ -110,7 +130,7 @@ def hash_password(password_plano):
         'pbkdf2:sha256:600000$u8X9...hash_generado'
     """
 
-    return generate_password_hash(password_plano, method="pbkdf2:sha256")
+    return calcular_hash(password_plano)
 
 
 # --- 3. FUNCIONES DE RECUPERACIÓN Y VALIDACIÓN ---
@@ -0,0 +1,65 @@
+from sqlalchemy import or_, select
+
+from database import db
+from models import Cartera, Usuario
+
+
+def obtener_id_cartera_por_usuario(nombre_usuario):
+    """
+    Busca la cartera de un usuario a partir de su nombre de usuario.
+
+    Args:
+        nombre_usuario (str): Valor del campo `usuario` (único).
+
+    Returns:
+        int | None: Id de la cartera, o None si el usuario no existe o no tiene cartera.
+
+    Example:
+        >>> obtener_id_cartera_por_usuario("maria_l")
+        2
+    """
+
+    return db.session.execute(
+        select(Cartera.id)
+        .join(Usuario, Usuario.id == Cartera.id_usuario)
+        .where(Usuario.usuario == nombre_usuario)
+    ).scalar_one_or_none()
+
+
+def obtener_ids_cartera_por_destinatario(identificadores):
+    """
+    Resuelve varios destinatarios (usuario o gmail) con una sola consulta.
+
+    Args:
+        identificadores (Iterable[str]): Nombres de usuario o correos.
+
+    Returns:
+        dict[str, int]: Para cada identificador encontrado, el id de su
+            cartera. Los que no existen no aparecen.
+
+    Example:
+        >>> obtener_ids_cartera_por_destinatario(["maria_l", "alex@mail.com", "nadie"])
+        {'maria_l': 2, 'alex@mail.com': 1}
+    """
+
+    identificadores = set(identificadores)
+    if not identificadores:
+        return {}
+
+    filas = db.session.execute(
+        select(Usuario.usuario, Usuario.gmail, Cartera.id)
+        .join(Cartera, Cartera.id_usuario == Usuario.id)
+        .where(
+            or_(
+                Usuario.usuario.in_(identificadores),
+                Usuario.gmail.in_(identificadores),
+            )
+        )
+    )
+
+    encontrados = {}
+    for usuario, gmail, id_cartera in filas:
+        for clave in (usuario, gmail):
+            if clave in identificadores:
+                encontrados[clave] = id_cartera
+    return encontrados
@@ -0,0 +1,397 @@
+import json
+import os
+import random
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from database import db
+from models import Tarea
+from services.fraccion_service import compactar_fracciones
+from services.punto_control_service import generar_puntos_control
+from services.transaccion_service import ejecutar_escritura
+
+# Valores por defecto; todos se pueden cambiar en app.config
+LOTE_TAREAS = 50  # COLA_LOTE: tareas del mismo tipo que se procesan juntas
+MAX_INTENTOS = 5  # COLA_MAX_INTENTOS: después, la tarea queda como 'fallida'
+ESPERA_REINTENTO = 2.0  # COLA_ESPERA_REINTENTO: segundos antes del primer reintento
+PLAZO_RESERVA = 300  # COLA_PLAZO_RESERVA: segundos hasta que otra hebra retoma una tarea
+INTERVALO_SONDEO = 1.0  # COLA_INTERVALO: segundos de espera con la cola vacía
+
+_manejadores = {}
+_hilos = []
+_pid_hilos = None
+_cerrojo = threading.Lock()
+_aviso = threading.Event()  # Hay tareas nuevas confirmadas
+_parar = threading.Event()
+_contadores = {"hechas": 0, "reintentos": 0, "fallidas": 0}
+
+
+def _config(clave, defecto):
+    return current_app.config.get(clave, defecto)
+
+
+# --- REGISTRO Y ENCOLADO --- #
+
+
+def manejador_tarea(tipo):
+    """
+    Registra la función que procesa las tareas de un tipo.
+
+    La función recibe la lista con los datos de un lote de tareas de ese
+    tipo (cada uno, lo que se pasó a `encolar`) y se ejecuta dentro de un
+    contexto de aplicación. La entrega es "al menos una vez": si falla o el
+    trabajador muere a medias, el lote entero se repite, así que debe poder
+    ejecutarse dos veces sin efectos duplicados.
+
+    Args:
+        tipo (str): Nombre del tipo de tarea.
+
+    Returns:
+        Callable: Decorador que registra la función y la devuelve sin cambios.
+
+    Example:
+        >>> @manejador_tarea("avisar")
+        ... def avisar(lote):
+        ...     enviar_correos([datos["usuario"] for datos in lote])
+    """
+
+    def registrar(funcion):
+        _manejadores[tipo] = funcion
+        return funcion
+
+    return registrar
+
+
+def encolar(tipo, datos=None, retraso=0, unica=False):
+    """
+    Añade una tarea a la sesión actual, sin commit.
+
+    La tarea se confirma con la transacción de quien llama: si esta se
+    deshace la tarea no existe, y los trabajadores no la ven hasta el
+    commit. Al confirmarse se avisa a los trabajadores del proceso.
+
+    Args:
+        tipo (str): Tipo de tarea (registrado con `manejador_tarea`).
+        datos (dict | None): Datos serializables en JSON para el manejador.
+        retraso (float): Segundos que deben pasar antes de procesarla.
+        unica (bool): Si ya hay una tarea pendiente del mismo tipo y con los
+            mismos datos no se añade otra: esa hará el trabajo.
+
+    Returns:
+        Tarea | None: La tarea añadida a la sesión (None si `unica` y ya había una).
+
+    Raises:
+        ValueError: Si el tipo no tiene manejador.
+
+    Example:
+        >>> transferir(1, 2, "10")
+        >>> encolar("compactar_fracciones", {"cartera": 2})
+        >>> db.session.commit()
+    """
+
+    if tipo not in _manejadores:
+        raise ValueError(f"Tipo de tarea desconocido: {tipo}")
+    datos = json.dumps(datos or {}, sort_keys=True)
+    if unica and db.session.execute(
+        select(Tarea.id)
+        .where(Tarea.estado == "pendiente", Tarea.tipo == tipo, Tarea.datos == datos)
+        .limit(1)
+    ).first():
+        return None
+    tarea = Tarea(
+        tipo=tipo,
+        datos=datos,
+        disponible_en=datetime.now() + timedelta(seconds=retraso),
+    )
+    db.session.add(tarea)
+    db.session.info["tareas_nuevas"] = True
+    return tarea
+
+
+@event.listens_for(Session, "after_commit")
+def _avisar_trabajadores(sesion):
+    """Despierta a los trabajadores (arrancándolos si hace falta) tras confirmar tareas."""
+
+    if sesion.info.pop("tareas_nuevas", False):
+        if has_app_context():
+            _arrancar_trabajadores()
+        _aviso.set()
+
+
+@event.listens_for(Session, "after_rollback")
+def _olvidar_tareas(sesion):
+    sesion.info.pop("tareas_nuevas", None)
+
+
+# --- PROCESADO --- #
+
+
+def procesar_tareas():
+    """
+    Reserva un lote de tareas del mismo tipo, lo ejecuta y anota el resultado.
+
+    Se toma el tipo de la tarea más antigua disponible y hasta `COLA_LOTE`
+    tareas de ese tipo, en una transacción corta que las marca como en curso
+    hasta que venza el plazo de reserva. El manejador se ejecuta fuera de esa
+    transacción. Si termina bien las tareas se borran; si falla vuelven a la
+    cola con una espera que se duplica en cada intento (con azar), y tras
+    `COLA_MAX_INTENTOS` quedan como 'fallida', igual que las reservas
+    vencidas que ya han agotado sus intentos.
+
+    Returns:
+        int: Número de tareas procesadas (0 si no había ninguna disponible).
+
+    Example:
+        >>> while procesar_tareas():
+        ...     pass
+    """
+
+    lote = _config("COLA_LOTE", LOTE_TAREAS)
+    plazo = timedelta(seconds=_config("COLA_PLAZO_RESERVA", PLAZO_RESERVA))
+    maximo = _config("COLA_MAX_INTENTOS", MAX_INTENTOS)
+    tipo, tareas, vencidas = ejecutar_escritura(lambda: _reservar(lote, plazo, maximo))
+    if vencidas:
+        with _cerrojo:
+            _contadores["fallidas"] += vencidas
+    if not tareas:
+        return 0
+
+    ids = [id_tarea for id_tarea, _, _ in tareas]
+    try:
+        _manejadores[tipo]([datos for _, datos, _ in tareas])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception("Fallo en %d tareas '%s'", len(tareas), tipo)
+        fallidas = ejecutar_escritura(
+            lambda: _reprogramar(tareas, f"{type(e).__name__}: {e}")
+        )
+        with _cerrojo:
+            _contadores["fallidas"] += fallidas
+            _contadores["reintentos"] += len(tareas) - fallidas
+    else:
+        ejecutar_escritura(
+            lambda: db.session.execute(db.delete(Tarea).where(Tarea.id.in_(ids)))
+        )
+        with _cerrojo:
+            _contadores["hechas"] += len(tareas)
+    return len(tareas)
+
+
+def _reservar(lote, plazo, maximo):
+    """
+    Marca como en curso un lote del tipo más antiguo disponible; sin commit.
+
+    Las reservas vencidas que ya han gastado `maximo` intentos (el trabajador
+    murió con ellas una y otra vez) no se vuelven a entregar: quedan como
+    'fallida'. Devuelve el tipo, las tareas reservadas y cuántas han fallado así.
+    """
+
+    ahora = datetime.now()
+    vencidas = db.session.execute(
+        db.update(Tarea)
+        .where(
+            Tarea.estado == "en_curso",
+            Tarea.disponible_en <= ahora,
+            Tarea.intentos >= maximo,
+        )
+        .values(estado="fallida", error=f"Reserva vencida tras {maximo} intentos")
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    disponibles = (Tarea.estado.in_(("pendiente", "en_curso")), Tarea.disponible_en <= ahora)
+    tipo = db.session.execute(
+        select(Tarea.tipo).where(*disponibles).order_by(Tarea.disponible_en).limit(1)
+    ).scalar()
+    if tipo is None:
+        return None, [], vencidas
+
+    tareas = db.session.execute(
+        select(Tarea.id, Tarea.datos, Tarea.intentos)
+        .where(*disponibles, Tarea.tipo == tipo)
+        .order_by(Tarea.disponible_en)
+        .limit(lote)
+    ).all()
+    db.session.execute(
+        db.update(Tarea)
+        .where(Tarea.id.in_([t.id for t in tareas]))
+        .values(estado="en_curso", intentos=Tarea.intentos + 1, disponible_en=ahora + plazo)
+        .execution_options(synchronize_session=False)
+    )
+    return tipo, [(t.id, json.loads(t.datos), t.intentos + 1) for t in tareas], vencidas
+
+
+def _reprogramar(tareas, error):
+    """Devuelve a la cola las tareas de un lote fallido; sin commit. Devuelve cuántas dan por fallidas."""
+
+    ahora = datetime.now()
+    maximo = _config("COLA_MAX_INTENTOS", MAX_INTENTOS)
+    espera = _config("COLA_ESPERA_REINTENTO", ESPERA_REINTENTO)
+    cambios = []
+    for id_tarea, _, intentos in tareas:
+        if intentos >= maximo:
+            cambios.append({"id": id_tarea, "estado": "fallida", "error": error})
+            continue
+        retraso = espera * 2 ** (intentos - 1) * (1 + random.random())
+        cambios.append(
+            {
+                "id": id_tarea,
+                "estado": "pendiente",
+                "disponible_en": ahora + timedelta(seconds=retraso),
+                "error": error,
+            }
+        )
+    db.session.execute(db.update(Tarea), cambios)
+    return sum(1 for c in cambios if c["estado"] == "fallida")
+
+
+def estadisticas_cola():
+    """
+    Profundidad de la cola y contadores de este proceso.
+
+    Returns:
+        dict: Tareas 'pendientes', 'en_curso' y 'fallidas' (totales y
+            'por_tipo'), 'retraso_s' (cuánto lleva esperando la tarea
+            disponible más antigua) y los contadores 'hechas', 'reintentos'
+            y 'fallidas_proceso' desde que arrancó el proceso.
+
+    Example:
+        >>> estadisticas_cola()["pendientes"]
+        3
+    """
+
+    ahora = datetime.now()
+    datos = {"pendientes": 0, "en_curso": 0, "fallidas": 0, "por_tipo": {}}
+    nombres = {"pendiente": "pendientes", "en_curso": "en_curso", "fallida": "fallidas"}
+    for tipo, estado, cantidad in db.session.execute(
+        select(Tarea.tipo, Tarea.estado, func.count()).group_by(Tarea.estado, Tarea.tipo)
+    ):
+        datos[nombres[estado]] += cantidad
+        datos["por_tipo"].setdefault(tipo, {})[nombres[estado]] = cantidad
+
+    mas_antigua = db.session.execute(
+        select(func.min(Tarea.disponible_en)).where(
+            Tarea.estado.in_(("pendiente", "en_curso")), Tarea.disponible_en <= ahora
+        )
+    ).scalar()
+    datos["retraso_s"] = (ahora - mas_antigua).total_seconds() if mas_antigua else 0.0
+
+    with _cerrojo:
+        datos.update(
+            hechas=_contadores["hechas"],
+            reintentos=_contadores["reintentos"],
+            fallidas_proceso=_contadores["fallidas"],
+        )
+    return datos
+
+
+# --- TRABAJADORES --- #
+
+
+def ejecutar_trabajador(app, parar=None):
+    """
+    Bucle de un trabajador: procesa lotes hasta que se pida parar.
+
+    Con la cola vacía espera a que se confirmen tareas nuevas en este
+    proceso o, como mucho, `COLA_INTERVALO` segundos (las encoladas por
+    otros procesos se ven en el siguiente sondeo).
+
+    Args:
+        app (Flask): Aplicación con la que se abre cada contexto.
+        parar (threading.Event | None): Evento que detiene el bucle.
+
+    Returns:
+        None
+    """
+
+    parar = parar or _parar
+    with app.app_context():
+        intervalo = _config("COLA_INTERVALO", INTERVALO_SONDEO)
+    while not parar.is_set():
+        with app.app_context():
+            try:
+                procesadas = procesar_tareas()
+            except Exception:
+                current_app.logger.exception("Error en el trabajador de la cola")
+                procesadas = 0
+            finally:
+                db.session.remove()
+        if not procesadas:
+            _aviso.wait(intervalo)
+            _aviso.clear()
+
+
+def iniciar_trabajadores(app, hilos):
+    """
+    Arranca `hilos` trabajadores en hilos de este proceso (si no estaban ya).
+
+    Args:
+        app (Flask): La aplicación.
+        hilos (int): Número de hilos trabajadores.
+
+    Returns:
+        None
+    """
+
+    global _pid_hilos
+
+    with _cerrojo:
+        if _hilos and _pid_hilos == os.getpid():
+            return
+        # Tras un fork los hilos del padre no existen en el hijo
+        _hilos.clear()
+        _parar.clear()
+        _pid_hilos = os.getpid()
+        for n in range(hilos):
+            hilo = threading.Thread(
+                target=ejecutar_trabajador, args=(app,), name=f"cola-{n}", daemon=True
+            )
+            hilo.start()
+            _hilos.append(hilo)
+
+
+def detener_trabajadores(espera=5.0):
+    """Para los trabajadores de este proceso (al apagar la aplicación o en los tests)."""
+
+    global _pid_hilos
+
+    with _cerrojo:
+        _parar.set()
+        _aviso.set()
+        for hilo in _hilos:
+            hilo.join(espera)
+        _hilos.clear()
+        _pid_hilos = None
+
+
+def _arrancar_trabajadores():
+    """Arranca el pool del proceso en el primer encolado si `COLA_TRABAJADORES` > 0."""
+
+    hilos = current_app.config.get("COLA_TRABAJADORES")
+    if hilos and not (_hilos and _pid_hilos == os.getpid()):
+        iniciar_trabajadores(current_app._get_current_object(), hilos)
+
+
+# --- TAREAS DE MANTENIMIENTO --- #
+
+
+@manejador_tarea("compactar_fracciones")
+def _compactar_fracciones(lote):
+    """Una compactación por cartera distinta del lote (o una global si alguna no la indica)."""
+
+    carteras = {datos.get("cartera") for datos in lote}
+    for cartera in [None] if None in carteras else carteras:
+        compactar_fracciones(cartera)
+
+
+@manejador_tarea("generar_puntos_control")
+def _generar_puntos_control(lote):
+    """Como `_compactar_fracciones`, pero generando los puntos de control que falten."""
+
+    carteras = {datos.get("cartera") for datos in lote}
+    for cartera in [None] if None in carteras else carteras:
+        generar_puntos_control(cartera)
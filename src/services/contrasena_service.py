@@ -0,0 +1,165 @@
+import os
+import threading
+import time
+
+from flask import current_app
+from werkzeug.security import (
+    DEFAULT_PBKDF2_ITERATIONS,
+    check_password_hash,
+    generate_password_hash,
+)
+
+from metricas import incrementar, observar
+
+# Valores por defecto; todos se pueden cambiar en app.config
+METODO_HASH = "pbkdf2:sha256:600000"  # PASSWORD_HASH_METHOD
+ESPERA_HASH = 2.0  # PASSWORD_HASH_ESPERA: segundos esperando hueco en la cola
+
+_pool = None
+_pid_pool = None
+_cola = None
+_cerrojo = threading.Lock()
+
+
+class HashingSaturado(RuntimeError):
+    """Hay demasiadas contraseñas esperando a ser calculadas; se rechaza la petición."""
+
+
+# --- POOL DE PROCESOS --- #
+
+
+def _obtener_pool():
+    """
+    Devuelve el pool de procesos de hashing, creándolo en el primer uso.
+
+    PBKDF2 con cientos de miles de iteraciones ocupa la CPU durante cientos
+    de milisegundos; hacerlo en otro proceso deja libre el hilo de la
+    petición (y el GIL) para el resto de endpoints. Si el proceso se ha
+    bifurcado desde que se creó el pool, se crea uno nuevo.
+    """
+
+    global _pool, _pid_pool, _cola
+
+    # multiprocessing solo se carga en el primer hash, no al arrancar
+    from concurrent.futures import ProcessPoolExecutor
+
+    with _cerrojo:
+        if _pool is None or _pid_pool != os.getpid():
+            procesos = current_app.config.get("PASSWORD_HASH_WORKERS") or os.cpu_count() or 1
+            max_cola = current_app.config.get("PASSWORD_HASH_MAX_COLA") or procesos * 4
+            _pool = ProcessPoolExecutor(max_workers=procesos)
+            _pid_pool = os.getpid()
+            _cola = threading.BoundedSemaphore(max_cola)
+        return _pool, _cola
+
+
+def cerrar_pool():
+    """Detiene los procesos de hashing (al apagar la aplicación o en los tests)."""
+
+    global _pool, _pid_pool, _cola
+
+    with _cerrojo:
+        if _pool is not None and _pid_pool == os.getpid():
+            _pool.shutdown(wait=True)
+        _pool = _pid_pool = _cola = None
+
+
+def _ejecutar(funcion, *args):
+    inicio = time.perf_counter()
+    pool, cola = _obtener_pool()
+    espera = current_app.config.get("PASSWORD_HASH_ESPERA", ESPERA_HASH)
+    if not cola.acquire(timeout=espera):
+        incrementar("app_hash_contrasena_rechazos_total")
+        raise HashingSaturado("Demasiadas peticiones de inicio de sesión, inténtalo más tarde")
+    try:
+        return pool.submit(funcion, *args).result()
+    finally:
+        cola.release()
+        operacion = "calcular" if funcion is generate_password_hash else "verificar"
+        observar("app_hash_contrasena_segundos", time.perf_counter() - inicio, operacion=operacion)
+
+
+# --- OPERACIONES --- #
+
+
+def metodo_hash():
+    """Método de hash configurado, con todos sus parámetros explícitos."""
+
+    return normalizar_metodo(current_app.config.get("PASSWORD_HASH_METHOD", METODO_HASH))
+
+
+def normalizar_metodo(metodo):
+    """
+    Completa un método de Werkzeug con los parámetros que toma por defecto.
+
+    Example:
+        >>> normalizar_metodo("pbkdf2:sha256")
+        'pbkdf2:sha256:1000000'
+    """
+
+    partes = metodo.split(":")
+    if partes[0] == "pbkdf2":
+        partes += ["sha256", str(DEFAULT_PBKDF2_ITERATIONS)][len(partes) - 1 :]
+    elif partes[0] == "scrypt":
+        partes += ["32768", "8", "1"][len(partes) - 1 :]
+    return ":".join(partes)
+
+
+def calcular_hash(password_plano):
+    """
+    Calcula el hash de una contraseña en el pool de procesos.
+
+    Args:
+        password_plano (str): Contraseña en texto plano.
+
+    Returns:
+        str: Hash con el formato de Werkzeug (`metodo$salt$hash`).
+
+    Raises:
+        HashingSaturado: Si la cola del pool está llena.
+
+    Example:
+        >>> calcular_hash("mi_clave_secreta")
+        'pbkdf2:sha256:600000$u8X9...hash_generado'
+    """
+
+    return _ejecutar(generate_password_hash, password_plano, metodo_hash())
+
+
+def verificar_hash(hash_guardado, password_plano):
+    """
+    Comprueba una contraseña contra su hash en el pool de procesos.
+
+    Args:
+        hash_guardado (str): Hash almacenado en USUARIOS.contrasena.
+        password_plano (str): Contraseña introducida por el usuario.
+
+    Returns:
+        bool: True si la contraseña es correcta.
+
+    Raises:
+        HashingSaturado: Si la cola del pool está llena.
+    """
+
+    if not hash_guardado or password_plano is None:
+        return False
+    return _ejecutar(check_password_hash, hash_guardado, password_plano)
+
+
+def necesita_rehash(hash_guardado):
+    """
+    Indica si un hash se generó con parámetros distintos de los configurados.
+
+    Args:
+        hash_guardado (str): Hash almacenado en USUARIOS.contrasena.
+
+    Returns:
+        bool: True si conviene recalcularlo en el próximo login correcto.
+
+    Example:
+        >>> necesita_rehash("pbkdf2:sha256:260000$abc$def")
+        True
+    """
+
+    metodo_guardado = hash_guardado.split("$", 1)[0]
+    return normalizar_metodo(metodo_guardado) != metodo_hash()
@@ -0,0 +1,206 @@
+import random
+from datetime import datetime, time, timedelta
+from itertools import accumulate
+
+from sqlalchemy import func, select, text
+
+from database import db
+from models import Cartera, Recargar, Tarjeta, Transaccion, Usuario
+from services.contrasena_service import calcular_hash
+from services.punto_control_service import generar_puntos_control
+from services.saldo_service import reconstruir_saldos_diarios
+
+LOTE_INSERCION = 50_000
+LETRAS_DNI = "TRWAGMYFPDXBNJZSQVHLCKE"
+NOMBRES = (
+    "Lucía", "Hugo", "Martina", "Mateo", "Sofía", "Leo", "Julia", "Daniel", "Paula",
+    "Pablo", "Valeria", "Álvaro", "Carmen", "Manuel", "Elena", "Javier",
+)
+APELLIDOS = (
+    "García", "Rodríguez", "González", "Fernández", "López", "Martínez", "Sánchez",
+    "Pérez", "Gómez", "Martín", "Jiménez", "Ruiz", "Hernández", "Díaz", "Moreno",
+)
+
+
+def _insertar(conexion, tabla, columnas, filas):
+    """INSERT por lotes con executemany, sin pasar cada fila por el ORM ni por los tipos."""
+
+    sentencia = (
+        f'INSERT INTO "{tabla.name}" ({", ".join(columnas)}) '
+        f'VALUES ({", ".join("?" * len(columnas))})'
+    )
+    for inicio in range(0, len(filas), LOTE_INSERCION):
+        conexion.exec_driver_sql(sentencia, filas[inicio : inicio + LOTE_INSERCION])
+
+
+def _pesos_zipf(n, exponente, rnd):
+    """Pesos acumulados de una ley de Zipf repartidos al azar entre 1..n."""
+
+    ids = list(range(1, n + 1))
+    rnd.shuffle(ids)  # El más activo no tiene por qué ser el id 1
+    return ids, list(accumulate(1 / rango**exponente for rango in range(1, n + 1)))
+
+
+def generar_datos_ficticios(
+    usuarios=1000,
+    transacciones=100_000,
+    anios=3,
+    semilla=42,
+    contrasena="clave123",
+    proporcion_comercios=0.01,
+):
+    """
+    Llena una base de datos vacía con datos ficticios de tamaño de producción.
+
+    Genera usuarios con su cartera y tarjeta, transferencias y recargas con
+    un reparto parecido al real: unos pocos comercios reciben gran parte de
+    los pagos, la actividad de los usuarios sigue una cola larga (Zipf) y
+    las fechas se reparten a lo largo de `anios` años hasta hoy. Las
+    recargas cubren en todo momento lo que cada cartera gasta, así que
+    ningún saldo pasa por negativo, y el saldo final de cada cartera
+    coincide con su historial. La misma semilla da siempre los mismos datos.
+
+    Todo se inserta con executemany en lotes grandes sobre la conexión de
+    la sesión (los índices de TRANSACCIONES se crean al final, que es más
+    rápido que mantenerlos fila a fila) y después se generan los resúmenes
+    diarios y los puntos de control, como en una base de datos real.
+
+    Args:
+        usuarios (int): Número de usuarios (cada uno con cartera y tarjeta).
+        transacciones (int): Número de transferencias.
+        anios (int): Años de historial hacia atrás desde ahora.
+        semilla (int): Semilla del generador aleatorio.
+        contrasena (str): Contraseña de todos los usuarios (usuario1, usuario2...).
+        proporcion_comercios (float): Fracción de usuarios que actúan como comercios.
+
+    Returns:
+        dict[str, int]: Filas insertadas por tabla.
+
+    Raises:
+        ValueError: Si los parámetros no tienen sentido o ya hay usuarios.
+
+    Example:
+        >>> generar_datos_ficticios(usuarios=10_000, transacciones=1_000_000)
+        {'usuarios': 10000, 'transacciones': 1000000, 'recargas': 31874, ...}
+    """
+
+    if usuarios < 2 or transacciones < 0 or anios < 1:
+        raise ValueError("Hacen falta al menos 2 usuarios y 1 año de historial")
+    if db.session.execute(select(func.count()).select_from(Usuario)).scalar():
+        raise ValueError("La base de datos ya tiene usuarios (--vaciar para empezar de cero)")
+
+    rnd = random.Random(semilla)
+    ahora = datetime.now().replace(microsecond=0)
+    inicio = datetime.combine(ahora.date() - timedelta(days=anios * 365), time())
+    segundos = int((ahora - inicio).total_seconds())
+    # Fechas ya en el formato de DateTime en SQLite, sin un datetime por fila
+    dias = [(inicio + timedelta(days=d)).date().isoformat() for d in range(anios * 365 + 1)]
+    horas = [f" {s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}.000000" for s in range(86400)]
+
+    # Quién paga: cola larga sobre todos. Quién cobra: la mitad de las veces un
+    # comercio (también con Zipf entre ellos), el resto cualquier usuario.
+    comercios = max(1, int(usuarios * proporcion_comercios))
+    pagadores, pesos_pagadores = _pesos_zipf(usuarios, 1.1, rnd)
+    cobradores, pesos_cobradores = _pesos_zipf(usuarios, 0.8, rnd)
+    pesos_comercios = list(accumulate(1 / rango for rango in range(1, comercios + 1)))
+
+    origenes = rnd.choices(pagadores, cum_weights=pesos_pagadores, k=transacciones)
+    destinos = rnd.choices(cobradores, cum_weights=pesos_cobradores, k=transacciones)
+    a_comercio = rnd.choices(range(1, comercios + 1), cum_weights=pesos_comercios, k=transacciones)
+    # Segundos desde el inicio, ordenados: los ids crecen con la fecha, como en producción
+    instantes = sorted(rnd.randrange(segundos) for _ in range(transacciones))
+
+    saldo = [0] * (usuarios + 1)  # Céntimos, por id de cartera
+    minimo = [0] * (usuarios + 1)
+    filas_transacciones = []
+    for origen, destino, comercio, instante in zip(origenes, destinos, a_comercio, instantes):
+        if rnd.random() < 0.5:
+            destino = comercio
+        if destino == origen:
+            destino = destino % usuarios + 1
+        # Importes log-normales: la mayoría pequeños, alguno grande (mediana ~15 €)
+        cantidad = int(rnd.lognormvariate(7.3, 1.1)) or 1
+        saldo[origen] -= cantidad
+        if saldo[origen] < minimo[origen]:
+            minimo[origen] = saldo[origen]
+        saldo[destino] += cantidad
+        fecha = dias[instante // 86400] + horas[instante % 86400]
+        filas_transacciones.append((cantidad, fecha, origen, destino))
+
+    # Una recarga inicial cubre el peor momento de cada cartera; luego, otras al azar
+    filas_recargas = []
+    for id_cartera in range(1, usuarios + 1):
+        inicial = -minimo[id_cartera] + rnd.randrange(1_000, 20_000)
+        filas_recargas.append((id_cartera, id_cartera, inicial, dias[0] + horas[0]))
+        saldo[id_cartera] += inicial
+        for _ in range(rnd.randrange(4)):
+            cantidad = rnd.randrange(500, 50_000)
+            instante = rnd.randrange(segundos)
+            fecha = dias[instante // 86400] + horas[instante % 86400]
+            filas_recargas.append((id_cartera, id_cartera, cantidad, fecha))
+            saldo[id_cartera] += cantidad
+    filas_recargas.sort(key=lambda fila: fila[3])
+
+    # Un solo hash para todos: calcularlo N veces llevaría horas con el coste de producción
+    hash_contrasena = calcular_hash(contrasena)
+    filas_usuarios = []
+    for i in range(1, usuarios + 1):
+        dni = f"{i:08d}{LETRAS_DNI[i % 23]}"
+        nombre = rnd.choice(NOMBRES)
+        apellidos = f"{rnd.choice(APELLIDOS)} {rnd.choice(APELLIDOS)}"
+        filas_usuarios.append(
+            (i, dni, nombre, apellidos, f"usuario{i}", hash_contrasena, f"usuario{i}@ejemplo.com")
+        )
+
+    conexion = db.session.connection()
+    _insertar(
+        conexion,
+        Usuario.__table__,
+        ("id", "dni", "nombre", "apellidos", "usuario", "contrasena", "gmail"),
+        filas_usuarios,
+    )
+    _insertar(
+        conexion,
+        Cartera.__table__,
+        ("id", "cantidad", "id_usuario", "version", "modificada", "fracciones"),
+        [(i, saldo[i], i, 0, ahora.isoformat(" ", "microseconds"), 0) for i in range(1, usuarios + 1)],
+    )
+    _insertar(
+        conexion,
+        Tarjeta.__table__,
+        ("id", "numero", "caducidad", "cvc", "propietario_nombre", "id_usuario"),
+        [
+            (i, f"4{i:015d}", f"{rnd.randrange(1, 13):02d}/{ahora.year % 100 + 3}",
+             rnd.randrange(100, 1000), fila[2], i)
+            for i, fila in enumerate(filas_usuarios, start=1)
+        ],
+    )
+    _insertar(
+        conexion,
+        Recargar.__table__,
+        ("id_cartera", "id_tarjeta", "cantidad", "fecha"),
+        filas_recargas,
+    )
+    for indice in Transaccion.__table__.indexes:
+        indice.drop(conexion, checkfirst=True)
+    _insertar(
+        conexion,
+        Transaccion.__table__,
+        ("cantidad", "fecha", "id_cartera_enviado", "id_cartera_recibido"),
+        filas_transacciones,
+    )
+    for indice in Transaccion.__table__.indexes:
+        indice.create(conexion)
+    db.session.commit()
+
+    reconstruir_saldos_diarios()
+    generar_puntos_control()
+    db.session.execute(text("ANALYZE"))
+    db.session.commit()
+
+    return {
+        "usuarios": usuarios,
+        "transacciones": transacciones,
+        "recargas": len(filas_recargas),
+        "tarjetas": usuarios,
+    }
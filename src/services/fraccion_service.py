@@ -0,0 +1,118 @@
+from sqlalchemy import func, select
+
+from database import centimos, db
+from models import Cartera, FraccionSaldo
+from services.transaccion_service import ejecutar_escritura
+
+MAX_FRACCIONES = 64
+
+
+def _compactar(id_cartera=None):
+    """Pasa el saldo y la versión de las fracciones a la fila de CARTERAS, sin commit."""
+
+    def de_fracciones(agregado):
+        return (
+            select(func.coalesce(agregado, 0))
+            .where(FraccionSaldo.id_cartera == Cartera.id)
+            .scalar_subquery()
+        )
+
+    carteras = db.update(Cartera).where(Cartera.fracciones > 0)
+    fracciones = db.update(FraccionSaldo)
+    if id_cartera is not None:
+        carteras = carteras.where(Cartera.id == id_cartera)
+        fracciones = fracciones.where(FraccionSaldo.id_cartera == id_cartera)
+
+    # La versión total (fila + fracciones) no cambia: el saldo tampoco
+    resultado = db.session.execute(
+        carteras.values(
+            cantidad_base=centimos(Cartera.cantidad_base)
+            + de_fracciones(func.sum(centimos(FraccionSaldo.cantidad))),
+            version_base=Cartera.version_base
+            + de_fracciones(func.sum(FraccionSaldo.version)),
+            modificada_base=Cartera.modificada,
+        ).execution_options(synchronize_session=False)
+    )
+    db.session.execute(
+        fracciones.values(cantidad=0, version=0).execution_options(
+            synchronize_session=False
+        )
+    )
+    return resultado.rowcount
+
+
+def compactar_fracciones(id_cartera=None):
+    """
+    Junta el saldo de las fracciones en la fila de CARTERAS de cada cartera fraccionada.
+
+    Cada abono a una fracción encola una compactación de su cartera (ver
+    `abonar`); también se puede lanzar a mano con `flask compactar-fracciones`.
+    Mientras la cartera sigue fraccionada las fracciones vuelven a
+    empezar desde cero, así que la subconsulta que suma el saldo recorre
+    siempre pocas filas con importes pequeños. Va en su propia transacción
+    de escritura, de modo que ningún abono se pierde entre la suma y la
+    puesta a cero.
+
+    Args:
+        id_cartera (int | None): Compacta solo esta cartera. Si es None, todas.
+
+    Returns:
+        int: Número de carteras compactadas.
+
+    Example:
+        >>> compactar_fracciones()
+        3
+    """
+
+    return ejecutar_escritura(lambda: _compactar(id_cartera))
+
+
+def fraccionar_cartera(id_cartera, fracciones):
+    """
+    Activa, cambia o desactiva el reparto del saldo de una cartera en fracciones.
+
+    Útil para carteras que reciben muchos pagos a la vez (comercios): con N
+    fracciones cada abono actualiza una de N filas en lugar de la misma. El
+    saldo que se lee de `Cartera.cantidad` es siempre el total. Antes de
+    cambiar el número de fracciones se compactan las existentes.
+
+    Args:
+        id_cartera (int): Cartera a configurar.
+        fracciones (int): Número de fracciones (0 para volver a una sola fila).
+
+    Returns:
+        None
+
+    Raises:
+        ValueError: Si el número de fracciones no es válido o la cartera no existe.
+
+    Example:
+        >>> fraccionar_cartera(7, 8)
+    """
+
+    if not 0 <= fracciones <= MAX_FRACCIONES:
+        raise ValueError(f"El número de fracciones debe estar entre 0 y {MAX_FRACCIONES}")
+
+    def operacion():
+        _compactar(id_cartera)
+        db.session.execute(
+            db.delete(FraccionSaldo).where(FraccionSaldo.id_cartera == id_cartera)
+        )
+        resultado = db.session.execute(
+            db.update(Cartera)
+            .where(Cartera.id == id_cartera)
+            .values(fracciones=fracciones)
+            .execution_options(synchronize_session=False)
+        )
+        if resultado.rowcount != 1:
+            raise ValueError("La cartera no existe")
+        if fracciones:
+            db.session.execute(
+                db.insert(FraccionSaldo),
+                [
+                    {"id_cartera": id_cartera, "fraccion": n, "cantidad": 0}
+                    for n in range(fracciones)
+                ],
+            )
+
+    ejecutar_escritura(operacion)
@@ -0,0 +1,330 @@
+import csv
+import heapq
+import io
+import json
+from datetime import datetime
+
+from sqlalchemy import String, case, func, literal, or_, select, tuple_, type_coerce, union_all
+from sqlalchemy.orm import aliased
+
+from database import centimos, db
+from models import Cartera, Recargar, Tarjeta, Transaccion, Usuario
+
+LOTE_EXPORTACION = 1000  # Filas por lectura del cursor y por trozo de la respuesta
+FORMATOS_EXPORTACION = ("csv", "jsonl")
+COLUMNAS_EXPORTACION = ("id", "fecha", "tipo", "contraparte", "cantidad")
+
+
+# --- CURSOR DE PAGINACIÓN (fecha, id) --- #
+
+
+def codificar_cursor(fecha, id_transaccion):
+    """
+    Convierte la última fila de una página en un cursor opaco para la siguiente.
+
+    La fecha va tal cual está guardada en la base de datos: SQLite compara
+    las fechas como texto y hay filas con y sin microsegundos (las del
+    `server_default` no los llevan). Si el cursor se volviera a formatear
+    desde un datetime, '2026-01-05 10:30:00' quedaría por debajo de
+    '2026-01-05 10:30:00.000000' y esas filas se repetirían en cada página.
+
+    Args:
+        fecha (str): Fecha de la última transacción mostrada, en el texto guardado.
+        id_transaccion (int): Id de la última transacción mostrada.
+
+    Returns:
+        str: Cursor con el formato '<fecha>_<id>'.
+
+    Example:
+        >>> codificar_cursor("2026-01-05 10:30:00", 42)
+        '2026-01-05 10:30:00_42'
+    """
+
+    return f"{fecha}_{id_transaccion}"
+
+
+def decodificar_cursor(cursor):
+    """
+    Recupera la pareja (fecha, id) de un cursor generado por `codificar_cursor`.
+
+    Args:
+        cursor (str): Cursor recibido del cliente.
+
+    Returns:
+        tuple[str, int]: Fecha (texto guardado) e id a partir de los cuales continuar.
+
+    Raises:
+        ValueError: Si el cursor no tiene un formato válido.
+    """
+
+    fecha, _, id_texto = cursor.rpartition("_")
+    datetime.fromisoformat(fecha)  # Solo para rechazar cursores mal formados
+    return fecha, int(id_texto)
+
+
+# --- CONSULTAS --- #
+
+
+# La fecha como el texto que hay en la BD (mismo SQL, sin convertir a datetime)
+_fecha_guardada = type_coerce(Transaccion.fecha, String)
+
+
+def _rama_historial(columna, cartera_id, limite, cursor=None, excluir_propias=False):
+    """Transacciones de un lado (enviadas o recibidas) ya ordenadas y limitadas.
+
+    Cada rama recorre su índice (cartera, fecha) hacia atrás y se detiene en
+    `limite` filas, así el coste de una página no depende del historial total.
+    """
+
+    consulta = select(
+        Transaccion.id,
+        Transaccion.fecha,
+        _fecha_guardada.label("fecha_guardada"),
+        Transaccion.cantidad,
+        Transaccion.id_cartera_enviado,
+        Transaccion.id_cartera_recibido,
+    ).where(columna == cartera_id)
+
+    if excluir_propias:
+        # Una transferencia a uno mismo ya aparece en la rama de enviadas
+        consulta = consulta.where(
+            Transaccion.id_cartera_enviado.is_distinct_from(cartera_id)
+        )
+    if cursor is not None:
+        # Misma comparación de texto que el ORDER BY, sin tocar el índice
+        consulta = consulta.where(tuple_(_fecha_guardada, Transaccion.id) < cursor)
+
+    consulta = consulta.order_by(Transaccion.fecha.desc(), Transaccion.id.desc())
+    return select(consulta.limit(limite).subquery())
+
+
+def obtener_pagina_historial(cartera_id, limite=25, cursor=None):
+    """
+    Recupera una página del historial de una cartera con una sola consulta.
+
+    Las transacciones enviadas y recibidas y el nombre de la otra parte se
+    obtienen en la misma sentencia (sin una consulta extra por fila). La
+    paginación es por cursor (fecha, id), por lo que pedir la página 200 cuesta
+    lo mismo que pedir la primera.
+
+    Args:
+        cartera_id (int): Cartera cuyo historial se consulta.
+        limite (int): Número máximo de filas de la página.
+        cursor (str | None): Cursor devuelto por la página anterior, o None
+            para empezar por los movimientos más recientes.
+
+    Returns:
+        tuple[list[dict], str | None]: Las filas formateadas para la tabla y el
+            cursor de la página siguiente (None si no hay más).
+
+    Raises:
+        ValueError: Si el cursor recibido no es válido.
+
+    Example:
+        >>> filas, siguiente = obtener_pagina_historial(3, limite=2)
+        >>> filas[0]
+        {'fecha': '05/01/2026 10:30', 'tipo': 'Enviado', 'usuario': 'Bob', 'cantidad': '20.00 €'}
+    """
+
+    posicion = decodificar_cursor(cursor) if cursor else None
+
+    # Pedimos una fila de más para saber si existe página siguiente
+    movimientos = union_all(
+        _rama_historial(Transaccion.id_cartera_enviado, cartera_id, limite + 1, posicion),
+        _rama_historial(
+            Transaccion.id_cartera_recibido,
+            cartera_id,
+            limite + 1,
+            posicion,
+            excluir_propias=True,
+        ),
+    ).subquery("movimientos")
+
+    cartera_otra = aliased(Cartera)
+    usuario_otro = aliased(Usuario)
+    contraparte = case(
+        (
+            movimientos.c.id_cartera_enviado == cartera_id,
+            movimientos.c.id_cartera_recibido,
+        ),
+        else_=movimientos.c.id_cartera_enviado,
+    )
+
+    consulta = (
+        select(
+            movimientos.c.id,
+            movimientos.c.fecha,
+            movimientos.c.fecha_guardada,
+            movimientos.c.cantidad,
+            movimientos.c.id_cartera_enviado,
+            usuario_otro.nombre,
+        )
+        .select_from(movimientos)
+        .outerjoin(cartera_otra, cartera_otra.id == contraparte)
+        .outerjoin(usuario_otro, usuario_otro.id == cartera_otra.id_usuario)
+        .order_by(movimientos.c.fecha.desc(), movimientos.c.id.desc())
+        .limit(limite + 1)
+    )
+    resultado = db.session.execute(consulta).all()
+
+    siguiente = None
+    if len(resultado) > limite:
+        resultado = resultado[:limite]
+        ultima = resultado[-1]
+        siguiente = codificar_cursor(ultima.fecha_guardada, ultima.id)
+
+    filas = [
+        {
+            "fecha": fila.fecha.strftime("%d/%m/%Y %H:%M"),
+            "tipo": "Enviado" if fila.id_cartera_enviado == cartera_id else "Recibido",
+            "usuario": fila.nombre or "Desconocido",
+            "cantidad": f"{fila.cantidad:.2f} €",
+        }
+        for fila in resultado
+    ]
+    return filas, siguiente
+
+
+def contar_movimientos(cartera_id):
+    """
+    Cuenta las transacciones (enviadas o recibidas) de una cartera.
+
+    Args:
+        cartera_id (int): Cartera a consultar.
+
+    Returns:
+        int: Número total de movimientos.
+    """
+
+    return db.session.execute(
+        select(func.count(Transaccion.id)).where(
+            or_(
+                Transaccion.id_cartera_enviado == cartera_id,
+                Transaccion.id_cartera_recibido == cartera_id,
+            )
+        )
+    ).scalar_one()
+
+
+# --- EXPORTACIÓN COMPLETA --- #
+
+
+def _ramas_exportacion(cartera_id):
+    """Enviadas, recibidas y recargas, cada una en orden cronológico por su índice."""
+
+    cartera_otra = aliased(Cartera)
+    usuario_otro = aliased(Usuario)
+
+    def transacciones(tipo, propia, otra, *condiciones):
+        return (
+            select(
+                Transaccion.id,
+                Transaccion.fecha,
+                literal(tipo).label("tipo"),
+                usuario_otro.nombre.label("contraparte"),
+                centimos(Transaccion.cantidad).label("cantidad"),
+            )
+            .outerjoin(cartera_otra, cartera_otra.id == otra)
+            .outerjoin(usuario_otro, usuario_otro.id == cartera_otra.id_usuario)
+            .where(propia == cartera_id, *condiciones)
+            .order_by(Transaccion.fecha, Transaccion.id)
+        )
+
+    return [
+        transacciones(
+            "Enviado", Transaccion.id_cartera_enviado, Transaccion.id_cartera_recibido
+        ),
+        transacciones(
+            "Recibido",
+            Transaccion.id_cartera_recibido,
+            Transaccion.id_cartera_enviado,
+            # Una transferencia a uno mismo ya sale como enviada
+            Transaccion.id_cartera_enviado.is_distinct_from(cartera_id),
+        ),
+        select(
+            Recargar.id,
+            Recargar.fecha,
+            literal("Recarga").label("tipo"),
+            Tarjeta.propietario_nombre.label("contraparte"),
+            centimos(Recargar.cantidad).label("cantidad"),
+        )
+        .outerjoin(Tarjeta, Tarjeta.id == Recargar.id_tarjeta)
+        .where(Recargar.id_cartera == cartera_id)
+        .order_by(Recargar.fecha, Recargar.id),
+    ]
+
+
+def _importe(centimos_):
+    """Céntimos a texto con dos decimales, sin pasar por Decimal ni float."""
+
+    signo = "-" if centimos_ < 0 else ""
+    euros, resto = divmod(abs(centimos_), 100)
+    return f"{signo}{euros}.{resto:02d}"
+
+
+def exportar_historial(cartera_id, formato="csv"):
+    """
+    Genera el historial completo de una cartera como texto, por trozos.
+
+    Pensado para descargas de cientos de miles de movimientos: cada rama
+    (enviadas, recibidas y recargas, con el nombre de la otra parte ya unido
+    en la consulta) se lee del cursor en lotes de `LOTE_EXPORTACION` filas
+    con `yield_per`, las tres se mezclan en orden cronológico con
+    `heapq.merge` y cada lote se entrega en cuanto está escrito. No se crean
+    objetos del ORM ni listas con el historial entero, así que la memoria no
+    depende del tamaño del historial.
+
+    Args:
+        cartera_id (int): Cartera cuyo historial se exporta.
+        formato (str): 'csv' (con cabecera) o 'jsonl' (un objeto JSON por línea).
+
+    Yields:
+        str: Trozos consecutivos del fichero.
+
+    Raises:
+        ValueError: Si el formato no es uno de `FORMATOS_EXPORTACION`.
+
+    Example:
+        >>> "".join(exportar_historial(3))
+        'id,fecha,tipo,contraparte,cantidad\r\n7,2026-01-05T10:30:00,Enviado,Bob,20.00\r\n'
+    """
+
+    if formato not in FORMATOS_EXPORTACION:
+        raise ValueError(f"Formato no válido: {formato}")
+
+    flujos = [
+        db.session.execute(rama.execution_options(yield_per=LOTE_EXPORTACION))
+        for rama in _ramas_exportacion(cartera_id)
+    ]
+    filas = heapq.merge(*flujos, key=lambda fila: (fila.fecha or datetime.min, fila.id))
+
+    trozo = io.StringIO()
+    escritor = csv.writer(trozo)
+    if formato == "csv":
+        escritor.writerow(COLUMNAS_EXPORTACION)
+
+    pendientes = 0
+    for fila in filas:
+        valores = (
+            fila.id,
+            fila.fecha.isoformat() if fila.fecha else "",
+            fila.tipo,
+            fila.contraparte or "",
+            _importe(fila.cantidad),
+        )
+        if formato == "csv":
+            escritor.writerow(valores)
+        else:
+            objeto = dict(zip(COLUMNAS_EXPORTACION, valores))
+            trozo.write(json.dumps(objeto, ensure_ascii=False) + "\n")
+
+        pendientes += 1
+        if pendientes == LOTE_EXPORTACION:
+            yield trozo.getvalue()
+            trozo.seek(0)
+            trozo.truncate()
+            pendientes = 0
+
+    if trozo.tell():
+        yield trozo.getvalue()
+
@@ -0,0 +1,264 @@
+from collections import defaultdict
+from datetime import date, datetime, time
+from functools import lru_cache
+
+from sqlalchemy import and_, bindparam, func, select, union_all
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import aliased
+
+from database import a_euros, centimos, db
+from models import Cartera, PuntoControl, Recargar, Transaccion
+from services.transaccion_service import ejecutar_escritura
+
+
+def obtener_saldo_en(id_cartera, momento):
+    """
+    Saldo que tenía la cartera en un momento dado.
+
+    Parte del último punto de control anterior a `momento` y suma solo los
+    movimientos entre ese punto y `momento`: una búsqueda por clave primaria
+    y tres tramos acotados de los índices (cartera, fecha). Si la cartera aún
+    no tiene puntos de control, resta al saldo actual los movimientos
+    posteriores a `momento`.
+
+    Args:
+        id_cartera (int): Cartera consultada.
+        momento (datetime): Instante del que se quiere el saldo (excluido:
+            un movimiento justo en `momento` todavía no cuenta).
+
+    Returns:
+        Decimal: Saldo en ese instante, con dos decimales.
+
+    Raises:
+        ValueError: Si la cartera no existe.
+
+    Example:
+        >>> obtener_saldo_en(1, datetime(2026, 3, 15, 12, 0))
+        Decimal('240.50')
+    """
+
+    return a_euros(_saldo_en(id_cartera, momento))
+
+
+def crear_punto_control(id_cartera, fecha=None):
+    """
+    Guarda (o rehace) el punto de control de una cartera en una fecha.
+
+    El saldo se calcula con `obtener_saldo_en` dentro de la misma transacción
+    de escritura, así que ningún movimiento puede colarse entre el cálculo
+    y el guardado.
+
+    Args:
+        id_cartera (int): Cartera a la que se añade el punto.
+        fecha (date | None): Día del punto; el saldo es el de ese día a las
+            00:00 (por defecto, hoy).
+
+    Returns:
+        Decimal: Saldo guardado.
+
+    Raises:
+        ValueError: Si la cartera no existe.
+
+    Example:
+        >>> crear_punto_control(1, date(2026, 3, 1))
+        Decimal('180.00')
+    """
+
+    fecha = fecha or date.today()
+
+    def operacion():
+        saldo = _saldo_en(id_cartera, datetime.combine(fecha, time.min))
+        stmt = insert(PuntoControl.__table__).values(
+            id_cartera=id_cartera, fecha=fecha, saldo=centimos(bindparam("b_saldo"))
+        )
+        db.session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[PuntoControl.id_cartera, PuntoControl.fecha],
+                set_={"saldo": stmt.excluded.saldo},
+            ),
+            {"b_saldo": saldo},
+        )
+        return a_euros(saldo)
+
+    return ejecutar_escritura(operacion)
+
+
+def generar_puntos_control(id_cartera=None, hasta=None):
+    """
+    Escribe los puntos de control mensuales (día 1 de cada mes) que falten.
+
+    Pensada para ejecutarse periódicamente (`flask generar-puntos-control`
+    desde cron). Es incremental: cada cartera sigue desde su último punto
+    y solo se leen los movimientos posteriores a él. Las carteras que aún no
+    tienen ninguno se completan hacia atrás desde el saldo actual, desde el
+    mes de su primer movimiento.
+
+    Args:
+        id_cartera (int | None): Limita la generación a una cartera.
+            Si es None se generan para todas.
+        hasta (date | None): Último mes a generar (por defecto, el actual;
+            nunca uno posterior).
+
+    Returns:
+        int: Número de puntos de control escritos.
+
+    Example:
+        >>> generar_puntos_control()
+        42
+    """
+
+    mes_actual = date.today().replace(day=1)
+    hasta = min((hasta or mes_actual).replace(day=1), mes_actual)
+    return ejecutar_escritura(lambda: _generar(id_cartera, hasta, mes_actual))
+
+
+def _saldo_en(id_cartera, momento):
+    """Saldo en céntimos de `obtener_saldo_en`."""
+
+    punto = db.session.execute(
+        select(PuntoControl.fecha, centimos(PuntoControl.saldo))
+        .where(PuntoControl.id_cartera == id_cartera, PuntoControl.fecha <= momento.date())
+        .order_by(PuntoControl.fecha.desc())
+        .limit(1)
+    ).first()
+    if punto is not None:
+        fecha, saldo = punto
+        desde = datetime.combine(fecha, time.min)
+        return saldo + _neto(id_cartera, desde, momento)
+
+    actual = db.session.execute(
+        select(centimos(Cartera.cantidad)).where(Cartera.id == id_cartera)
+    ).scalar()
+    if actual is None:
+        raise ValueError("La cartera no existe")
+    return (actual or 0) - _neto(id_cartera, momento)
+
+
+def _neto(id_cartera, desde, hasta=None):
+    """Entradas menos salidas de la cartera en [desde, hasta), en céntimos."""
+
+    return db.session.execute(
+        _consulta_neto(hasta is not None),
+        {"cartera_id": id_cartera, "desde": desde, "hasta": hasta},
+    ).scalar()
+
+
+@lru_cache(maxsize=None)
+def _consulta_neto(acotada):
+    """
+    Sentencia de `_neto`, construida una vez por variante (con o sin fin).
+
+    Cada suma es una subconsulta escalar sobre su propio índice
+    (cartera, fecha, cantidad), así que solo recorre el tramo pedido.
+    """
+
+    cartera_id = bindparam("cartera_id")
+    desde = bindparam("desde", type_=Transaccion.fecha.type)
+    hasta = bindparam("hasta", type_=Transaccion.fecha.type)
+
+    def suma(columna_cartera, fecha, cantidad):
+        condiciones = [columna_cartera == cartera_id, fecha >= desde]
+        if acotada:
+            condiciones.append(fecha < hasta)
+        return (
+            select(func.coalesce(func.sum(centimos(cantidad)), 0))
+            .where(*condiciones)
+            .scalar_subquery()
+        )
+
+    return select(
+        suma(Transaccion.id_cartera_recibido, Transaccion.fecha, Transaccion.cantidad)
+        - suma(Transaccion.id_cartera_enviado, Transaccion.fecha, Transaccion.cantidad)
+        + suma(Recargar.id_cartera, Recargar.fecha, Recargar.cantidad)
+    )
+
+
+def _mes_siguiente(mes):
+    return mes.replace(year=mes.year + mes.month // 12, month=mes.month % 12 + 1)
+
+
+def _mes_anterior(mes):
+    return mes.replace(year=mes.year - (mes.month == 1), month=(mes.month - 2) % 12 + 1)
+
+
+def _generar(id_cartera, hasta, mes_actual):
+    """Trabajo de `generar_puntos_control`, dentro de su transacción de escritura."""
+
+    def ultimo_punto(columna_cartera):
+        punto = aliased(PuntoControl)  # Sin correlar con PUNTOS_CONTROL de fuera
+        return (
+            select(func.max(punto.fecha))
+            .where(punto.id_cartera == columna_cartera)
+            .scalar_subquery()
+        )
+
+    def rama(columna_cartera, fecha, importe):
+        # Solo los movimientos posteriores al último punto de la cartera
+        consulta = select(
+            columna_cartera.label("id_cartera"),
+            func.strftime("%Y-%m-01", fecha).label("mes"),
+            importe.label("neto"),
+        ).where(
+            columna_cartera.is_not(None),
+            fecha >= func.coalesce(ultimo_punto(columna_cartera), date.min),
+        )
+        if id_cartera is not None:
+            consulta = consulta.where(columna_cartera == id_cartera)
+        return consulta
+
+    ramas = [
+        rama(Transaccion.id_cartera_recibido, Transaccion.fecha, centimos(Transaccion.cantidad)),
+        rama(Transaccion.id_cartera_enviado, Transaccion.fecha, -centimos(Transaccion.cantidad)),
+        rama(Recargar.id_cartera, Recargar.fecha, centimos(Recargar.cantidad)),
+    ]
+    anclas = select(
+        Cartera.id, centimos(Cartera.cantidad), PuntoControl.fecha, centimos(PuntoControl.saldo)
+    ).outerjoin(
+        PuntoControl,
+        and_(PuntoControl.id_cartera == Cartera.id, PuntoControl.fecha == ultimo_punto(Cartera.id)),
+    )
+    if id_cartera is not None:
+        anclas = anclas.where(Cartera.id == id_cartera)
+
+    movimientos = union_all(*ramas).subquery("movimientos")
+    netos = defaultdict(dict)
+    for c_id, mes, neto in db.session.execute(
+        select(movimientos.c.id_cartera, movimientos.c.mes, func.sum(movimientos.c.neto))
+        .group_by(movimientos.c.id_cartera, movimientos.c.mes)
+    ):
+        netos[c_id][date.fromisoformat(mes)] = neto
+
+    filas = []
+    for c_id, actual, fecha, saldo in db.session.execute(anclas):
+        meses = netos.get(c_id, {})
+        if fecha is not None:
+            # Hacia delante desde el último punto, mes a mes
+            mes = fecha.replace(day=1)
+            while True:
+                saldo += meses.get(mes, 0)
+                mes = _mes_siguiente(mes)
+                if mes > hasta:
+                    break
+                filas.append({"b_cartera": c_id, "b_fecha": mes, "b_saldo": saldo})
+        else:
+            # Sin puntos: hacia atrás desde el saldo actual
+            saldo = actual or 0
+            mes = max([mes_actual, *meses])
+            primero = min([hasta, *meses])
+            while mes >= primero:
+                saldo -= meses.get(mes, 0)  # Ahora es el saldo al empezar `mes`
+                if mes <= hasta:
+                    filas.append({"b_cartera": c_id, "b_fecha": mes, "b_saldo": saldo})
+                mes = _mes_anterior(mes)
+
+    if filas:
+        # Los céntimos se insertan tal cual, sin pasar por el tipo Dinero ni por el ORM
+        db.session.execute(
+            db.insert(PuntoControl.__table__).values(
+                id_cartera=bindparam("b_cartera"),
+                fecha=bindparam("b_fecha", type_=PuntoControl.fecha.type),
+                saldo=centimos(bindparam("b_saldo")),
+            ),
+            filas,
+        )
+    return len(filas)
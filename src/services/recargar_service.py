@@ -0,0 +1,47 @@
+from datetime import datetime
+
+from database import db
+from models import Recargar
+from services.saldo_service import registrar_movimiento
+from services.transaccion_service import (
+    _validar_cantidad,
+    abonar,
+    ejecutar_escritura,
+)
+
+
+def recargar_cartera(id_cartera, cantidad, id_tarjeta=None):
+    """
+    Ingresa dinero en una cartera y deja constancia de la recarga.
+
+    El saldo se incrementa con una UPDATE atómica en la base de datos, y la
+    fila de RECARGAS y el resumen diario se confirman en la misma transacción.
+
+    Args:
+        id_cartera (int): Cartera que recibe el dinero.
+        cantidad (Decimal | float | str): Importe a ingresar (mayor que 0).
+        id_tarjeta (int | None): Tarjeta de origen, si la hay.
+
+    Returns:
+        None
+
+    Raises:
+        TransferenciaRechazada: Si la cantidad no es válida o la cartera no existe.
+
+    Example:
+        >>> recargar_cartera(3, Decimal("20.00"))
+    """
+
+    cantidad = _validar_cantidad(cantidad)
+
+    def operacion():
+        fecha = datetime.now()  # Misma fecha local en RECARGAS y en los resúmenes
+        abonar(id_cartera, cantidad)
+        db.session.add(
+            Recargar(
+                id_cartera=id_cartera, id_tarjeta=id_tarjeta, cantidad=cantidad, fecha=fecha
+            )
+        )
+        registrar_movimiento(id_cartera, entrada=cantidad, fecha=fecha)
+
+    ejecutar_escritura(operacion)
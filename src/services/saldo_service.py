@@ -0,0 +1,370 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import bindparam, func, literal, select, union_all
+from sqlalchemy.dialects.sqlite import insert
+
+from database import centimos, db
+from models import Cartera, Recargar, ResumenMensual, SaldoDiario, Transaccion
+
+
+def registrar_movimiento(id_cartera, entrada=0, salida=0, fecha=None):
+    """
+    Acumula un movimiento en el resumen diario y mensual de la cartera.
+
+    Debe llamarse después de actualizar `CARTERAS.cantidad` y antes del commit,
+    de modo que el resumen y el saldo se confirmen en la misma transacción.
+    El saldo de cierre del día se toma del saldo actual de la cartera.
+
+    Args:
+        id_cartera (int): Cartera afectada por el movimiento.
+        entrada (Decimal | float): Importe que entra en la cartera.
+        salida (Decimal | float): Importe que sale de la cartera.
+        fecha (datetime | None): Momento del movimiento (por defecto, ahora).
+
+    Returns:
+        None: No hace commit; lo deja en manos de quien llama.
+
+    Example:
+        >>> cartera.cantidad += Decimal("20.00")
+        >>> registrar_movimiento(cartera.id, entrada=Decimal("20.00"))
+        >>> db.session.commit()
+    """
+
+    registrar_movimientos({id_cartera: (entrada, salida)}, fecha)
+
+
+def registrar_movimientos(movimientos, fecha=None):
+    """
+    Acumula en los resúmenes los movimientos de varias carteras a la vez.
+
+    Es la versión por lotes de `registrar_movimiento`: una sentencia
+    preparada (executemany) por tabla de resumen, SALDOS_DIARIOS y
+    RESUMENES_MENSUALES, para todas las carteras. Mismas condiciones: los
+    saldos ya deben estar actualizados y no hace commit.
+
+    Args:
+        movimientos (dict[int, tuple]): Por cartera, la pareja (entrada, salida).
+        fecha (datetime | None): Momento de los movimientos (por defecto, ahora).
+
+    Returns:
+        None
+
+    Example:
+        >>> registrar_movimientos({1: (0, Decimal("30")), 2: (Decimal("30"), 0)})
+    """
+
+    if not movimientos:
+        return
+
+    dia = (fecha or datetime.now()).date()
+    importe = SaldoDiario.entradas.type
+    saldo_actual = (
+        select(Cartera.cantidad)
+        .where(Cartera.id == bindparam("b_cartera"))
+        .scalar_subquery()
+    )
+
+    # Los cambios pendientes de la sesión deben estar en la BD antes de leer el saldo
+    db.session.flush()
+
+    stmt = insert(SaldoDiario.__table__).values(
+        id_cartera=bindparam("b_cartera"),
+        fecha=dia,
+        entradas=bindparam("b_entrada", type_=importe),
+        salidas=bindparam("b_salida", type_=importe),
+        saldo_cierre=saldo_actual,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[SaldoDiario.id_cartera, SaldoDiario.fecha],
+        set_={
+            "entradas": SaldoDiario.entradas + stmt.excluded.entradas,
+            "salidas": SaldoDiario.salidas + stmt.excluded.salidas,
+            "saldo_cierre": stmt.excluded.saldo_cierre,
+        },
+    )
+    mensual = insert(ResumenMensual.__table__).values(
+        id_cartera=bindparam("b_cartera"),
+        mes=dia.replace(day=1),
+        ingresos=bindparam("b_entrada", type_=importe),
+        gastos=bindparam("b_salida", type_=importe),
+    )
+    mensual = mensual.on_conflict_do_update(
+        index_elements=[ResumenMensual.id_cartera, ResumenMensual.mes],
+        set_={
+            "ingresos": ResumenMensual.ingresos + mensual.excluded.ingresos,
+            "gastos": ResumenMensual.gastos + mensual.excluded.gastos,
+        },
+    )
+
+    parametros = [
+        {"b_cartera": id_cartera, "b_entrada": entrada, "b_salida": salida}
+        for id_cartera, (entrada, salida) in movimientos.items()
+    ]
+    db.session.execute(stmt, parametros)
+    db.session.execute(mensual, parametros)
+
+
+def resumen_completo_desde(id_cartera, desde):
+    """
+    Indica si los resúmenes de la cartera recogen todos sus movimientos desde `desde`.
+
+    SALDOS_DIARIOS y RESUMENES_MENSUALES se rellenan con cada movimiento
+    desde que existen; el historial anterior solo entra al ejecutar
+    `reconstruir_saldos_diarios`. Se dan por completos si el primer día
+    resumido es anterior o igual a `desde` o si no hay movimientos anteriores
+    a él. Son cuatro búsquedas del mínimo en los índices (cartera, fecha).
+
+    Args:
+        id_cartera (int): Cartera a comprobar.
+        desde (date): Primer día que se va a leer de los resúmenes.
+
+    Returns:
+        bool: True si se puede leer del resumen; False si hay que ir a los movimientos.
+
+    Example:
+        >>> resumen_completo_desde(cartera.id, date(2026, 1, 1))
+        True
+    """
+
+    def primero(fecha, *condiciones):
+        return select(func.min(fecha)).where(*condiciones).scalar_subquery()
+
+    primer_resumen, *primeros = db.session.execute(
+        select(
+            primero(SaldoDiario.fecha, SaldoDiario.id_cartera == id_cartera),
+            primero(Transaccion.fecha, Transaccion.id_cartera_enviado == id_cartera),
+            primero(Transaccion.fecha, Transaccion.id_cartera_recibido == id_cartera),
+            primero(Recargar.fecha, Recargar.id_cartera == id_cartera),
+        )
+    ).one()
+
+    movimientos = [fecha.date() for fecha in primeros if fecha is not None]
+    if not movimientos:
+        return True
+    return primer_resumen is not None and (
+        primer_resumen <= desde or primer_resumen <= min(movimientos)
+    )
+
+
+def carteras_con_resumen_incompleto():
+    """
+    Carteras cuyos resúmenes no cuadran con sus movimientos.
+
+    Compara, por cartera, el total de entradas y salidas de SALDOS_DIARIOS con
+    el de TRANSACCIONES y RECARGAS: difieren, por ejemplo, si había historial
+    antes de existir los resúmenes y no se ha reconstruido. Recorre todas las
+    tablas; es para `flask actualizar-esquema`, no para las peticiones.
+
+    Returns:
+        list[int]: Ids de las carteras a reconstruir.
+    """
+
+    movimientos = union_all(
+        select(
+            Transaccion.id_cartera_recibido.label("id_cartera"),
+            centimos(Transaccion.cantidad).label("entrada"),
+            literal(0).label("salida"),
+        ),
+        select(
+            Transaccion.id_cartera_enviado.label("id_cartera"),
+            literal(0).label("entrada"),
+            centimos(Transaccion.cantidad).label("salida"),
+        ),
+        select(
+            Recargar.id_cartera.label("id_cartera"),
+            centimos(Recargar.cantidad).label("entrada"),
+            literal(0).label("salida"),
+        ),
+        select(
+            SaldoDiario.id_cartera.label("id_cartera"),
+            -centimos(SaldoDiario.entradas).label("entrada"),
+            -centimos(SaldoDiario.salidas).label("salida"),
+        ),
+    ).subquery("movimientos")
+
+    return list(
+        db.session.execute(
+            select(movimientos.c.id_cartera)
+            .where(movimientos.c.id_cartera.in_(select(Cartera.id)))
+            .group_by(movimientos.c.id_cartera)
+            .having(
+                (func.sum(movimientos.c.entrada) != 0) | (func.sum(movimientos.c.salida) != 0)
+            )
+        ).scalars()
+    )
+
+
+def obtener_gastos_mes(id_cartera, fecha=None):
+    """
+    Total gastado (enviado en transferencias) por la cartera en un mes.
+
+    Lee el contador de RESUMENES_MENSUALES por clave primaria. Si la cartera
+    no tiene fila ese mes (sin movimientos) o el resumen no cubre el mes
+    entero (historial anterior a los resúmenes y aún sin reconstruir, ver
+    `resumen_completo_desde`), suma las transacciones enviadas con un rango de fechas semiabierto
+    [día 1, día 1 del mes siguiente), que recorre solo ese tramo del índice
+    (cartera, fecha, cantidad).
+
+    Args:
+        id_cartera (int): Cartera cuyos gastos se consultan.
+        fecha (datetime | None): Cualquier momento del mes (por defecto, ahora).
+
+    Returns:
+        Decimal: Total gastado en el mes, con dos decimales.
+
+    Example:
+        >>> obtener_gastos_mes(cartera.id)
+        Decimal('35.50')
+    """
+
+    inicio = (fecha or datetime.now()).replace(
+        day=1, hour=0, minute=0, second=0, microsecond=0
+    )
+    resumen = db.session.get(ResumenMensual, (id_cartera, inicio.date()))
+    if resumen is not None and resumen_completo_desde(id_cartera, inicio.date()):
+        return Decimal(resumen.gastos).quantize(Decimal("0.01"))
+
+    siguiente = inicio.replace(
+        year=inicio.year + inicio.month // 12, month=inicio.month % 12 + 1
+    )
+    total = db.session.execute(
+        select(func.sum(Transaccion.cantidad)).where(
+            Transaccion.id_cartera_enviado == id_cartera,
+            Transaccion.fecha >= inicio,
+            Transaccion.fecha < siguiente,
+        )
+    ).scalar()
+    return Decimal(str(total or 0)).quantize(Decimal("0.01"))
+
+
+def reconstruir_saldos_diarios(id_cartera=None):
+    """
+    Regenera los resúmenes diario y mensual a partir de TRANSACCIONES y RECARGAS.
+
+    Agrupa todos los movimientos por cartera y día en una sola consulta y
+    reconstruye los saldos de cierre hacia atrás partiendo del saldo actual
+    de cada cartera (igual que hacía el cálculo original del gráfico). Los
+    contadores mensuales salen de sumar esas mismas filas diarias.
+
+    Args:
+        id_cartera (int | None): Limita la reconstrucción a una cartera.
+            Si es None se reconstruyen todas.
+
+    Returns:
+        int: Número de filas diarias escritas.
+
+    Example:
+        >>> reconstruir_saldos_diarios()
+        128
+    """
+
+    dia_sql = func.date(Transaccion.fecha)
+    # Todo en céntimos enteros: sumas exactas en SQL y en el bucle de abajo
+    ramas = [
+        select(
+            Transaccion.id_cartera_recibido.label("id_cartera"),
+            dia_sql.label("dia"),
+            centimos(Transaccion.cantidad).label("entrada"),
+            literal(0).label("salida"),
+        ),
+        select(
+            Transaccion.id_cartera_enviado.label("id_cartera"),
+            dia_sql.label("dia"),
+            literal(0).label("entrada"),
+            centimos(Transaccion.cantidad).label("salida"),
+        ),
+        select(
+            Recargar.id_cartera.label("id_cartera"),
+            func.date(Recargar.fecha).label("dia"),
+            centimos(Recargar.cantidad).label("entrada"),
+            literal(0).label("salida"),
+        ),
+    ]
+    movimientos = union_all(*ramas).subquery("movimientos")
+
+    consulta = (
+        select(
+            movimientos.c.id_cartera,
+            movimientos.c.dia,
+            func.sum(movimientos.c.entrada),
+            func.sum(movimientos.c.salida),
+        )
+        .where(movimientos.c.id_cartera.is_not(None))
+        .group_by(movimientos.c.id_cartera, movimientos.c.dia)
+        .order_by(movimientos.c.id_cartera, movimientos.c.dia.desc())
+    )
+    carteras = select(Cartera.id, centimos(Cartera.cantidad))
+    borrado = db.delete(SaldoDiario)
+    borrado_mensual = db.delete(ResumenMensual)
+    if id_cartera is not None:
+        consulta = consulta.where(movimientos.c.id_cartera == id_cartera)
+        carteras = carteras.where(Cartera.id == id_cartera)
+        borrado = borrado.where(SaldoDiario.id_cartera == id_cartera)
+        borrado_mensual = borrado_mensual.where(ResumenMensual.id_cartera == id_cartera)
+
+    saldos = {c_id: cant or 0 for c_id, cant in db.session.execute(carteras)}
+
+    # Recorremos cada cartera desde el día más reciente hacia atrás
+    filas = []
+    for c_id, dia, entrada, salida in db.session.execute(consulta):
+        if c_id not in saldos:
+            continue
+        entrada = entrada or 0
+        salida = salida or 0
+        filas.append(
+            {
+                "b_cartera": c_id,
+                "b_fecha": date.fromisoformat(dia),
+                "b_entradas": entrada,
+                "b_salidas": salida,
+                "b_saldo": saldos[c_id],
+            }
+        )
+        saldos[c_id] -= entrada - salida
+
+    meses = {}
+    for fila in filas:
+        clave = (fila["b_cartera"], fila["b_fecha"].replace(day=1))
+        ingresos, gastos = meses.get(clave, (0, 0))
+        meses[clave] = (ingresos + fila["b_entradas"], gastos + fila["b_salidas"])
+
+    # Los céntimos se insertan tal cual, sin pasar por el tipo Dinero. Sobre la
+    # tabla (Core) y no sobre el modelo: un executemany sin el ORM por cada fila
+    insercion = db.insert(SaldoDiario.__table__).values(
+        id_cartera=bindparam("b_cartera"),
+        fecha=bindparam("b_fecha", type_=SaldoDiario.fecha.type),
+        entradas=centimos(bindparam("b_entradas")),
+        salidas=centimos(bindparam("b_salidas")),
+        saldo_cierre=centimos(bindparam("b_saldo")),
+    )
+    insercion_mensual = db.insert(ResumenMensual.__table__).values(
+        id_cartera=bindparam("b_cartera"),
+        mes=bindparam("b_fecha", type_=ResumenMensual.mes.type),
+        ingresos=centimos(bindparam("b_entradas")),
+        gastos=centimos(bindparam("b_salidas")),
+    )
+
+    try:
+        db.session.execute(borrado)
+        db.session.execute(borrado_mensual)
+        if filas:
+            db.session.execute(insercion, filas)
+            db.session.execute(
+                insercion_mensual,
+                [
+                    {
+                        "b_cartera": c_id,
+                        "b_fecha": mes,
+                        "b_entradas": ingresos,
+                        "b_salidas": gastos,
+                    }
+                    for (c_id, mes), (ingresos, gastos) in meses.items()
+                ],
+            )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return len(filas)
@@ -0,0 +1,501 @@
+import csv
+import io
+import random
+import time
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import case, insert, select
+from sqlalchemy.exc import OperationalError
+
+from database import a_centimos, a_euros, centimos, db
+from metricas import incrementar
+from models import Cartera, FraccionSaldo, Transaccion
+from services.cartera_service import obtener_ids_cartera_por_destinatario
+from services.saldo_service import registrar_movimiento, registrar_movimientos
+
+# Reintentos ante "database is locked" (espera exponencial con algo de azar)
+MAX_REINTENTOS = 6
+ESPERA_INICIAL = 0.01
+
+# Límite de líneas de un lote y de carteras por cada UPDATE agregada
+MAX_LINEAS_LOTE = 5000
+CARTERAS_POR_UPDATE = 500
+
+# Segundos entre un abono a una fracción y la compactación que encola
+RETRASO_COMPACTACION = 60
+
+
+class TransferenciaRechazada(ValueError):
+    """La transferencia no puede hacerse: saldo insuficiente, cartera inexistente..."""
+
+
+# --- TRANSACCIONES DE ESCRITURA --- #
+
+
+def _bloqueo_escritura():
+    """
+    Toma el cerrojo de escritura de SQLite al empezar la transacción.
+
+    Con `BEGIN IMMEDIATE` dos escrituras concurrentes se ordenan en el primer
+    paso en lugar de fallar al intentar promocionar un cerrojo de lectura a
+    mitad de la transacción. En otros motores no hace falta: las UPDATE
+    condicionadas ya bloquean las filas que tocan.
+    """
+
+    conexion = db.session.connection()
+    if conexion.dialect.name != "sqlite":
+        return
+    # Si la sesión ya ha escrito algo el cerrojo ya es nuestro
+    if not conexion.connection.dbapi_connection.in_transaction:
+        conexion.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def _base_datos_bloqueada(error):
+    return "database is locked" in str(getattr(error, "orig", error))
+
+
+def _cambios_pendientes():
+    """Indica si la sesión tiene cambios sin confirmar (en memoria o ya enviados)."""
+
+    sesion = db.session()
+    if sesion.new or sesion.deleted or any(sesion.is_modified(o) for o in sesion.dirty):
+        return True
+    if not sesion.in_transaction():
+        return False
+    # Cambios enviados con flush: en SQLite la conexión solo abre transacción al escribir
+    conexion = sesion.connection()
+    return conexion.dialect.name == "sqlite" and conexion.connection.dbapi_connection.in_transaction
+
+
+def ejecutar_escritura(operacion):
+    """
+    Ejecuta `operacion` en su propia transacción de escritura y hace commit.
+
+    La sesión debe llegar sin cambios pendientes: si no, se lanza un error en
+    vez de confirmarlos o descartarlos sin avisar, porque quedarían fuera de
+    los reintentos. Quien tenga cambios propios debe hacer commit antes o
+    incluirlos en `operacion`.
+
+    Si SQLite devuelve `database is locked` se deshace todo y se vuelve a
+    intentar desde el principio, esperando cada vez el doble (con azar para
+    que los hilos en conflicto no reintenten a la vez).
+
+    Args:
+        operacion (Callable[[], T]): Trabajo a realizar con `db.session`.
+            No debe hacer commit; puede ejecutarse más de una vez.
+
+    Returns:
+        T: Lo que devuelva `operacion`.
+
+    Raises:
+        RuntimeError: Si la sesión tiene cambios sin confirmar.
+        OperationalError: Si la base de datos sigue bloqueada tras
+            `MAX_REINTENTOS` intentos.
+
+    Example:
+        >>> ejecutar_escritura(lambda: db.session.add(Recargar(id_cartera=1, cantidad=5)))
+    """
+
+    if _cambios_pendientes():
+        raise RuntimeError("ejecutar_escritura: la sesión tiene cambios sin confirmar")
+    # Sin cambios pendientes, cerrar la transacción de lectura no pierde nada
+    db.session.rollback()
+
+    for intento in range(MAX_REINTENTOS):
+        try:
+            _bloqueo_escritura()
+            resultado = operacion()
+            db.session.commit()
+            return resultado
+        except OperationalError as e:
+            db.session.rollback()
+            if not _base_datos_bloqueada(e) or intento == MAX_REINTENTOS - 1:
+                raise
+            incrementar("app_bd_reintentos_escritura_total")
+            time.sleep(ESPERA_INICIAL * 2**intento * (1 + random.random()))
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+# --- OPERACIONES SOBRE SALDOS --- #
+
+
+def _nueva_version():
+    """Columnas que toda UPDATE de saldo debe tocar para invalidar los ETag."""
+
+    return {
+        "version_base": Cartera.version_base + 1,
+        "modificada_base": datetime.now(),
+    }
+
+
+def abonar(id_cartera, cantidad):
+    """
+    Suma `cantidad` al saldo de una cartera con una única UPDATE.
+
+    El incremento lo hace la base de datos (`cantidad = cantidad + :x`), así
+    que dos abonos simultáneos no se pisan como ocurría con leer, sumar en
+    Python y guardar. Si la cartera tiene fracciones (ver `FraccionSaldo`)
+    el abono va a una de ellas al azar, la fila de CARTERAS no se toca y se
+    encola (si no lo estaba ya) la compactación de la cartera, que se
+    confirma con el abono. No hace commit.
+
+    Raises:
+        TransferenciaRechazada: Si la cartera no existe.
+    """
+
+    resultado = db.session.execute(
+        db.update(Cartera)
+        .where(Cartera.id == id_cartera, Cartera.fracciones == 0)
+        .values(cantidad_base=Cartera.cantidad_base + cantidad, **_nueva_version())
+        .execution_options(synchronize_session=False)
+    )
+    if resultado.rowcount == 1:
+        return
+
+    # La fracción se elige aquí: random() en el WHERE se evaluaría fila a fila
+    fracciones = (
+        select(Cartera.fracciones).where(Cartera.id == id_cartera).scalar_subquery()
+    )
+    resultado = db.session.execute(
+        db.update(FraccionSaldo)
+        .where(
+            FraccionSaldo.id_cartera == id_cartera,
+            FraccionSaldo.fraccion == random.randrange(2**31) % fracciones,
+        )
+        .values(
+            cantidad=FraccionSaldo.cantidad + cantidad,
+            version=FraccionSaldo.version + 1,
+            modificada=datetime.now(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if resultado.rowcount != 1:
+        raise TransferenciaRechazada("La cartera de destino no existe")
+
+    # Importación aquí: la cola depende de este módulo (ejecutar_escritura)
+    from services.cola_service import encolar
+
+    encolar(
+        "compactar_fracciones",
+        {"cartera": id_cartera},
+        retraso=RETRASO_COMPACTACION,
+        unica=True,
+    )
+
+
+def cargar(id_cartera, cantidad):
+    """
+    Resta `cantidad` del saldo de una cartera solo si hay fondos suficientes.
+
+    La comprobación de saldo va en el propio WHERE, de modo que no hay
+    ventana entre leer el saldo y descontarlo. El cargo sale de la fila de
+    CARTERAS y se comprueba solo contra ella; si no alcanza y la cartera
+    está fraccionada, antes se juntan sus fracciones en la fila (en la misma
+    transacción) y se vuelve a intentar, así que la fila nunca queda en
+    negativo. No hace commit.
+
+    Raises:
+        TransferenciaRechazada: Si no hay saldo suficiente o la cartera no existe.
+    """
+
+    def descontar():
+        return db.session.execute(
+            db.update(Cartera)
+            .where(Cartera.id == id_cartera, Cartera.cantidad_base >= cantidad)
+            .values(cantidad_base=Cartera.cantidad_base - cantidad, **_nueva_version())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+    if descontar() == 1:
+        return
+
+    fracciones = db.session.execute(
+        select(Cartera.fracciones).where(Cartera.id == id_cartera)
+    ).scalar()
+    if fracciones is None:
+        raise TransferenciaRechazada("La cartera de origen no existe")
+    if fracciones:
+        # Importación aquí: fraccion_service depende de este módulo
+        from services.fraccion_service import _compactar
+
+        _compactar(id_cartera)
+        if descontar() == 1:
+            return
+    raise TransferenciaRechazada("Saldo insuficiente")
+
+
+# --- TRANSFERENCIAS --- #
+
+
+def _validar_cantidad(cantidad):
+    cantidad = Decimal(str(cantidad))
+    if cantidad.is_finite():
+        # Se guarda en céntimos: se redondea ya para validar lo que se va a mover
+        cantidad = a_euros(a_centimos(cantidad))
+    if not cantidad.is_finite() or cantidad <= 0:
+        raise TransferenciaRechazada("La cantidad debe ser mayor a 0")
+    return cantidad
+
+
+def _movimiento_transferencia(id_origen, id_destino, cantidad):
+    """Cargo, abono, registro y resumen diario de una transferencia, sin commit."""
+
+    if id_origen == id_destino:
+        raise TransferenciaRechazada("No puedes transferirte dinero a ti mismo")
+
+    cargar(id_origen, cantidad)
+    abonar(id_destino, cantidad)
+
+    # Fecha local explícita, la misma para la fila y los resúmenes (el
+    # server_default sería UTC y sin microsegundos)
+    fecha = datetime.now()
+    transaccion = Transaccion(
+        cantidad=cantidad,
+        fecha=fecha,
+        id_cartera_enviado=id_origen,
+        id_cartera_recibido=id_destino,
+    )
+    db.session.add(transaccion)
+    registrar_movimiento(id_origen, salida=cantidad, fecha=fecha)
+    registrar_movimiento(id_destino, entrada=cantidad, fecha=fecha)
+    return transaccion
+
+
+def transferir(id_cartera_origen, id_cartera_destino, cantidad):
+    """
+    Mueve dinero entre dos carteras de forma atómica.
+
+    El cargo (condicionado a que haya saldo), el abono, la fila de
+    TRANSACCIONES y el resumen diario se confirman juntos o no se confirma
+    nada. Es seguro con muchas peticiones simultáneas sobre las mismas
+    carteras.
+
+    Args:
+        id_cartera_origen (int): Cartera que envía el dinero.
+        id_cartera_destino (int): Cartera que lo recibe.
+        cantidad (Decimal | float | str): Importe a transferir (mayor que 0).
+
+    Returns:
+        int: Id de la transacción creada.
+
+    Raises:
+        TransferenciaRechazada: Cantidad no válida, saldo insuficiente,
+            cartera inexistente o transferencia a la misma cartera.
+
+    Example:
+        >>> try:
+        ...     transferir(1, 2, Decimal("25.00"))
+        ... except TransferenciaRechazada as e:
+        ...     print(e)
+        Saldo insuficiente
+    """
+
+    def operacion():
+        transaccion = _movimiento_transferencia(
+            id_cartera_origen, id_cartera_destino, cantidad
+        )
+        db.session.flush()
+        return transaccion.id
+
+    resultado = "error"
+    try:
+        cantidad = _validar_cantidad(cantidad)
+        id_transaccion = ejecutar_escritura(operacion)
+        resultado = "confirmada"
+        return id_transaccion
+    except TransferenciaRechazada:
+        resultado = "rechazada"
+        raise
+    finally:
+        incrementar("app_transferencias_total", tipo="individual", resultado=resultado)
+
+
+# --- TRANSFERENCIAS POR LOTES --- #
+
+
+def leer_lote_csv(texto):
+    """
+    Convierte un CSV `destinatario,cantidad` en la lista de líneas del lote.
+
+    Se ignoran las líneas vacías y una cabecera opcional
+    (`destinatario,cantidad`).
+
+    Args:
+        texto (str): Contenido del fichero CSV.
+
+    Returns:
+        list[tuple[str, str]]: Parejas (destinatario, cantidad) sin validar.
+
+    Example:
+        >>> leer_lote_csv("destinatario,cantidad\nmaria_l,25\n")
+        [('maria_l', '25')]
+    """
+
+    lineas = []
+    for fila in csv.reader(io.StringIO(texto)):
+        if not fila or not any(campo.strip() for campo in fila):
+            continue
+        destinatario = fila[0].strip()
+        cantidad = fila[1].strip() if len(fila) > 1 else ""
+        if not lineas and destinatario.lower() == "destinatario":
+            continue
+        lineas.append((destinatario, cantidad))
+    return lineas
+
+
+def _abonar_agrupado(abonos):
+    """
+    Suma a cada cartera su importe con UPDATEs de conjunto (CASE por id).
+
+    Las carteras con fracciones no pasan por el CASE: su abono va a una
+    fracción al azar con `abonar`, como cualquier otro abono.
+    """
+
+    ids = list(abonos)
+    for inicio in range(0, len(ids), CARTERAS_POR_UPDATE):
+        bloque = ids[inicio : inicio + CARTERAS_POR_UPDATE]
+        fraccionadas = set(
+            db.session.scalars(
+                select(Cartera.id).where(Cartera.id.in_(bloque), Cartera.fracciones > 0)
+            )
+        )
+        for id_cartera in fraccionadas:
+            abonar(id_cartera, abonos[id_cartera])
+        bloque = [i for i in bloque if i not in fraccionadas]
+        if not bloque:
+            continue
+        # Los literales del CASE van en céntimos, como la columna
+        importe = case({i: a_centimos(abonos[i]) for i in bloque}, value=Cartera.id)
+        db.session.execute(
+            db.update(Cartera)
+            .where(Cartera.id.in_(bloque), Cartera.fracciones == 0)
+            .values(
+                cantidad_base=centimos(Cartera.cantidad_base) + importe,
+                **_nueva_version(),
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+
+def transferir_lote(id_cartera_origen, lineas):
+    """
+    Reparte dinero desde una cartera a muchos destinatarios en una transacción.
+
+    Pensado para nóminas y pagos masivos: los destinatarios se resuelven con
+    una sola consulta, el saldo se comprueba una vez contra el total, las
+    filas de TRANSACCIONES se insertan de golpe y los abonos se agrupan por
+    cartera en UPDATEs de conjunto. Las líneas con errores (destinatario
+    inexistente, cantidad no válida...) se descartan y se informan; el resto
+    se aplica junto. Si el total no cubre el saldo no se aplica ninguna.
+
+    Args:
+        id_cartera_origen (int): Cartera que paga.
+        lineas (list[tuple[str, object]]): Parejas (usuario o gmail, cantidad).
+
+    Returns:
+        list[dict]: Una entrada por línea, en el mismo orden, con `linea`,
+            `destinatario`, `cantidad` (tal como llegó), `estado` ('ok' o
+            'error') y `mensaje`. Las líneas 'ok' llevan además `importe`, lo
+            que se ha movido de verdad (redondeado a céntimos).
+
+    Raises:
+        TransferenciaRechazada: Si el lote supera `MAX_LINEAS_LOTE` líneas.
+
+    Example:
+        >>> transferir_lote(1, [("maria_l", "25"), ("nadie", "5")])[1]
+        {'linea': 2, 'destinatario': 'nadie', 'cantidad': '5', 'estado': 'error', 'mensaje': 'El destinatario no existe'}
+    """
+
+    if len(lineas) > MAX_LINEAS_LOTE:
+        raise TransferenciaRechazada(
+            f"El lote no puede tener más de {MAX_LINEAS_LOTE} líneas"
+        )
+
+    informe = []
+    for n, (destinatario, cantidad) in enumerate(lineas, start=1):
+        informe.append(
+            {
+                "linea": n,
+                "destinatario": str(destinatario or "").strip(),
+                "cantidad": str(cantidad),
+                "estado": "error",
+                "mensaje": "",
+            }
+        )
+
+    # Resolución de todos los destinatarios en una sola consulta
+    carteras = obtener_ids_cartera_por_destinatario(
+        fila["destinatario"] for fila in informe if fila["destinatario"]
+    )
+
+    validas = []
+    for fila in informe:
+        try:
+            importe = _validar_cantidad(fila["cantidad"])
+        except (TransferenciaRechazada, InvalidOperation):
+            fila["mensaje"] = "Cantidad inválida"
+            continue
+        id_destino = carteras.get(fila["destinatario"])
+        if id_destino is None:
+            fila["mensaje"] = "El destinatario no existe"
+        elif id_destino == id_cartera_origen:
+            fila["mensaje"] = "No puedes transferirte dinero a ti mismo"
+        else:
+            validas.append((fila, id_destino, importe))
+
+    if not validas:
+        _contar_lote(informe)
+        return informe
+
+    total = sum(importe for _, _, importe in validas)
+    abonos = {}
+    for _, id_destino, importe in validas:
+        abonos[id_destino] = abonos.get(id_destino, 0) + importe
+
+    def operacion():
+        fecha = datetime.now()
+        cargar(id_cartera_origen, total)
+        _abonar_agrupado(abonos)
+        db.session.execute(
+            insert(Transaccion),
+            [
+                {
+                    "cantidad": importe,
+                    "fecha": fecha,
+                    "id_cartera_enviado": id_cartera_origen,
+                    "id_cartera_recibido": id_destino,
+                }
+                for _, id_destino, importe in validas
+            ],
+        )
+        movimientos = {id_destino: (importe, 0) for id_destino, importe in abonos.items()}
+        movimientos[id_cartera_origen] = (0, total)
+        registrar_movimientos(movimientos, fecha)
+
+    try:
+        ejecutar_escritura(operacion)
+    except TransferenciaRechazada as e:
+        mensaje = f"{e} para el lote ({total:.2f} €)"
+        for fila, _, _ in validas:
+            fila["mensaje"] = mensaje
+        _contar_lote(informe)
+        return informe
+
+    for fila, _, importe in validas:
+        fila["estado"] = "ok"
+        fila["importe"] = f"{importe:.2f}"
+    _contar_lote(informe)
+    return informe
+
+
+def _contar_lote(informe):
+    confirmadas = sum(fila["estado"] == "ok" for fila in informe)
+    if confirmadas:
+        incrementar("app_transferencias_total", confirmadas, tipo="lote", resultado="confirmada")
+    if len(informe) > confirmadas:
+        incrementar(
+            "app_transferencias_total", len(informe) - confirmadas, tipo="lote", resultado="rechazada"
+        )
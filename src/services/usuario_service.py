@@ -3,10 +3,15 @@ from models import Usuario, Cartera
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy import func
 
-from flask import session
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import g, session
+from sqlalchemy.orm import joinedload
 from database import db
 from services.auth_service import hash_password
+from services.contrasena_service import verificar_hash
+
+
+# Relaciones que casi todas las páginas usan: se cargan en la misma consulta que el usuario
+OPCIONES_PERFIL = (joinedload(Usuario.cartera), joinedload(Usuario.tarjetas))
 
 
 # --- REGISTRO DE USUARIO --- #
@@ -32,9 +37,7 @@ def crear_usuario(datos):
 
     try:
         # 1. Hashear la contraseña
-        password_hashed = generate_password_hash(
-            datos["contrasena"], method="pbkdf2:sha256"
-        )
+        password_hashed = hash_password(datos["contrasena"])
 
         # 2. Crear instancia de Usuario
         nuevo_usuario = Usuario(
@@ -79,7 +82,7 @@ def actualizar_contrasena(usuario_id, password_antiguo, nuevo_password):
     """
 
     usuario = Usuario.query.get(usuario_id)
-    if usuario and check_password_hash(usuario.contrasena, password_antiguo):
+    if usuario and verificar_hash(usuario.contrasena, password_antiguo):
         usuario.contrasena = hash_password(nuevo_password)
         db.session.commit()
         return True
@@ -91,6 +94,9 @@ def obtener_perfil_completo(usuario_id):
     """
     Recupera la entidad Usuario incluyendo sus relaciones cargadas.
 
+    La cartera y las tarjetas llegan en la misma consulta (JOIN), de modo que
+    acceder a `.cartera` o `.tarjetas` no lanza consultas adicionales.
+
     Args:
         usuario_id (int): Identificador del usuario a consultar.
 
@@ -103,13 +109,17 @@ def obtener_perfil_completo(usuario_id):
         >>> print(user.cartera.cantidad)
     """
 
-    return Usuario.query.get(usuario_id)
+    return db.session.get(Usuario, usuario_id, options=OPCIONES_PERFIL)
 
 
 def obtener_usuario_actual():
     """
     Obtiene el objeto Usuario del usuario que tiene la sesión iniciada.
 
+    Se resuelve una única vez por petición y se guarda en `flask.g`: el
+    context processor `inject_user` y las rutas comparten el mismo objeto,
+    con la cartera y las tarjetas ya cargadas.
+
     Returns:
         Usuario | None: La instancia del usuario logueado extraída de la BD
             según el ID de la sesión de Flask.
@@ -120,7 +130,7 @@ def obtener_usuario_actual():
         ...     print(f"Hola de nuevo, {actual.nombre}")
     """
 
-    usuario_id = session.get("usuario_id")
-    if usuario_id:
-        return Usuario.query.get(usuario_id)
-    return None
\ No newline at end of file
+    if "usuario_actual" not in g:
+        usuario_id = session.get("usuario_id")
+        g.usuario_actual = obtener_perfil_completo(usuario_id) if usuario_id else None
+    return g.usuario_actual
\ No newline at end of file
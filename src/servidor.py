@@ -0,0 +1,174 @@
+"""Servidor de producción: gunicorn con varios procesos pre-bifurcados y hilos.
+
+Uso (desde src/):
+    python servidor.py
+
+Variables de entorno: `WEB_BIND` (0.0.0.0:8000), `WEB_PROCESOS` (núcleos de
+la máquina), `WEB_HILOS` (4), `WEB_TIMEOUT` (60), `WEB_APAGADO` (30 s para
+terminar las peticiones en curso al apagar) y `WEB_MAX_PETICIONES` (0 = sin
+reciclar procesos). La aplicación se carga una vez en el proceso maestro y
+los procesos hijos la heredan al bifurcarse.
+
+Cada proceso tiene sus propias métricas: para que `/metrics` devuelva la
+suma de todos, los procesos las vuelcan en `METRICAS_DIRECTORIO` (por
+defecto un directorio temporal nuevo en cada arranque).
+"""
+
+import os
+import tempfile
+
+# ---------------------------- SERVIDOR WSGI ------------------------------ #
+
+
+def _entero(entorno, nombre, defecto, minimo):
+    valor = entorno.get(nombre)
+    if valor in (None, ""):
+        return defecto
+    try:
+        valor = int(valor)
+    except ValueError:
+        raise ValueError(f"{nombre} debe ser un número entero") from None
+    if valor < minimo:
+        raise ValueError(f"{nombre} debe ser al menos {minimo}")
+    return valor
+
+
+def opciones_servidor(entorno=None):
+    """
+    Opciones de gunicorn a partir de las variables de entorno.
+
+    Args:
+        entorno (Mapping[str, str] | None): Variables a leer (por defecto `os.environ`).
+
+    Returns:
+        dict: Opciones con los nombres de la configuración de gunicorn.
+
+    Raises:
+        ValueError: Si alguna variable no es un entero válido.
+
+    Example:
+        >>> opciones_servidor({"WEB_PROCESOS": "4"})["workers"]
+        4
+    """
+
+    entorno = os.environ if entorno is None else entorno
+    hilos = _entero(entorno, "WEB_HILOS", 4, 1)
+    max_peticiones = _entero(entorno, "WEB_MAX_PETICIONES", 0, 0)
+    return {
+        "bind": entorno.get("WEB_BIND") or "0.0.0.0:8000",
+        "workers": _entero(entorno, "WEB_PROCESOS", os.cpu_count() or 1, 1),
+        "threads": hilos,
+        # Con un hilo, el worker síncrono; con más, el de hilos (gthread)
+        "worker_class": "gthread" if hilos > 1 else "sync",
+        # La aplicación se crea en el maestro antes de bifurcar: arranque una
+        # sola vez y memoria compartida (copy-on-write) entre los procesos
+        "preload_app": True,
+        "timeout": _entero(entorno, "WEB_TIMEOUT", 60, 1),
+        "graceful_timeout": _entero(entorno, "WEB_APAGADO", 30, 0),
+        "keepalive": 5,
+        "max_requests": max_peticiones,
+        "max_requests_jitter": max_peticiones // 10,
+    }
+
+
+def al_bifurcar(app, procesos=1):
+    """
+    Prepara un proceso hijo recién bifurcado del maestro.
+
+    Las conexiones del pool de SQLAlchemy heredadas del maestro son los
+    mismos sockets/ficheros que las del padre: usarlas desde dos procesos
+    corrompe el estado de SQLite. Se descartan sin cerrarlas (`close=False`,
+    cerrarlas afectaría al padre) y cada hijo abre las suyas. Si no se ha
+    fijado `PASSWORD_HASH_WORKERS`, los núcleos se reparten entre los
+    procesos para que N procesos no lancen N pools de hashing del tamaño
+    de toda la máquina.
+
+    Args:
+        app (Flask): Aplicación heredada del maestro.
+        procesos (int): Número de procesos del servidor.
+
+    Returns:
+        None
+    """
+
+    from database import db
+
+    with app.app_context():
+        for motor in db.engines.values():
+            motor.dispose(close=False)
+    if not app.config.get("PASSWORD_HASH_WORKERS"):
+        app.config["PASSWORD_HASH_WORKERS"] = max(1, (os.cpu_count() or 1) // procesos)
+
+
+def al_terminar(app):
+    """
+    Apaga ordenadamente un proceso: cola de tareas, pool de hashing, métricas y conexiones.
+
+    Gunicorn la llama cuando el proceso ya ha dejado de aceptar peticiones y
+    ha terminado las que tenía en curso (o ha vencido `graceful_timeout`).
+    Sus métricas pasan a las de los procesos terminados, de modo que los
+    contadores de `/metrics` no bajan cuando gunicorn recicla un proceso.
+
+    Args:
+        app (Flask): La aplicación del proceso.
+
+    Returns:
+        None
+    """
+
+    from database import db
+    from metricas import retirar_proceso
+    from services import cerrar_pool, detener_trabajadores
+
+    detener_trabajadores()
+    cerrar_pool()
+    if app.config.get("METRICAS_DIRECTORIO"):
+        retirar_proceso(app.config["METRICAS_DIRECTORIO"])
+    with app.app_context():
+        for motor in db.engines.values():
+            motor.dispose()
+
+
+def servir(opciones=None):
+    """
+    Sirve la aplicación con gunicorn (bloquea hasta que se apaga el servidor).
+
+    Args:
+        opciones (dict | None): Opciones de gunicorn; por defecto `opciones_servidor()`.
+
+    Returns:
+        None
+    """
+
+    from gunicorn.app.base import BaseApplication
+
+    from app import create_app
+    from metricas import limpiar_directorio
+
+    opciones = opciones or opciones_servidor()
+
+    # Métricas de todos los procesos; las de un arranque anterior no cuentan
+    directorio = os.environ.get("METRICAS_DIRECTORIO") or tempfile.mkdtemp(prefix="metricas-")
+    os.environ["METRICAS_DIRECTORIO"] = directorio
+    limpiar_directorio(directorio)
+
+    # Ganchos de gunicorn; `proceso.app.wsgi()` es la aplicación precargada en el maestro
+    def post_fork(servidor, proceso):
+        al_bifurcar(proceso.app.wsgi(), servidor.num_workers)
+
+    def worker_exit(servidor, proceso):
+        al_terminar(proceso.app.wsgi())
+
+    class AplicacionGunicorn(BaseApplication):
+        def load_config(self):
+            for clave, valor in {**opciones, "post_fork": post_fork, "worker_exit": worker_exit}.items():
+                self.cfg.set(clave, valor)
+
+        def load(self):
+            return create_app()
+
+    AplicacionGunicorn().run()
+
+
+if __name__ == "__main__":
+    servir()
@@ -1,5 +1,20 @@
-from .data_utils import (
-    obtener_datos_grafico_saldo_evolutivo,
-    validar_datos_tarjeta_form,
+from .data_utils import validar_datos_tarjeta_form
+from .translate_utils import traducir_mes, traducir_dia_semana, MESES, DIAS_SEMANA
+from .http_utils import (
+    etag_cartera,
+    respuesta_no_modificada,
+    con_validadores,
+    comprimir_gzip,
+)
+from .grafico_utils import (
+    METRICAS_GRAFICO,
+    RANGOS_GRAFICO,
+    obtener_datos_graficos,
+    obtener_datos_graficos_cacheado,
+)
+from .serie_utils import (
+    GRANULARIDADES,
+    calendario_serie,
+    obtener_serie_grafico,
+    obtener_serie_grafico_cacheado,
 )
-from .translate_utils import traducir_mes, traducir_dia_semana
@@ -0,0 +1,321 @@
+import calendar
+from collections import defaultdict
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from sqlalchemy import Date, bindparam, func, literal, select, union_all
+
+from models import Cartera, Recargar, SaldoDiario, Transaccion
+
+from cache import cache_graficos
+from database import centimos, db
+from services import resumen_completo_desde
+from .translate_utils import DIAS_SEMANA, MESES
+
+METRICAS_GRAFICO = ("saldo", "ingresos", "gastos")
+RANGOS_GRAFICO = ("semanal", "mensual", "anual")
+
+
+def obtener_datos_graficos(
+    cartera_id, metricas=METRICAS_GRAFICO, rangos=RANGOS_GRAFICO
+):
+    """
+    Calcula varias series (métricas × rangos) con una sola lectura de movimientos.
+
+    Se leen una vez los movimientos diarios de la cartera desde el inicio del
+    rango más largo pedido (el lunes de esta semana puede caer en el año
+    anterior) y de ahí salen todas las series: las entradas y salidas se
+    suman por periodo y el saldo de cada periodo es el cierre de su último
+    día con movimientos, que llega ya calculado en la misma lectura.
+
+    Args:
+        cartera_id (int): Identificador de la cartera.
+        metricas (Iterable[str]): Subconjunto de 'saldo', 'ingresos' y 'gastos'.
+        rangos (Iterable[str]): Subconjunto de 'semanal', 'mensual' y 'anual'.
+
+    Returns:
+        dict: Por cada rango, un diccionario con 'labels' y una lista de valores
+            por métrica (None en los periodos futuros).
+
+    Example:
+        >>> obtener_datos_graficos(1, ["saldo", "gastos"], ["semanal"])
+        {'semanal': {'labels': ['Lunes', ...], 'saldo': [150.5, ...], 'gastos': [0.0, ...]}}
+    """
+
+    hoy = datetime.now()
+    calendarios = {rango: puntos_tiempo_grafico(rango, hoy) for rango in rangos}
+    if not calendarios:
+        return {}
+    desde = min(inicio for inicio, _ in calendarios.values()).date()
+
+    apertura, dias = _movimientos_diarios(cartera_id, desde)
+
+    return {
+        rango: _serie(rango, metricas, calendarios[rango], apertura, dias, hoy)
+        for rango in rangos
+    }
+
+
+def obtener_datos_graficos_cacheado(cartera, metricas, rangos):
+    """
+    Igual que `obtener_datos_graficos`, pero pasando por la caché de gráficos.
+
+    La clave es (cartera, versión de la cartera, métricas, rangos, día
+    actual): un movimiento confirmado en la cartera cambia su versión y las
+    series se recalculan en la siguiente petición; el cambio de día también.
+
+    Args:
+        cartera (Cartera): Cartera ya cargada (p. ej. la del usuario actual).
+        metricas (list[str]): Métricas pedidas, ya validadas.
+        rangos (list[str]): Rangos pedidos, ya validados.
+
+    Returns:
+        dict: Las series por rango, como `obtener_datos_graficos`.
+    """
+
+    periodo = datetime.now().date().isoformat()
+    return cache_graficos.obtener_o_calcular(
+        cartera,
+        ("panel", ",".join(metricas), ",".join(rangos), periodo),
+        lambda: obtener_datos_graficos(cartera.id, metricas, rangos),
+    )
+
+
+def puntos_tiempo_grafico(rango, hoy):
+    """
+    Calendario del eje X de un gráfico: inicio del periodo y sus puntos.
+
+    Args:
+        rango (str): 'semanal' (lunes a domingo de esta semana), 'anual'
+            (meses del año actual) o 'mensual' (días del mes actual, por defecto).
+        hoy (datetime): Momento actual.
+
+    Returns:
+        tuple[datetime, list[tuple[str, str]]]: Inicio del periodo y la lista de
+            (clave de periodo ISO, etiqueta en español).
+
+    Example:
+        >>> puntos_tiempo_grafico("anual", datetime(2026, 5, 3))[1][0]
+        ('2026-01', 'Enero')
+    """
+
+    puntos_tiempo = []
+
+    if rango == "semanal":
+        # Lunes de la semana actual a las 00:00
+        inicio = (hoy - timedelta(days=hoy.weekday())).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        for i in range(7):
+            f = (inicio + timedelta(days=i)).date()
+            puntos_tiempo.append((_clave_periodo(f, rango), DIAS_SEMANA[f.weekday()]))
+
+    elif rango == "anual":
+        # Los 12 meses del año actual
+        inicio = datetime(hoy.year, 1, 1)
+        for m in range(1, 13):
+            f = datetime(hoy.year, m, 1).date()
+            puntos_tiempo.append((_clave_periodo(f, rango), MESES[m - 1]))
+
+    else:  # mensual (por defecto)
+        # Todos los días del mes actual (maneja bisiestos automáticamente)
+        inicio = datetime(hoy.year, hoy.month, 1)
+        _, ultimo_dia = calendar.monthrange(hoy.year, hoy.month)
+        for d in range(1, ultimo_dia + 1):
+            f = datetime(hoy.year, hoy.month, d).date()
+            puntos_tiempo.append((_clave_periodo(f, rango), f"{d} {MESES[hoy.month - 1]}"))
+
+    return inicio, puntos_tiempo
+
+
+def _clave_periodo(fecha, rango):
+    """Convierte una fecha en la clave de periodo ('YYYY-MM' o 'YYYY-MM-DD')."""
+
+    return fecha.strftime("%Y-%m" if rango == "anual" else "%Y-%m-%d")
+
+
+def _serie(rango, metricas, calendario, apertura, dias, hoy):
+    """
+    Agrupa los días leídos en los periodos de un rango y rellena su calendario.
+
+    Los cierres llegan ya calculados por día: aquí solo se toma el último de
+    cada periodo y los periodos sin movimientos repiten el saldo anterior.
+    """
+
+    inicio, puntos_tiempo = calendario
+    ingresos = defaultdict(int)
+    gastos = defaultdict(int)
+    cierre_periodo = {}
+    saldo_acumulado = apertura
+
+    for fecha, entradas, salidas, cierre in dias:
+        if fecha < inicio.date():
+            saldo_acumulado = cierre  # Apertura de este rango
+            continue
+        clave = _clave_periodo(fecha, rango)
+        ingresos[clave] += entradas
+        gastos[clave] += salidas
+        cierre_periodo[clave] = cierre  # Los días van en orden: queda el último
+
+    clave_hoy = _clave_periodo(hoy.date(), rango)
+    datos = {"labels": [etiqueta for _, etiqueta in puntos_tiempo]}
+    datos.update({metrica: [] for metrica in metricas})
+
+    for clave, _ in puntos_tiempo:
+        futuro = clave > clave_hoy
+        if not futuro:
+            saldo_acumulado = cierre_periodo.get(clave, saldo_acumulado)
+        valores = {
+            "saldo": saldo_acumulado,
+            "ingresos": ingresos[clave],
+            "gastos": gastos[clave],
+        }
+        for metrica in metricas:
+            # Céntimos a euros: la única conversión de toda la serie
+            datos[metrica].append(None if futuro else valores[metrica] / 100)
+
+    return datos
+
+
+def _movimientos_diarios(cartera_id, desde):
+    """
+    Saldo de apertura y (día, entradas, salidas, cierre) de la cartera desde `desde`.
+
+    Si el resumen diario cubre todo el periodo (ver `resumen_completo_desde`)
+    se leen los cierres guardados en SALDOS_DIARIOS: la última fila anterior
+    a `desde`, que da la apertura, y las del periodo. Si no, por ejemplo con
+    historial anterior a los resúmenes aún sin reconstruir, se calculan
+    desde TRANSACCIONES y RECARGAS con una sola sentencia que suma por día y
+    obtiene los cierres con `SUM() OVER (ORDER BY dia)`.
+
+    Args:
+        cartera_id (int): Identificador de la cartera.
+        desde (date): Primer día a leer.
+
+    Returns:
+        tuple[int, list[tuple[date, int, int, int]]]: Saldo antes del primer
+            día devuelto y días con movimientos en orden (importes en céntimos).
+    """
+
+    if resumen_completo_desde(cartera_id, desde):
+        return _ejecutar_movimientos("resumen", cartera_id, desde)
+    return _ejecutar_movimientos(
+        "transacciones", cartera_id, datetime.combine(desde, datetime.min.time())
+    )
+
+
+def _ejecutar_movimientos(origen, cartera_id, desde):
+    apertura = 0
+    dias = []
+    for dia, entradas, salidas, cierre in db.session.execute(
+        _consulta_movimientos_diarios(origen), {"cartera_id": cartera_id, "desde": desde}
+    ):
+        if dia is None:
+            apertura = cierre  # Fila ancla
+        else:
+            dias.append((dia, entradas, salidas, cierre))
+
+    if origen == "resumen" and dias:
+        # Saldo antes del primer día guardado (el anterior a `desde` si existe)
+        _, entradas, salidas, cierre = dias[0]
+        apertura = cierre - entradas + salidas
+    return apertura, dias
+
+
+def _sumas_por_dia(fecha, entradas, salidas, *condiciones):
+    """Rama de movimientos ya sumada por día, con columnas (dia, entradas, salidas, saldo)."""
+
+    dia = func.date(fecha, type_=Date)
+    return (
+        select(
+            dia.label("dia"),
+            entradas.label("entradas"),
+            salidas.label("salidas"),
+            literal(None).label("saldo"),
+        )
+        .where(*condiciones)
+        .group_by(dia)
+    )
+
+
+@lru_cache(maxsize=None)
+def _consulta_movimientos_diarios(origen):
+    """
+    Sentencia de `_movimientos_diarios` para un origen, construida una vez.
+
+    Cartera y fecha de inicio van como parámetros (`cartera_id`, `desde`).
+    El saldo actual entra como una fila ancla sin día, que va al final para
+    que los tipos de las columnas sean los de las filas de datos y que al
+    ordenar por día queda la primera.
+    """
+
+    cartera_id = bindparam("cartera_id")
+    ancla = select(
+        literal(None), literal(0), literal(0), centimos(Cartera.cantidad)
+    ).where(Cartera.id == cartera_id)
+
+    if origen == "resumen":
+        desde = bindparam("desde", type_=SaldoDiario.fecha.type)
+        # Último día guardado antes del periodo: su cierre es la apertura
+        anterior = (
+            select(func.max(SaldoDiario.fecha))
+            .where(SaldoDiario.id_cartera == cartera_id, SaldoDiario.fecha < desde)
+            .scalar_subquery()
+        )
+        cierres = union_all(
+            select(
+                SaldoDiario.fecha.label("dia"),
+                centimos(SaldoDiario.entradas).label("entradas"),
+                centimos(SaldoDiario.salidas).label("salidas"),
+                centimos(SaldoDiario.saldo_cierre).label("saldo"),
+            ).where(
+                SaldoDiario.id_cartera == cartera_id,
+                SaldoDiario.fecha >= func.coalesce(anterior, desde),
+            ),
+            ancla,
+        )
+        return cierres.order_by(cierres.selected_columns.dia)
+
+    desde = bindparam("desde", type_=Transaccion.fecha.type)
+    # Una rama por índice (cartera, fecha, cantidad): cada suma se lee solo del índice
+    movimientos = union_all(
+        _sumas_por_dia(
+            Transaccion.fecha,
+            func.sum(centimos(Transaccion.cantidad)),
+            literal(0),
+            Transaccion.id_cartera_recibido == cartera_id,
+            Transaccion.fecha >= desde,
+        ),
+        _sumas_por_dia(
+            Transaccion.fecha,
+            literal(0),
+            func.sum(centimos(Transaccion.cantidad)),
+            Transaccion.id_cartera_enviado == cartera_id,
+            Transaccion.fecha >= desde,
+        ),
+        _sumas_por_dia(
+            Recargar.fecha,
+            func.sum(centimos(Recargar.cantidad)),
+            literal(0),
+            Recargar.id_cartera == cartera_id,
+            Recargar.fecha >= desde,
+        ),
+        ancla,
+    ).subquery("movimientos")
+
+    # Cierre = saldo actual - neto de todo el periodo + neto acumulado hasta el día.
+    # La fila ancla (día NULL) va la primera: su cierre es el saldo de apertura.
+    entradas = func.sum(movimientos.c.entradas)
+    salidas = func.sum(movimientos.c.salidas)
+    neto = entradas - salidas
+    saldo_actual = func.max(func.max(movimientos.c.saldo)).over()
+    cierre = (
+        saldo_actual
+        - func.sum(neto).over()
+        + func.sum(neto).over(order_by=movimientos.c.dia)
+    )
+    return (
+        select(movimientos.c.dia, entradas, salidas, cierre)
+        .group_by(movimientos.c.dia)
+        .order_by(movimientos.c.dia)
+    )
@@ -0,0 +1,116 @@
+import zlib
+from datetime import timezone
+
+from flask import Response, request
+
+
+def _en_utc(modificada):
+    """
+    Fecha de modificación con zona horaria UTC.
+
+    Las fechas se guardan en hora local sin zona; Werkzeug interpreta una
+    fecha sin zona como UTC al escribir `Last-Modified`, así que se
+    convierten antes de compararlas o enviarlas.
+    """
+
+    if modificada is None or modificada.tzinfo is not None:
+        return modificada
+    return modificada.astimezone(timezone.utc)
+
+
+def etag_cartera(cartera, *partes):
+    """
+    Construye el ETag de una respuesta que depende del saldo de una cartera.
+
+    La versión de la cartera cambia con cada movimiento, así que el ETag
+    solo cambia cuando cambian los datos.
+
+    Args:
+        cartera (Cartera): Cartera cuyos datos se sirven (ya cargada).
+        *partes: Cualquier otro dato del que dependa la respuesta (rango, fecha...).
+
+    Returns:
+        str: Valor del ETag (sin comillas).
+
+    Example:
+        >>> etag_cartera(cartera, "semanal", date(2026, 1, 5))
+        '3-17-semanal-2026-01-05'
+    """
+
+    return "-".join(str(p) for p in (cartera.id, cartera.version or 0, *partes))
+
+
+def respuesta_no_modificada(etag, modificada=None):
+    """
+    Devuelve un 304 si el cliente ya tiene la versión actual, o None si no.
+
+    Se llama antes de calcular la respuesta, de modo que un 304 no ejecuta
+    ninguna consulta de agregación. `If-None-Match` tiene prioridad sobre
+    `If-Modified-Since`, como indica el RFC 9110.
+
+    Args:
+        etag (str): ETag actual de la respuesta.
+        modificada (datetime | None): Fecha de la última modificación (hora
+            local si no tiene zona).
+
+    Returns:
+        Response | None: Respuesta 304 con los validadores, o None.
+    """
+
+    if request.if_none_match:
+        vigente = request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since and modificada:
+        vigente = _en_utc(modificada).replace(microsecond=0) <= request.if_modified_since
+    else:
+        vigente = False
+
+    if not vigente:
+        return None
+    return con_validadores(Response(status=304), etag, modificada)
+
+
+def con_validadores(respuesta, etag, modificada=None):
+    """
+    Añade ETag, Last-Modified y Cache-Control a una respuesta.
+
+    `no-cache` obliga al navegador a revalidar (petición condicional) en
+    lugar de reutilizar la respuesta sin preguntar.
+
+    Args:
+        respuesta (Response): Respuesta a completar.
+        etag (str): ETag actual.
+        modificada (datetime | None): Fecha de la última modificación.
+
+    Returns:
+        Response: La misma respuesta.
+    """
+
+    respuesta.set_etag(etag, weak=True)
+    if modificada:
+        respuesta.last_modified = _en_utc(modificada)
+    respuesta.headers["Cache-Control"] = "private, no-cache"
+    return respuesta
+
+
+def comprimir_gzip(trozos, codificacion="utf-8"):
+    """
+    Comprime al vuelo una secuencia de trozos de texto en formato gzip.
+
+    Cada trozo se comprime según llega, así que sirve para respuestas en
+    streaming sin tener el cuerpo entero en memoria.
+
+    Args:
+        trozos (Iterable[str]): Trozos del cuerpo, en orden.
+        codificacion (str): Codificación del texto.
+
+    Yields:
+        bytes: Trozos del fichero gzip (vacíos no se entregan).
+    """
+
+    compresor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)  # Cabecera gzip
+    for trozo in trozos:
+        datos = compresor.compress(trozo.encode(codificacion))
+        if datos:
+            yield datos
+    yield compresor.flush()
+
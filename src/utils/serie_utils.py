@@ -0,0 +1,308 @@
+from datetime import datetime, timedelta
+from functools import lru_cache
+from itertools import accumulate
+
+from sqlalchemy import Integer, bindparam, cast, func, literal, select, union_all
+
+from models import Recargar, SaldoDiario, Transaccion
+
+from cache import cache_graficos
+from database import a_centimos, centimos, db
+from services import obtener_saldo_en, resumen_completo_desde
+from .grafico_utils import METRICAS_GRAFICO
+from .translate_utils import MESES
+
+GRANULARIDADES = ("hora", "dia", "semana", "mes")
+MAX_PUNTOS_SERIE = 400
+
+# Duración fija de cada cubeta, en segundos (los meses se cuentan aparte)
+_PASOS = {"hora": 3600, "dia": 86400, "semana": 7 * 86400}
+_EPOCA = datetime(1970, 1, 1)
+
+# Tablas de etiquetas: se montan una vez y cada etiqueta es una búsqueda
+_MESES_CORTOS = tuple(mes[:3].lower() for mes in MESES)
+_HORAS = tuple(f"{h:02d}:00" for h in range(24))
+
+
+def calendario_serie(desde, hasta, granularidad, max_puntos=MAX_PUNTOS_SERIE):
+    """
+    Cubetas del eje X para la ventana [desde, hasta) con una granularidad dada.
+
+    La ventana se ajusta a los límites de las cubetas (hora en punto, 00:00,
+    lunes o día 1). Si salen más de `max_puntos` cubetas se pasa a la
+    granularidad siguiente (hora → día → semana → mes).
+
+    Args:
+        desde (datetime): Inicio de la ventana.
+        hasta (datetime): Fin de la ventana (excluido).
+        granularidad (str): 'hora', 'dia', 'semana' o 'mes'.
+        max_puntos (int): Número máximo de cubetas.
+
+    Returns:
+        tuple[str, list[datetime], list[str]]: Granularidad usada, inicio de
+            cada cubeta (más el fin de la última) y etiquetas en español.
+
+    Raises:
+        ValueError: Si la granularidad no existe, la ventana está vacía o ni
+            siquiera por meses cabe en `max_puntos`.
+
+    Example:
+        >>> calendario_serie(datetime(2026, 3, 30), datetime(2026, 4, 2), "dia")
+        ('dia', [datetime(2026, 3, 30, 0, 0), ..., datetime(2026, 4, 2, 0, 0)], ['30 mar', '31 mar', '1 abr'])
+    """
+
+    if granularidad not in GRANULARIDADES:
+        raise ValueError(f"Granularidad no válida: {granularidad}")
+    if desde >= hasta:
+        raise ValueError("La fecha de inicio debe ser anterior a la de fin")
+
+    for granularidad in GRANULARIDADES[GRANULARIDADES.index(granularidad):]:
+        inicio = _inicio_cubeta(desde, granularidad)
+        if granularidad == "mes":
+            total = (hasta.year - inicio.year) * 12 + hasta.month - inicio.month
+            total += hasta > _sumar_meses(inicio, total)
+            if total <= max_puntos:
+                limites = [_sumar_meses(inicio, i) for i in range(total + 1)]
+                break
+        else:
+            paso = timedelta(seconds=_PASOS[granularidad])
+            total = -(-(hasta - inicio) // paso)  # División hacia arriba
+            if total <= max_puntos:
+                limites = [inicio + paso * i for i in range(total + 1)]
+                break
+    else:
+        raise ValueError(f"La ventana tiene más de {max_puntos} meses")
+
+    return granularidad, limites, _etiquetas(limites[:-1], granularidad)
+
+
+def obtener_serie_grafico(
+    cartera_id,
+    desde,
+    hasta,
+    granularidad="dia",
+    metricas=METRICAS_GRAFICO,
+    max_puntos=MAX_PUNTOS_SERIE,
+):
+    """
+    Series de una cartera para una ventana y granularidad cualesquiera.
+
+    Los movimientos se agregan en SQL directamente por número de cubeta (de
+    SALDOS_DIARIOS si la granularidad es de un día o más y hay resumen; si
+    no, de TRANSACCIONES y RECARGAS) y se colocan en las listas por índice
+    en una sola pasada. El saldo parte de `obtener_saldo_en` al inicio de la
+    ventana, que usa los puntos de control, y se acumula cubeta a cubeta.
+
+    Args:
+        cartera_id (int): Identificador de la cartera.
+        desde (datetime): Inicio de la ventana.
+        hasta (datetime): Fin de la ventana (excluido).
+        granularidad (str): 'hora', 'dia', 'semana' o 'mes'.
+        metricas (Iterable[str]): Subconjunto de 'saldo', 'ingresos' y 'gastos'.
+        max_puntos (int): Número máximo de puntos por serie.
+
+    Returns:
+        dict: 'granularidad' (la usada), 'desde' y 'hasta' (ajustados, ISO),
+            'labels' y una lista de valores por métrica (None en el futuro).
+
+    Raises:
+        ValueError: Si los parámetros no son válidos (ver `calendario_serie`).
+
+    Example:
+        >>> obtener_serie_grafico(1, datetime(2026, 1, 1), datetime(2026, 4, 1), "mes", ["gastos"])
+        {'granularidad': 'mes', 'desde': '2026-01-01T00:00:00', ..., 'gastos': [120.0, 80.5, 0.0]}
+    """
+
+    granularidad, limites, etiquetas = calendario_serie(desde, hasta, granularidad, max_puntos)
+    inicio, fin = limites[0], limites[-1]
+    n = len(etiquetas)
+
+    entradas = [0] * n
+    salidas = [0] * n
+    for cubeta, entrada, salida in _movimientos_por_cubeta(cartera_id, granularidad, inicio, fin):
+        entradas[cubeta] = entrada
+        salidas[cubeta] = salida
+
+    ahora = datetime.now()
+    futuras = sum(1 for limite in limites[:-1] if limite > ahora)
+    valores = {"ingresos": entradas, "gastos": salidas}
+    if "saldo" in metricas:
+        apertura = a_centimos(obtener_saldo_en(cartera_id, inicio))
+        valores["saldo"] = list(
+            accumulate((e - s for e, s in zip(entradas, salidas)), initial=apertura)
+        )[1:]
+
+    datos = {
+        "granularidad": granularidad,
+        "desde": inicio.isoformat(),
+        "hasta": fin.isoformat(),
+        "labels": etiquetas,
+    }
+    for metrica in metricas:
+        # Céntimos a euros al final, y nada en las cubetas que aún no han empezado
+        datos[metrica] = [v / 100 for v in valores[metrica][: n - futuras]] + [None] * futuras
+    return datos
+
+
+def obtener_serie_grafico_cacheado(cartera, desde, hasta, granularidad, metricas):
+    """
+    Igual que `obtener_serie_grafico`, pero pasando por la caché de gráficos.
+
+    Una ventana ya cerrada solo depende de la versión de la cartera; si
+    llega hasta el presente la clave incluye además la hora actual, porque
+    las cubetas pasan de futuras a pasadas.
+
+    Args:
+        cartera (Cartera): Cartera ya cargada (p. ej. la del usuario actual).
+        desde (datetime): Inicio de la ventana.
+        hasta (datetime): Fin de la ventana (excluido).
+        granularidad (str): Granularidad pedida, ya validada.
+        metricas (list[str]): Métricas pedidas, ya validadas.
+
+    Returns:
+        dict: La serie, como `obtener_serie_grafico`.
+    """
+
+    ahora = datetime.now()
+    periodo = ahora.strftime("%Y-%m-%dT%H") if hasta > ahora else ""
+    return cache_graficos.obtener_o_calcular(
+        cartera,
+        ("serie", desde.isoformat(), hasta.isoformat(), granularidad, ",".join(metricas), periodo),
+        lambda: obtener_serie_grafico(cartera.id, desde, hasta, granularidad, metricas),
+    )
+
+
+def _inicio_cubeta(momento, granularidad):
+    """Inicio de la cubeta que contiene `momento`."""
+
+    if granularidad == "hora":
+        return momento.replace(minute=0, second=0, microsecond=0)
+    dia = momento.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularidad == "semana":
+        return dia - timedelta(days=dia.weekday())
+    if granularidad == "mes":
+        return dia.replace(day=1)
+    return dia
+
+
+def _sumar_meses(fecha, meses):
+    indice = fecha.year * 12 + fecha.month - 1 + meses
+    return fecha.replace(year=indice // 12, month=indice % 12 + 1)
+
+
+def _etiquetas(inicios, granularidad):
+    """Etiquetas en español de las cubetas, a partir de las tablas precalculadas."""
+
+    if granularidad == "mes":
+        return [f"{MESES[f.month - 1]} {f.year}" for f in inicios]
+
+    # El año solo aparece si la ventana cruza de un año a otro
+    con_ano = bool(inicios) and inicios[0].year != inicios[-1].year
+    dias = [
+        f"{f.day} {_MESES_CORTOS[f.month - 1]}" + (f" {f.year}" if con_ano else "")
+        for f in inicios
+    ]
+    if granularidad == "hora":
+        return [f"{dia} {_HORAS[f.hour]}" for dia, f in zip(dias, inicios)]
+    if granularidad == "semana":
+        return [f"Sem. {dia}" for dia in dias]
+    return dias
+
+
+def _movimientos_por_cubeta(cartera_id, granularidad, inicio, fin):
+    """
+    (cubeta, entradas, salidas) en céntimos de la cartera en [inicio, fin).
+
+    Las cubetas de un día o más salen del resumen diario si cubre la ventana
+    (ver `resumen_completo_desde`); si no, o si se piden horas, de los
+    movimientos.
+    """
+
+    if granularidad == "mes":
+        base = inicio.year * 12 + inicio.month
+    else:
+        base = int((inicio - _EPOCA).total_seconds())
+    parametros = {"cartera_id": cartera_id, "base": base}
+
+    if granularidad != "hora" and resumen_completo_desde(cartera_id, inicio.date()):
+        return db.session.execute(
+            _consulta_cubetas("resumen", granularidad),
+            {**parametros, "desde": inicio.date(), "hasta": fin.date()},
+        ).all()
+    return db.session.execute(
+        _consulta_cubetas("transacciones", granularidad),
+        {**parametros, "desde": inicio, "hasta": fin},
+    ).all()
+
+
+def _numero_cubeta(columna, granularidad, base):
+    """Expresión SQL con el índice de la cubeta (0, 1, ...) de cada fecha."""
+
+    if granularidad == "mes":
+        return (
+            cast(func.strftime("%Y", columna), Integer) * 12
+            + cast(func.strftime("%m", columna), Integer)
+            - base
+        )
+    # Segundos desde la época, enteros: la división entera da la cubeta
+    return (cast(func.strftime("%s", columna), Integer) - base) // _PASOS[granularidad]
+
+
+@lru_cache(maxsize=None)
+def _consulta_cubetas(origen, granularidad):
+    """
+    Sentencia de `_movimientos_por_cubeta` para un origen y granularidad, construida una vez.
+
+    Cartera, ventana y base de la numeración van como parámetros
+    (`cartera_id`, `desde`, `hasta`, `base`).
+    """
+
+    cartera_id = bindparam("cartera_id")
+    base = bindparam("base", type_=Integer)
+
+    if origen == "resumen":
+        desde = bindparam("desde", type_=SaldoDiario.fecha.type)
+        hasta = bindparam("hasta", type_=SaldoDiario.fecha.type)
+        cubeta = _numero_cubeta(SaldoDiario.fecha, granularidad, base)
+        return (
+            select(
+                cubeta,
+                func.sum(centimos(SaldoDiario.entradas)),
+                func.sum(centimos(SaldoDiario.salidas)),
+            )
+            .where(
+                SaldoDiario.id_cartera == cartera_id,
+                SaldoDiario.fecha >= desde,
+                SaldoDiario.fecha < hasta,
+            )
+            .group_by(cubeta)
+        )
+
+    desde = bindparam("desde", type_=Transaccion.fecha.type)
+    hasta = bindparam("hasta", type_=Transaccion.fecha.type)
+
+    def rama(columna_cartera, fecha, importe, entrada):
+        # Una rama por índice (cartera, fecha, cantidad), sumada ya por cubeta
+        cubeta = _numero_cubeta(fecha, granularidad, base)
+        suma = func.sum(centimos(importe))
+        return (
+            select(
+                cubeta.label("cubeta"),
+                (suma if entrada else literal(0)).label("entradas"),
+                (literal(0) if entrada else suma).label("salidas"),
+            )
+            .where(columna_cartera == cartera_id, fecha >= desde, fecha < hasta)
+            .group_by(cubeta)
+        )
+
+    movimientos = union_all(
+        rama(Transaccion.id_cartera_recibido, Transaccion.fecha, Transaccion.cantidad, True),
+        rama(Transaccion.id_cartera_enviado, Transaccion.fecha, Transaccion.cantidad, False),
+        rama(Recargar.id_cartera, Recargar.fecha, Recargar.cantidad, True),
+    ).subquery("movimientos")
+
+    return select(
+        movimientos.c.cubeta,
+        func.sum(movimientos.c.entradas),
+        func.sum(movimientos.c.salidas),
+    ).group_by(movimientos.c.cubeta)
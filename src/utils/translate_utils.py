@@ -1,3 +1,22 @@
+# Tablas de nombres en castellano, indexadas por `date.month - 1` y `date.weekday()`.
+# Los gráficos las usan directamente: no dependen del locale de strftime.
+MESES = (
+    "Enero",
+    "Febrero",
+    "Marzo",
+    "Abril",
+    "Mayo",
+    "Junio",
+    "Julio",
+    "Agosto",
+    "Septiembre",
+    "Octubre",
+    "Noviembre",
+    "Diciembre",
+)
+DIAS_SEMANA = ("Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo")
+
+
 def traducir_mes(mes_ingles):
     """
     Traduce el nombre de un mes de inglés a castellano.
@@ -0,0 +1,75 @@
+import os
+import sys
+import tempfile
+
+# El código de la aplicación vive en src/ y se importa como módulos de primer nivel
+RAIZ_SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.insert(0, RAIZ_SRC)
+
+# Base de datos temporal: hay que fijarla antes de importar app.py
+DIR_TEMPORAL = tempfile.mkdtemp(prefix="proyecto-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(DIR_TEMPORAL, 'tests.db')}"
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app import create_app
+from cache import configurar_cache
+from database import db
+from models import Cartera, Usuario
+
+flask_app = create_app()
+
+CLAVE_PRUEBA = "clave123"
+METODO_HASH_PRUEBA = "pbkdf2:sha256:1000"
+
+
+@pytest.fixture
+def app():
+    """Aplicación con el esquema recién creado para cada test."""
+
+    # Modo estricto: cualquier carga perezosa de una relación lanza una excepción.
+    # El hash de contraseñas usa el mismo coste barato que crear_usuario_prueba.
+    flask_app.config.update(
+        TESTING=True,
+        SQLALCHEMY_RAISELOAD=True,
+        PASSWORD_HASH_METHOD=METODO_HASH_PRUEBA,
+        PASSWORD_HASH_WORKERS=2,
+        COLA_TRABAJADORES=0,  # Cada test procesa la cola cuando le conviene
+    )
+    with flask_app.app_context():
+        db.drop_all()
+        db.create_all()
+    # Caché vacía: los ids de cartera se repiten entre tests
+    configurar_cache(flask_app)
+    yield flask_app
+    with flask_app.app_context():
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def crear_usuario_prueba(usuario, saldo=0):
+    """Crea un usuario con su cartera (hash barato para no ralentizar los tests)."""
+
+    nuevo = Usuario(
+        dni=f"{abs(hash(usuario)) % 10**8:08d}X",
+        nombre=usuario.capitalize(),
+        apellidos="Prueba",
+        usuario=usuario,
+        contrasena=generate_password_hash(CLAVE_PRUEBA, method=METODO_HASH_PRUEBA),
+        gmail=f"{usuario}@example.com",
+    )
+    nuevo.cartera = Cartera(cantidad=saldo)
+    db.session.add(nuevo)
+    db.session.commit()
+    return nuevo
+
+
+def iniciar_sesion(client, usuario):
+    return client.post(
+        "/login", data={"nombre_usuario": usuario, "contraseña": CLAVE_PRUEBA}
+    )
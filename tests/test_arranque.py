@@ -0,0 +1,40 @@
+"""Fábrica de la aplicación: crearla no toca la base de datos; el esquema va aparte."""
+
+from sqlalchemy import inspect
+
+from app import create_app
+from database import db
+
+
+def test_create_app_no_abre_la_bd_y_el_esquema_es_un_comando(tmp_path):
+    ruta = tmp_path / "nueva.db"
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{ruta}", "COLA_TRABAJADORES": 0})
+    assert app.config["COLA_TRABAJADORES"] == 0
+    assert not ruta.exists()
+
+    with app.app_context():
+        resultado = app.test_cli_runner().invoke(args=["actualizar-esquema"])
+        assert resultado.exit_code == 0, resultado.output
+        assert {"USUARIOS", "CARTERAS", "TRANSACCIONES"} <= set(inspect(db.engine).get_table_names())
+        db.engine.dispose()
+
+
+def test_actualizar_esquema_solo_elimina_indices_obsoletos(app):
+    with app.app_context():
+        with db.engine.begin() as conexion:
+            conexion.exec_driver_sql(
+                'CREATE INDEX "ix_transacciones_enviado_fecha" '
+                'ON "TRANSACCIONES" (id_cartera_enviado, fecha)'
+            )
+            # Índice del operador, no declarado por los modelos
+            conexion.exec_driver_sql('CREATE INDEX "ix_recargas_manual" ON "RECARGAS" (cantidad)')
+
+        resultado = app.test_cli_runner().invoke(args=["actualizar-esquema"])
+        assert resultado.exit_code == 0, resultado.output
+        assert "Índice obsoleto eliminado: ix_transacciones_enviado_fecha" in resultado.output
+
+        inspector = inspect(db.engine)
+        assert "ix_recargas_manual" in {i["name"] for i in inspector.get_indexes("RECARGAS")}
+        assert "ix_transacciones_enviado_fecha" not in {
+            i["name"] for i in inspector.get_indexes("TRANSACCIONES")
+        }
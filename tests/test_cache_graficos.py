@@ -0,0 +1,102 @@
+"""Caché de gráficos: LRU + TTL en memoria, backend enchufable e invalidación por movimiento."""
+
+import time
+
+import pytest
+
+from cache import (
+    BackendCache,
+    CacheCompartidaLocal,
+    CacheLRU,
+    CacheResultados,
+    cache_graficos,
+    configurar_cache,
+)
+from conftest import crear_usuario_prueba, iniciar_sesion
+from services import recargar_cartera, transferir
+
+
+def test_lru_expulsa_la_menos_usada():
+    cache = CacheLRU(max_entradas=2)
+    cache.guardar("a", 1, ttl=60)
+    cache.guardar("b", 2, ttl=60)
+    cache.obtener("a")
+    cache.guardar("c", 3, ttl=60)
+
+    assert cache.obtener("b") is None
+    assert (cache.obtener("a"), cache.obtener("c")) == (1, 3)
+    assert len(cache) == 2
+
+
+def test_compartida_local_limitada():
+    cache = CacheCompartidaLocal(max_entradas=2)
+    cache.guardar("caducada", 0, ttl=0)
+    cache.guardar("a", 1, ttl=60)
+    cache.guardar("b", 2, ttl=60)
+    # Primero se descartan las caducadas, luego las más antiguas
+    assert len(cache) == 2
+    assert (cache.obtener("a"), cache.obtener("b")) == (1, 2)
+    cache.guardar("c", 3, ttl=60)
+    assert cache.obtener("a") is None
+    assert (cache.obtener("b"), cache.obtener("c")) == (2, 3)
+
+
+def test_backend_debe_implementar_la_interfaz():
+    class SoloLectura(BackendCache):
+        def obtener(self, clave):
+            return None
+
+    with pytest.raises(TypeError):
+        SoloLectura()
+
+
+def test_configurar_admite_ttl_cero_y_backend_vacio():
+    cache = CacheResultados("prueba", ttl=300)
+    backend = CacheCompartidaLocal()
+    cache.configurar(backend, ttl=0)
+    assert cache.backend is backend
+    assert cache.ttl == 0
+    # Sin argumentos se conserva lo configurado
+    cache.configurar()
+    assert (cache.backend, cache.ttl) == (backend, 0)
+
+
+@pytest.mark.parametrize("backend", [CacheLRU(), CacheCompartidaLocal()])
+def test_entradas_caducan(backend):
+    backend.guardar("a", {"labels": ["x"]}, ttl=0.05)
+    assert backend.obtener("a") == {"labels": ["x"]}
+    time.sleep(0.06)
+    assert backend.obtener("a") is None
+
+
+@pytest.mark.parametrize("backend", [None, CacheCompartidaLocal()])
+def test_movimiento_invalida_solo_su_cartera(app, client, backend):
+    app.config["CACHE_GRAFICOS_BACKEND"] = backend
+    configurar_cache(app)
+    try:
+        with app.app_context():
+            ana = crear_usuario_prueba("ana", saldo=10).cartera.id
+            bea = crear_usuario_prueba("bea").cartera.id
+            crear_usuario_prueba("cris")
+        iniciar_sesion(client, "ana")
+
+        primera = client.get("/api/grafico/semanal").get_json()
+        assert client.get("/api/grafico/semanal").get_json() == primera
+        assert cache_graficos.estadisticas()["aciertos"] == 1
+
+        with app.app_context():
+            transferir(ana, bea, "4")
+        assert client.get("/api/grafico/semanal").get_json() != primera
+        assert cache_graficos.estadisticas()["fallos"] == 2
+
+        # Una recarga en otra cartera no invalida la de ana
+        with app.app_context():
+            recargar_cartera(bea, "1")
+        client.get("/api/grafico/semanal")
+        assert cache_graficos.estadisticas() == {
+            "aciertos": 2,
+            "fallos": 2,
+            "ratio_aciertos": 0.5,
+        }
+    finally:
+        app.config.pop("CACHE_GRAFICOS_BACKEND")
@@ -0,0 +1,197 @@
+"""Cola local de tareas: encolado transaccional, lotes, reintentos y trabajadores."""
+
+import threading
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import func
+
+from conftest import crear_usuario_prueba
+from database import db
+from models import Cartera, Tarea
+from services import (
+    detener_trabajadores,
+    encolar,
+    estadisticas_cola,
+    fraccionar_cartera,
+    iniciar_trabajadores,
+    manejador_tarea,
+    procesar_tareas,
+    transferir,
+)
+
+lotes_recibidos = []
+fallos_pendientes = []
+
+
+@manejador_tarea("prueba_anotar")
+def _anotar(lote):
+    lotes_recibidos.append(sorted(datos["n"] for datos in lote))
+
+
+@manejador_tarea("prueba_fallar")
+def _fallar(lote):
+    if fallos_pendientes:
+        fallos_pendientes.pop()
+        raise RuntimeError("servicio caído")
+    lotes_recibidos.append(len(lote))
+
+
+@pytest.fixture(autouse=True)
+def _limpiar():
+    lotes_recibidos.clear()
+    fallos_pendientes.clear()
+
+
+def test_encolar_va_con_la_transaccion_y_se_procesa_por_lotes(app):
+    with app.app_context():
+        encolar("prueba_anotar", {"n": 0})
+        db.session.rollback()  # Deshecha: la tarea no existe
+        assert Tarea.query.count() == 0
+
+        for n in range(5):
+            encolar("prueba_anotar", {"n": n})
+        encolar("prueba_fallar")
+        encolar("prueba_anotar", {"n": 99}, retraso=3600)
+        db.session.commit()
+        assert estadisticas_cola()["pendientes"] == 7
+
+        # Primero el lote del tipo más antiguo, con todas sus tareas disponibles
+        assert procesar_tareas() == 5
+        assert lotes_recibidos == [[0, 1, 2, 3, 4]]
+        assert procesar_tareas() == 1
+        assert procesar_tareas() == 0  # La de dentro de una hora aún no
+        assert lotes_recibidos == [[0, 1, 2, 3, 4], 1]
+
+        estado = estadisticas_cola()
+        assert (estado["pendientes"], estado["en_curso"], estado["fallidas"]) == (1, 0, 0)
+        assert estado["por_tipo"] == {"prueba_anotar": {"pendientes": 1}}
+
+        with pytest.raises(ValueError, match="desconocido"):
+            encolar("no_existe")
+
+
+def test_reintentos_con_espera_creciente_y_fallida_al_final(app):
+    app.config.update(COLA_MAX_INTENTOS=3, COLA_ESPERA_REINTENTO=10)
+    try:
+        with app.app_context():
+            fallos_pendientes.extend([1, 1, 1])
+            encolar("prueba_fallar")
+            db.session.commit()
+
+            esperas = []
+            for intento in range(1, 4):
+                inicio = datetime.now()
+                assert procesar_tareas() == 1
+                tarea = db.session.execute(db.select(Tarea)).scalar_one()
+                assert tarea.intentos == intento
+                assert "servicio caído" in tarea.error
+                if intento < 3:
+                    assert tarea.estado == "pendiente"
+                    esperas.append((tarea.disponible_en - inicio).total_seconds())
+                    # Sin esperar de verdad: la adelantamos
+                    tarea.disponible_en = datetime.now()
+                    db.session.commit()
+            assert 10 <= esperas[0] <= 21 and 20 <= esperas[1] <= 41
+            assert tarea.estado == "fallida"
+            assert procesar_tareas() == 0
+            assert estadisticas_cola()["fallidas"] == 1
+    finally:
+        app.config.pop("COLA_MAX_INTENTOS")
+        app.config.pop("COLA_ESPERA_REINTENTO")
+
+
+def test_reserva_vencida_se_vuelve_a_entregar(app):
+    with app.app_context():
+        encolar("prueba_anotar", {"n": 1})
+        db.session.commit()
+        # Un trabajador la reserva y muere antes de terminar
+        db.session.execute(
+            db.update(Tarea).values(
+                estado="en_curso", intentos=1, disponible_en=datetime.now() - timedelta(seconds=1)
+            )
+        )
+        db.session.commit()
+
+        assert procesar_tareas() == 1
+        assert lotes_recibidos == [[1]]
+        assert Tarea.query.count() == 0
+
+
+def test_reserva_vencida_sin_intentos_queda_fallida(app):
+    app.config.update(COLA_MAX_INTENTOS=2)
+    try:
+        with app.app_context():
+            encolar("prueba_anotar", {"n": 1})
+            encolar("prueba_anotar", {"n": 2})
+            db.session.commit()
+            # El trabajador muere con la primera en su último intento
+            db.session.execute(
+                db.update(Tarea)
+                .where(Tarea.id == db.select(func.min(Tarea.id)).scalar_subquery())
+                .values(
+                    estado="en_curso",
+                    intentos=2,
+                    disponible_en=datetime.now() - timedelta(seconds=1),
+                )
+            )
+            db.session.commit()
+
+            assert procesar_tareas() == 1
+            assert lotes_recibidos == [[2]]
+            tarea = db.session.execute(db.select(Tarea)).scalar_one()
+            assert (tarea.estado, tarea.intentos) == ("fallida", 2)
+            assert "vencida" in tarea.error
+            assert estadisticas_cola()["fallidas"] == 1
+            assert procesar_tareas() == 0
+    finally:
+        app.config.pop("COLA_MAX_INTENTOS")
+
+
+def test_trabajadores_en_hilos_procesan_al_confirmar(app):
+    with app.app_context():
+        comercio = crear_usuario_prueba("comercio").cartera.id
+        cliente = crear_usuario_prueba("cliente", saldo=10).cartera.id
+        fraccionar_cartera(comercio, 4)
+        transferir(cliente, comercio, "7.50")
+        transferir(cliente, comercio, "1")
+        # El abono a una fracción encola su compactación, una sola por cartera
+        tarea = db.session.execute(db.select(Tarea)).scalar_one()
+        assert (tarea.tipo, tarea.datos) == ("compactar_fracciones", f'{{"cartera": {comercio}}}')
+        assert tarea.disponible_en > datetime.now()
+
+    iniciar_trabajadores(app, 2)
+    try:
+        with app.app_context():
+            # Sin esperar el retraso de verdad: la adelantamos
+            db.session.execute(db.update(Tarea).values(disponible_en=datetime.now()))
+            for n in range(20):
+                encolar("prueba_anotar", {"n": n})
+            db.session.commit()
+
+        limite = time.monotonic() + 10
+        with app.app_context():
+            while Tarea.query.count() and time.monotonic() < limite:
+                time.sleep(0.05)
+            assert Tarea.query.count() == 0
+            db.session.expire_all()
+            cartera = db.session.get(Cartera, comercio)
+            assert cartera.cantidad_base == Decimal("8.50")  # Compactada por la cola
+    finally:
+        detener_trabajadores()
+    assert sorted(n for lote in lotes_recibidos for n in lote) == list(range(20))
+    assert not any(h.name.startswith("cola-") for h in threading.enumerate())
+
+
+def test_comando_trabajador_una_vez(app):
+    with app.app_context():
+        for n in range(3):
+            encolar("prueba_anotar", {"n": n})
+        db.session.commit()
+        resultado = app.test_cli_runner().invoke(args=["trabajador-cola", "--una-vez"])
+        assert resultado.exit_code == 0, resultado.output
+        assert "Tareas procesadas: 3" in resultado.output
+        resultado = app.test_cli_runner().invoke(args=["estado-cola"])
+        assert "pendientes: 0" in resultado.output
@@ -0,0 +1,103 @@
+"""Hash de contraseñas en un pool de procesos, con cola limitada y rehash al iniciar sesión."""
+
+import pytest
+from werkzeug.security import check_password_hash, generate_password_hash
+
+import services.auth_service as auth_service
+import services.contrasena_service as contrasena_service
+from conftest import CLAVE_PRUEBA, crear_usuario_prueba, iniciar_sesion
+from models import Usuario
+from services import (
+    HashingSaturado,
+    calcular_hash,
+    cerrar_pool,
+    necesita_rehash,
+    verificar_hash,
+)
+
+
+def test_hash_en_pool_con_metodo_configurado(app):
+    with app.app_context():
+        hash_nuevo = calcular_hash("secreta")
+
+        assert hash_nuevo.startswith("pbkdf2:sha256:1000$")
+        assert verificar_hash(hash_nuevo, "secreta")
+        assert not verificar_hash(hash_nuevo, "otra")
+        assert not necesita_rehash(hash_nuevo)
+        assert necesita_rehash(generate_password_hash("x", method="pbkdf2:sha256:2000"))
+
+
+def test_login_actualiza_hash_con_parametros_antiguos(app, client):
+    with app.app_context():
+        crear_usuario_prueba("ana")
+    app.config["PASSWORD_HASH_METHOD"] = "pbkdf2:sha256:1500"
+
+    assert iniciar_sesion(client, "ana").status_code == 302
+
+    with app.app_context():
+        guardado = Usuario.query.filter_by(usuario="ana").one().contrasena
+        assert guardado.startswith("pbkdf2:sha256:1500$")
+        assert verificar_hash(guardado, CLAVE_PRUEBA)
+
+
+def test_login_sin_rehash_con_cola_llena(app, client, monkeypatch):
+    with app.app_context():
+        crear_usuario_prueba("ana")
+        anterior = Usuario.query.filter_by(usuario="ana").one().contrasena
+    app.config["PASSWORD_HASH_METHOD"] = "pbkdf2:sha256:1500"
+
+    def saturado(password_plano):
+        raise HashingSaturado("cola llena")
+
+    monkeypatch.setattr(auth_service, "calcular_hash", saturado)
+
+    # La verificación pasa; el rehash se salta y queda para otro login
+    assert iniciar_sesion(client, "ana").status_code == 302
+    with app.app_context():
+        assert Usuario.query.filter_by(usuario="ana").one().contrasena == anterior
+
+
+def test_login_rechazado_con_cola_llena(app, client):
+    with app.app_context():
+        crear_usuario_prueba("ana")
+        cerrar_pool()
+        app.config.update(PASSWORD_HASH_MAX_COLA=1, PASSWORD_HASH_ESPERA=0)
+        _, cola = contrasena_service._obtener_pool()
+    cola.acquire()
+    try:
+        assert iniciar_sesion(client, "ana").status_code == 503
+        with app.app_context(), pytest.raises(HashingSaturado):
+            calcular_hash("x")
+    finally:
+        cola.release()
+        with app.app_context():
+            cerrar_pool()
+        app.config.pop("PASSWORD_HASH_MAX_COLA")
+        app.config.pop("PASSWORD_HASH_ESPERA")
+
+
+def test_cambio_de_contrasena_rechazado_con_cola_llena(app, client):
+    with app.app_context():
+        crear_usuario_prueba("ana")
+    iniciar_sesion(client, "ana")
+    with app.app_context():
+        cerrar_pool()
+        app.config.update(PASSWORD_HASH_MAX_COLA=1, PASSWORD_HASH_ESPERA=0)
+        _, cola = contrasena_service._obtener_pool()
+    cola.acquire()
+    try:
+        respuesta = client.post(
+            "/configuracion/cuenta/actualizar_contrasena",
+            data={"pass_actual": CLAVE_PRUEBA, "pass_nuevo": "otra", "pass_confirmar": "otra"},
+        )
+        assert respuesta.status_code == 503
+        with app.app_context():
+            guardado = Usuario.query.filter_by(usuario="ana").one().contrasena
+            # Sin pasar por el pool, que sigue saturado
+            assert check_password_hash(guardado, CLAVE_PRUEBA)
+    finally:
+        cola.release()
+        with app.app_context():
+            cerrar_pool()
+        app.config.pop("PASSWORD_HASH_MAX_COLA")
+        app.config.pop("PASSWORD_HASH_ESPERA")
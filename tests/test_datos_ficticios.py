@@ -0,0 +1,67 @@
+"""Generador de datos ficticios (`flask seed`): coherencia, reparto y reproducibilidad."""
+
+from collections import Counter
+
+from sqlalchemy import func, select
+
+from conftest import iniciar_sesion
+from database import centimos, db
+from models import Cartera, Recargar, SaldoDiario, Transaccion
+from services import generar_datos_ficticios
+
+
+def _huella():
+    return db.session.execute(
+        select(
+            func.count(),
+            func.sum(centimos(Transaccion.cantidad) * Transaccion.id_cartera_recibido),
+            func.max(Transaccion.fecha),
+        )
+    ).one()
+
+
+def test_saldos_coinciden_con_el_historial_y_nunca_son_negativos(app):
+    with app.app_context():
+        filas = generar_datos_ficticios(usuarios=40, transacciones=3000, anios=2)
+        assert filas["transacciones"] == 3000 and filas["tarjetas"] == 40
+
+        saldos = {c.id: c.cantidad for c in db.session.execute(select(Cartera)).scalars()}
+        movimientos = Counter()
+        for t in db.session.execute(select(Transaccion)).scalars():
+            movimientos[t.id_cartera_recibido] += t.cantidad
+            movimientos[t.id_cartera_enviado] -= t.cantidad
+        for r in db.session.execute(select(Recargar)).scalars():
+            movimientos[r.id_cartera] += r.cantidad
+        assert saldos == dict(movimientos)
+
+        # El resumen diario, reconstruido hacia atrás, no baja de cero
+        minimo = db.session.execute(select(func.min(centimos(SaldoDiario.saldo_cierre)))).scalar()
+        assert minimo >= 0
+
+        # Comercios: unos pocos reciben gran parte de los pagos
+        por_destino = Counter(
+            db.session.execute(select(Transaccion.id_cartera_recibido)).scalars()
+        )
+        assert por_destino.most_common(1)[0][1] > 3000 * 0.25
+
+
+def test_misma_semilla_mismos_datos_y_comando(app, client):
+    with app.app_context():
+        generar_datos_ficticios(usuarios=20, transacciones=500, semilla=7)
+        primera = _huella()
+
+        runner = app.test_cli_runner()
+        resultado = runner.invoke(args=["seed", "--usuarios", "20", "--transacciones", "500"])
+        assert resultado.exit_code != 0
+        assert "ya tiene usuarios" in resultado.output
+
+        resultado = runner.invoke(
+            args=["seed", "--usuarios", "20", "--transacciones", "500", "--semilla", "7", "--vaciar"]
+        )
+        assert resultado.exit_code == 0, resultado.output
+        assert "500 transacciones" in resultado.output
+        assert _huella()[:2] == primera[:2]
+
+    # Los usuarios generados pueden entrar con la contraseña indicada
+    iniciar_sesion(client, "usuario3")
+    assert client.get("/configuracion/mis-tarjetas").status_code == 200
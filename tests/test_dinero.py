@@ -0,0 +1,94 @@
+"""Importes guardados como céntimos enteros y migración de bases de datos antiguas."""
+
+from decimal import Decimal
+
+from conftest import crear_usuario_prueba
+from database import a_centimos, a_euros, db
+from models import Cartera, Transaccion
+from services import transferir
+
+
+def test_conversion_euros_centimos():
+    assert a_centimos("30.505") == 3051
+    assert a_centimos(0.1) == 10
+    assert a_centimos(Decimal("-2.5")) == -250
+    assert a_euros(3050) == Decimal("30.50")
+    assert a_euros(3050.0) == Decimal("30.50")
+
+
+def test_importes_se_guardan_como_enteros(app):
+    with app.app_context():
+        ana = crear_usuario_prueba("ana", saldo="100.10").cartera.id
+        bea = crear_usuario_prueba("bea").cartera.id
+
+        transferir(ana, bea, "30.05")
+
+        fila = db.session.execute(
+            db.text('SELECT cantidad, typeof(cantidad) FROM "TRANSACCIONES"')
+        ).one()
+        assert tuple(fila) == (3005, "integer")
+        db.session.expire_all()
+        assert db.session.get(Cartera, ana).cantidad == Decimal("70.05")
+
+
+def test_actualizar_esquema_migra_importes_decimales(app):
+    with app.app_context():
+        crear_usuario_prueba("ana")
+        crear_usuario_prueba("bea")
+        db.session.execute(db.text('DELETE FROM "CARTERAS"'))
+        for tabla in ("TRANSACCIONES", "CARTERAS"):
+            db.session.execute(db.text(f'DROP TABLE "{tabla}"'))
+        # Esquema anterior: NUMERIC en CARTERAS, FLOAT en TRANSACCIONES, sin versión
+        db.session.execute(
+            db.text(
+                'CREATE TABLE "CARTERAS" (id INTEGER PRIMARY KEY, cantidad NUMERIC(10, 2), '
+                'id_usuario INTEGER REFERENCES "USUARIOS"(id) ON DELETE CASCADE)'
+            )
+        )
+        db.session.execute(
+            db.text(
+                'CREATE TABLE "TRANSACCIONES" (id INTEGER PRIMARY KEY, cantidad FLOAT NOT NULL, '
+                "fecha DATETIME, "
+                'id_cartera_enviado INTEGER REFERENCES "CARTERAS"(id), '
+                'id_cartera_recibido INTEGER REFERENCES "CARTERAS"(id))'
+            )
+        )
+        db.session.execute(
+            db.text(
+                'INSERT INTO "CARTERAS" (id, cantidad, id_usuario) '
+                "VALUES (1, 69.9, 1), (2, 30.1, 2)"
+            )
+        )
+        db.session.execute(
+            db.text(
+                'INSERT INTO "TRANSACCIONES" (cantidad, fecha, id_cartera_enviado, '
+                "id_cartera_recibido) VALUES (30.1, '2026-01-05 10:00:00', 1, 2)"
+            )
+        )
+        db.session.commit()
+        db.session.remove()
+
+    with app.app_context():
+        resultado = app.test_cli_runner().invoke(args=["actualizar-esquema"])
+    assert resultado.exit_code == 0, resultado.output
+    assert "Importes en céntimos: CARTERAS" in resultado.output
+    assert "Importes en céntimos: TRANSACCIONES" in resultado.output
+
+    with app.app_context():
+        crudas = db.session.execute(
+            db.text('SELECT cantidad, typeof(cantidad) FROM "CARTERAS" ORDER BY id')
+        ).all()
+        assert [tuple(f) for f in crudas] == [(6990, "integer"), (3010, "integer")]
+        assert db.session.get(Cartera, 1).version == 0
+        assert db.session.get(Transaccion, 1).cantidad == Decimal("30.10")
+        # La base de datos sigue funcionando con el esquema nuevo
+        transferir(1, 2, "0.90")
+        db.session.expire_all()
+        assert db.session.get(Cartera, 2).cantidad == Decimal("31.00")
+
+    # Ya migrada: una segunda ejecución no vuelve a multiplicar
+    with app.app_context():
+        resultado = app.test_cli_runner().invoke(args=["actualizar-esquema"])
+    assert "Importes en céntimos" not in resultado.output
+    with app.app_context():
+        assert db.session.get(Cartera, 1).cantidad == Decimal("69.00")
@@ -0,0 +1,85 @@
+"""Exportación del historial completo en streaming (CSV y JSON lines)."""
+
+import csv
+import gzip
+import io
+import json
+from datetime import datetime, timedelta
+
+from conftest import crear_usuario_prueba, iniciar_sesion
+from database import db
+from models import Recargar, Transaccion
+from services import exportar_historial, historial_service
+
+
+def _poblar(ana, bea, num=30):
+    inicio = datetime(2026, 1, 1, 9, 0)
+    movimientos = []
+    for i in range(num):
+        origen, destino = (ana, bea) if i % 3 else (bea, ana)
+        movimientos.append(
+            Transaccion(
+                cantidad=i + 1,
+                fecha=inicio + timedelta(hours=i),
+                id_cartera_enviado=origen,
+                id_cartera_recibido=destino,
+            )
+        )
+    movimientos.append(
+        Recargar(id_cartera=ana, cantidad="12.5", fecha=inicio + timedelta(minutes=30))
+    )
+    db.session.add_all(movimientos)
+    db.session.commit()
+
+
+def test_csv_en_orden_cronologico_y_por_trozos(app, monkeypatch):
+    monkeypatch.setattr(historial_service, "LOTE_EXPORTACION", 7)
+    with app.app_context():
+        ana = crear_usuario_prueba("ana").cartera.id
+        bea = crear_usuario_prueba("bea").cartera.id
+        _poblar(ana, bea)
+
+        trozos = list(exportar_historial(ana))
+
+    assert len(trozos) == 5  # 31 filas en lotes de 7
+    filas = list(csv.DictReader(io.StringIO("".join(trozos))))
+    assert len(filas) == 31
+    assert [f["fecha"] for f in filas] == sorted(f["fecha"] for f in filas)
+    assert filas[0] == {
+        "id": "1",
+        "fecha": "2026-01-01T09:00:00",
+        "tipo": "Recibido",
+        "contraparte": "Bea",
+        "cantidad": "1.00",
+    }
+    assert (filas[1]["tipo"], filas[1]["cantidad"]) == ("Recarga", "12.50")
+    assert filas[2]["tipo"] == "Enviado"
+
+
+def test_ruta_exportar_jsonl_con_gzip(app, client):
+    with app.app_context():
+        ana = crear_usuario_prueba("ana").cartera.id
+        bea = crear_usuario_prueba("bea").cartera.id
+        _poblar(ana, bea, num=4)
+    iniciar_sesion(client, "ana")
+
+    respuesta = client.get(
+        "/historial/exportar?formato=jsonl", headers={"Accept-Encoding": "gzip"}
+    )
+
+    assert respuesta.is_streamed
+    assert respuesta.headers["Content-Encoding"] == "gzip"
+    assert "attachment" in respuesta.headers["Content-Disposition"]
+    lineas = gzip.decompress(respuesta.data).decode().splitlines()
+    assert [json.loads(linea)["tipo"] for linea in lineas] == [
+        "Recibido",
+        "Recarga",
+        "Enviado",
+        "Enviado",
+        "Recibido",
+    ]
+
+    sin_gzip = client.get("/historial/exportar")
+    assert "Content-Encoding" not in sin_gzip.headers
+    assert sin_gzip.get_data(as_text=True).startswith("id,fecha,tipo,contraparte,cantidad")
+    assert client.get("/historial/exportar?formato=xml").status_code == 400
@@ -0,0 +1,145 @@
+"""Carteras fraccionadas: abonos repartidos en varias filas y lectura transparente."""
+
+import threading
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import event
+
+from conftest import crear_usuario_prueba
+from database import db
+from models import Cartera, FraccionSaldo
+from services import (
+    TransferenciaRechazada,
+    compactar_fracciones,
+    fraccionar_cartera,
+    transferir,
+    transferir_lote,
+)
+
+
+def _cartera(id_cartera):
+    db.session.expire_all()
+    return db.session.get(Cartera, id_cartera)
+
+
+def test_abonos_van_a_fracciones_y_el_saldo_se_lee_sumado(app):
+    with app.app_context():
+        comercio = crear_usuario_prueba("comercio", saldo=10).cartera.id
+        clientes = [crear_usuario_prueba(f"c{i}", saldo=100).cartera.id for i in range(5)]
+        fraccionar_cartera(comercio, 4)
+        version_inicial = _cartera(comercio).version
+
+        for cliente in clientes:
+            for _ in range(4):
+                transferir(cliente, comercio, "2.50")
+
+        cartera = _cartera(comercio)
+        assert cartera.cantidad == Decimal("60.00")
+        assert cartera.cantidad_base == Decimal("10.00")  # La fila no se ha tocado
+        assert cartera.version == version_inicial + 20  # Cada abono cambia el ETag
+        fracciones = FraccionSaldo.query.filter_by(id_cartera=comercio).all()
+        assert len(fracciones) == 4
+        assert sum(f.cantidad for f in fracciones) == Decimal("50.00")
+
+        # Un cargo que la fila cubre no toca las fracciones
+        transferir(comercio, clientes[0], "4")
+        cartera = _cartera(comercio)
+        assert (cartera.cantidad, cartera.cantidad_base) == (Decimal("56.00"), Decimal("6.00"))
+
+        # Si la fila no lo cubre, antes se compacta: la fila nunca queda en negativo
+        transferir(comercio, clientes[0], "51")
+        cartera = _cartera(comercio)
+        assert (cartera.cantidad, cartera.cantidad_base) == (Decimal("5.00"), Decimal("5.00"))
+        assert all(f.cantidad == 0 for f in FraccionSaldo.query.all())
+        with pytest.raises(TransferenciaRechazada, match="Saldo insuficiente"):
+            transferir(comercio, clientes[0], "5.01")
+
+        transferir(clientes[1], comercio, "1")
+        version = _cartera(comercio).version
+        assert compactar_fracciones() == 1
+        cartera = _cartera(comercio)
+        assert (cartera.cantidad, cartera.cantidad_base) == (Decimal("6.00"), Decimal("6.00"))
+        assert cartera.version == version
+        assert all(f.cantidad == 0 for f in FraccionSaldo.query.all())
+
+        fraccionar_cartera(comercio, 0)
+        assert FraccionSaldo.query.count() == 0
+        assert _cartera(comercio).cantidad == Decimal("6.00")
+
+
+def test_lote_abona_en_fracciones(app):
+    with app.app_context():
+        pagador = crear_usuario_prueba("pagador", saldo=100).cartera.id
+        comercio = crear_usuario_prueba("comercio", saldo=10).cartera.id
+        bea = crear_usuario_prueba("bea").cartera.id
+        fraccionar_cartera(comercio, 4)
+
+        resultado = transferir_lote(
+            pagador, [("comercio", "7"), ("bea", "3"), ("comercio", "1.50")]
+        )
+        assert all(linea["estado"] == "ok" for linea in resultado)
+
+        cartera = _cartera(comercio)
+        assert cartera.cantidad == Decimal("18.50")
+        assert cartera.cantidad_base == Decimal("10.00")  # Como en `abonar`, la fila no se toca
+        fracciones = FraccionSaldo.query.filter_by(id_cartera=comercio).all()
+        assert sum(f.cantidad for f in fracciones) == Decimal("8.50")
+        assert _cartera(bea).cantidad_base == Decimal("3.00")
+
+
+def test_abonos_concurrentes_a_cartera_fraccionada(app):
+    with app.app_context():
+        comercio = crear_usuario_prueba("comercio").cartera.id
+        clientes = [crear_usuario_prueba(f"c{i}", saldo=50).cartera.id for i in range(8)]
+        fraccionar_cartera(comercio, 8)
+
+    def trabajador(cliente):
+        with app.app_context():
+            for _ in range(25):
+                transferir(cliente, comercio, "2")
+            db.session.remove()
+
+    hilos = [threading.Thread(target=trabajador, args=(c,)) for c in clientes]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    with app.app_context():
+        assert _cartera(comercio).cantidad == Decimal("400.00")
+        assert all(_cartera(c).cantidad == 0 for c in clientes)
+
+
+def test_cartera_sin_fracciones_no_lee_fracciones(app):
+    with app.app_context():
+        ana = crear_usuario_prueba("ana", saldo=10).cartera.id
+        comercio = crear_usuario_prueba("comercio").cartera.id
+        fraccionar_cartera(comercio, 2)
+        db.session.expire_all()
+
+        sentencias = []
+
+        def _antes(conn, cursor, statement, parameters, context, executemany):
+            sentencias.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", _antes)
+        try:
+            cartera = db.session.get(Cartera, ana)
+            assert (cartera.cantidad, cartera.version) == (Decimal("10.00"), 0)
+            transferir(ana, comercio, "3")
+        finally:
+            event.remove(db.engine, "before_cursor_execute", _antes)
+
+        carga, *escrituras = sentencias
+        assert "FRACCIONES_SALDO" not in carga
+        cargo = next(s for s in escrituras if s.startswith('UPDATE "CARTERAS"'))
+        assert "FRACCIONES_SALDO" not in cargo
+
+
+def test_fraccionar_valida_argumentos(app):
+    with app.app_context():
+        with pytest.raises(ValueError, match="no existe"):
+            fraccionar_cartera(9999, 4)
+        with pytest.raises(ValueError, match="entre 0 y"):
+            fraccionar_cartera(crear_usuario_prueba("ana").cartera.id, 1000)
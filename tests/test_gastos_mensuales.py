@@ -0,0 +1,79 @@
+"""Contadores mensuales (RESUMENES_MENSUALES) y el recuadro de gastos de la portada."""
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from conftest import crear_usuario_prueba, iniciar_sesion
+from database import db
+from models import ResumenMensual, Transaccion
+from services import (
+    obtener_gastos_mes,
+    recargar_cartera,
+    reconstruir_saldos_diarios,
+    transferir,
+    transferir_lote,
+)
+
+
+def _contadores():
+    return {
+        (fila.id_cartera, fila.mes): (fila.ingresos, fila.gastos)
+        for fila in ResumenMensual.query.all()
+    }
+
+
+def test_movimientos_actualizan_contadores_y_reconstruccion_coincide(app):
+    with app.app_context():
+        ana = crear_usuario_prueba("ana", saldo=100).cartera.id
+        bea = crear_usuario_prueba("bea").cartera.id
+
+        transferir(ana, bea, "30")
+        transferir_lote(ana, [("bea", "5.25"), ("bea", "4.75")])
+        recargar_cartera(bea, "12")
+
+        mes = datetime.now().date().replace(day=1)
+        contadores = _contadores()
+        assert contadores[(ana, mes)] == (Decimal("0"), Decimal("40"))
+        assert contadores[(bea, mes)] == (Decimal("52"), Decimal("0"))
+        assert obtener_gastos_mes(ana) == Decimal("40.00")
+
+        reconstruir_saldos_diarios()
+        assert _contadores() == contadores
+
+
+def test_sin_contador_suma_solo_el_mes_pedido(app):
+    with app.app_context():
+        ana = crear_usuario_prueba("ana").cartera.id
+        bea = crear_usuario_prueba("bea").cartera.id
+        inicio_mes = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        db.session.add_all(
+            [
+                Transaccion(
+                    cantidad=cantidad,
+                    fecha=fecha,
+                    id_cartera_enviado=ana,
+                    id_cartera_recibido=bea,
+                )
+                for cantidad, fecha in [
+                    (7, inicio_mes),  # Límite inferior incluido
+                    (3, inicio_mes + timedelta(hours=1)),
+                    (100, inicio_mes - timedelta(microseconds=1)),  # Mes anterior
+                ]
+            ]
+        )
+        db.session.commit()
+
+        # Movimientos sin contador (p. ej. anteriores a los resúmenes)
+        assert ResumenMensual.query.count() == 0
+        assert obtener_gastos_mes(ana) == Decimal("10.00")
+        assert obtener_gastos_mes(ana, inicio_mes - timedelta(days=1)) == Decimal("100.00")
+
+
+def test_portada_muestra_gastos_del_mes(app, client):
+    with app.app_context():
+        ana = crear_usuario_prueba("ana", saldo=50).cartera.id
+        bea = crear_usuario_prueba("bea").cartera.id
+        transferir(ana, bea, "12.50")
+    iniciar_sesion(client, "ana")
+
+    assert "12.50 €" in client.get("/").get_data(as_text=True)
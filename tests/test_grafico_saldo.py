@@ -0,0 +1,82 @@
+"""La serie de saldo calculada desde TRANSACCIONES coincide con la del resumen diario."""
+
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from conftest import crear_usuario_prueba
+from database import db
+from models import Recargar, SaldoDiario, Transaccion
+from services import reconstruir_saldos_diarios
+from utils import obtener_datos_graficos
+
+
+def _saldo(cartera_id, rango):
+    return obtener_datos_graficos(cartera_id, ["saldo"], [rango])[rango]
+
+
+@pytest.mark.parametrize("rango", ["semanal", "mensual", "anual"])
+def test_serie_por_ventana_igual_que_resumen_diario(app, rango):
+    with app.app_context():
+        ana = crear_usuario_prueba("ana", saldo=500).cartera.id
+        bea = crear_usuario_prueba("bea").cartera.id
+        ahora = datetime.now()
+        movimientos = []
+        for d in range(0, 400, 3):
+            fecha = ahora - timedelta(days=d, hours=d % 5)
+            origen, destino = (ana, bea) if d % 2 else (bea, ana)
+            movimientos.append(
+                Transaccion(
+                    cantidad=d % 17 + 1,
+                    fecha=fecha,
+                    id_cartera_enviado=origen,
+                    id_cartera_recibido=destino,
+                )
+            )
+            if d % 7 == 0:
+                movimientos.append(Recargar(id_cartera=ana, cantidad=10, fecha=fecha))
+        db.session.add_all(movimientos)
+        db.session.commit()
+
+        # Sin resumen diario: una consulta con funciones de ventana sobre TRANSACCIONES
+        por_ventana = _saldo(ana, rango)
+        reconstruir_saldos_diarios()
+        por_resumen = _saldo(ana, rango)
+
+        assert por_ventana == por_resumen
+        pasados = [v for v in por_ventana["saldo"] if v is not None]
+        assert pasados[-1] == 500
+
+
+def test_cartera_sin_movimientos(app):
+    with app.app_context():
+        ana = crear_usuario_prueba("ana", saldo=42).cartera.id
+
+        datos = _saldo(ana, "semanal")
+
+        assert len(datos["labels"]) == 7
+        assert set(datos["saldo"]) <= {42, None}
+
+
+def test_resumen_usa_los_cierres_guardados(app):
+    with app.app_context():
+        ana = crear_usuario_prueba("ana", saldo=500).cartera.id
+        hoy = date.today()
+        lunes = hoy - timedelta(days=hoy.weekday())
+        # Cierres que no cuadran con el saldo actual: la serie debe leerlos tal cual
+        db.session.add_all(
+            [
+                SaldoDiario(
+                    id_cartera=ana, fecha=lunes - timedelta(days=3), saldo_cierre=Decimal("321")
+                ),
+                SaldoDiario(
+                    id_cartera=ana, fecha=hoy, entradas=Decimal("10"), saldo_cierre=Decimal("331")
+                ),
+            ]
+        )
+        db.session.commit()
+
+        pasados = [v for v in _saldo(ana, "semanal")["saldo"] if v is not None]
+
+        assert pasados == [321] * (len(pasados) - 1) + [331]
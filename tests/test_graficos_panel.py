@@ -0,0 +1,136 @@
+"""Varias series del panel (saldo, ingresos, gastos) a partir de una sola lectura."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from conftest import crear_usuario_prueba, iniciar_sesion
+from database import db
+from models import Recargar, Transaccion
+from services import reconstruir_saldos_diarios, transferir
+from utils import obtener_datos_graficos
+from utils.grafico_utils import puntos_tiempo_grafico
+
+
+def _poblar(ana, bea):
+    ahora = datetime.now()
+    movimientos = []
+    for d in range(0, 400, 3):
+        fecha = ahora - timedelta(days=d, hours=d % 5)
+        origen, destino = (ana, bea) if d % 2 else (bea, ana)
+        movimientos.append(
+            Transaccion(
+                cantidad=d % 17 + 1,
+                fecha=fecha,
+                id_cartera_enviado=origen,
+                id_cartera_recibido=destino,
+            )
+        )
+        if d % 7 == 0:
+            movimientos.append(Recargar(id_cartera=ana, cantidad=10, fecha=fecha))
+    db.session.add_all(movimientos)
+    db.session.commit()
+    # (fecha, entrada, salida) de ana, para calcular a mano lo esperado
+    return [
+        (
+            m.fecha,
+            m.cantidad if isinstance(m, Recargar) or m.id_cartera_recibido == ana else 0,
+            m.cantidad if isinstance(m, Transaccion) and m.id_cartera_enviado == ana else 0,
+        )
+        for m in movimientos
+    ]
+
+
+def _contar_consultas(funcion):
+    sentencias = []
+
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        sentencias.append(statement)
+
+    motor = db.engine
+    event.listen(motor, "before_cursor_execute", _antes)
+    try:
+        resultado = funcion()
+    finally:
+        event.remove(motor, "before_cursor_execute", _antes)
+    return resultado, sentencias
+
+
+@pytest.mark.parametrize("con_resumen", [False, True])
+def test_series_coinciden_con_los_movimientos(app, con_resumen):
+    with app.app_context():
+        ana = crear_usuario_prueba("ana", saldo=500).cartera.id
+        bea = crear_usuario_prueba("bea").cartera.id
+        movimientos = _poblar(ana, bea)
+        if con_resumen:
+            reconstruir_saldos_diarios()
+        db.session.expunge_all()
+
+        datos, sentencias = _contar_consultas(lambda: obtener_datos_graficos(ana))
+
+        # Cobertura del resumen (mínimos por índice) y una consulta para las nueve series
+        assert len(sentencias) == 2
+        if con_resumen:
+            assert "SALDOS_DIARIOS" in sentencias[1] and "OVER" not in sentencias[1]
+        else:
+            # Cierres con funciones de ventana, sin recorrerlos en Python
+            assert "OVER (ORDER BY" in sentencias[1]
+        hoy = datetime.now()
+        for rango, serie in datos.items():
+            inicio, _ = puntos_tiempo_grafico(rango, hoy)
+            ingresos = sum(entrada for fecha, entrada, _ in movimientos if fecha >= inicio)
+            gastos = sum(salida for fecha, _, salida in movimientos if fecha >= inicio)
+            assert sum(v for v in serie["ingresos"] if v) == pytest.approx(float(ingresos))
+            assert sum(v for v in serie["gastos"] if v) == pytest.approx(float(gastos))
+
+            # Cada saldo de cierre es el anterior más el neto de su periodo
+            saldo = 500 - float(ingresos - gastos)
+            for cierre, entrada, salida in zip(serie["saldo"], serie["ingresos"], serie["gastos"]):
+                if cierre is None:
+                    break
+                saldo += entrada - salida
+                assert cierre == pytest.approx(saldo)
+            assert saldo == pytest.approx(500)
+
+
+def test_ruta_graficos_filtra_valida_y_revalida(app, client):
+    with app.app_context():
+        ana = crear_usuario_prueba("ana", saldo=100).cartera.id
+        bea = crear_usuario_prueba("bea", saldo=50).cartera.id
+    iniciar_sesion(client, "ana")
+    url = "/api/graficos?metricas=ingresos,saldo&rangos=semanal"
+
+    respuesta = client.get(url)
+    datos = respuesta.get_json()
+    assert list(datos) == ["semanal"]
+    assert set(datos["semanal"]) == {"labels", "ingresos", "saldo"}
+    assert len(datos["semanal"]["labels"]) == 7
+
+    etag = respuesta.headers["ETag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+    # Un movimiento cambia la versión de la cartera: ni 304 ni datos de la caché
+    with app.app_context():
+        transferir(bea, ana, "20")
+    respuesta = client.get(url, headers={"If-None-Match": etag})
+    assert respuesta.status_code == 200
+    assert sum(v for v in respuesta.get_json()["semanal"]["ingresos"] if v) == 20
+
+    assert client.get("/api/graficos?metricas=nada").status_code == 400
+    assert client.get("/api/graficos?rangos=diario").status_code == 400
+
+
+def test_ruta_grafico_usa_la_serie_de_saldo_del_panel(app, client):
+    with app.app_context():
+        ana = crear_usuario_prueba("ana", saldo=100).cartera.id
+        bea = crear_usuario_prueba("bea").cartera.id
+        _poblar(ana, bea)
+    iniciar_sesion(client, "ana")
+
+    for rango in ("semanal", "mensual", "anual"):
+        datos = client.get(f"/api/grafico/{rango}").get_json()
+        panel = client.get(f"/api/graficos?metricas=saldo&rangos={rango}").get_json()[rango]
+        assert datos == {"labels": panel["labels"], "values": panel["saldo"]}
+
+    assert client.get("/api/grafico/semana").status_code == 400
@@ -0,0 +1,98 @@
+"""Historial paginado por cursor (fecha, id) desde `/api/historial`."""
+
+from datetime import datetime
+
+from sqlalchemy import event
+
+from conftest import crear_usuario_prueba, iniciar_sesion
+from database import db
+from models import Transaccion
+from services import transferir
+
+
+def _recorrer(client, limite):
+    """Pide páginas siguiendo el cursor hasta el final; devuelve las respuestas."""
+
+    paginas = [client.get("/api/historial", query_string={"draw": 1, "length": limite}).get_json()]
+    while paginas[-1]["cursor"] and len(paginas) < 50:
+        paginas.append(
+            client.get(
+                "/api/historial",
+                query_string={
+                    "draw": len(paginas) + 1,
+                    "length": limite,
+                    "cursor": paginas[-1]["cursor"],
+                },
+            ).get_json()
+        )
+    return paginas
+
+
+def test_recorre_todas_las_paginas_sin_repetir(app, client):
+    with app.app_context():
+        ana = crear_usuario_prueba("ana", saldo=100).cartera.id
+        bea = crear_usuario_prueba("bea", saldo=100).cartera.id
+        for n in range(5):
+            transferir(ana, bea, n + 1)
+            transferir(bea, ana, "0.50")
+        # Filas con la fecha del server_default (sin microsegundos), varias en el
+        # mismo segundo, junto a una del mismo segundo guardada con microsegundos
+        ahora = datetime.now().replace(microsecond=0)
+        db.session.add_all(
+            [
+                Transaccion(cantidad=n + 1, id_cartera_enviado=ana, id_cartera_recibido=bea)
+                for n in range(4)
+            ]
+            + [Transaccion(cantidad=9, fecha=ahora, id_cartera_enviado=bea, id_cartera_recibido=ana)]
+        )
+        db.session.commit()
+        esperadas = Transaccion.query.count()
+    iniciar_sesion(client, "ana")
+
+    paginas = _recorrer(client, 2)
+
+    filas = [fila for pagina in paginas for fila in pagina["data"]]
+    assert len(paginas) == -(-esperadas // 2)
+    assert paginas[-1]["cursor"] is None
+    assert len(filas) == esperadas == paginas[0]["recordsTotal"]
+    # Mismo recorrido de una vez: mismas filas y en el mismo orden
+    assert filas == _recorrer(client, 100)[0]["data"]
+
+
+def test_total_se_cuenta_una_vez_por_version(app, client):
+    with app.app_context():
+        ana = crear_usuario_prueba("ana", saldo=100).cartera.id
+        bea = crear_usuario_prueba("bea").cartera.id
+        for _ in range(6):
+            transferir(ana, bea, "1")
+        motor = db.engine
+    iniciar_sesion(client, "ana")
+
+    cuentas = []
+
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        if "count(" in statement:
+            cuentas.append(statement)
+
+    event.listen(motor, "before_cursor_execute", _antes)
+    try:
+        paginas = _recorrer(client, 2)
+        assert len(paginas) == 3
+        assert len(cuentas) == 1
+
+        # Un movimiento nuevo cambia la versión de la cartera: se vuelve a contar
+        with app.app_context():
+            transferir(bea, ana, "1")
+        assert _recorrer(client, 10)[0]["recordsTotal"] == 7
+        assert len(cuentas) == 2
+    finally:
+        event.remove(motor, "before_cursor_execute", _antes)
+
+
+def test_cursor_no_valido(app, client):
+    with app.app_context():
+        crear_usuario_prueba("ana")
+    iniciar_sesion(client, "ana")
+
+    respuesta = client.get("/api/historial?draw=1&cursor=ayer_7")
+    assert respuesta.status_code == 400
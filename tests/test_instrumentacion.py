@@ -0,0 +1,68 @@
+"""Instrumentación SQL por petición: Server-Timing, aviso de N+1 y registro de lentas."""
+
+import logging
+import re
+
+import pytest
+from flask import Response
+
+from conftest import crear_usuario_prueba, iniciar_sesion
+from database import db
+from instrumentacion import _al_empezar_peticion, _al_terminar_peticion, registro_lentas
+from models import Usuario
+
+
+@pytest.fixture
+def instrumentada(app, tmp_path):
+    fichero = tmp_path / "lentas.log"
+    app.config.update(INSTRUMENTACION_SQL=True, CONSULTAS_LENTAS_FICHERO=str(fichero))
+    try:
+        yield fichero
+    finally:
+        app.config.update(
+            INSTRUMENTACION_SQL=False, CONSULTAS_LENTAS_FICHERO=None, CONSULTAS_LENTAS_MS=100
+        )
+        for manejador in list(registro_lentas.handlers):
+            registro_lentas.removeHandler(manejador)
+            manejador.close()
+
+
+def test_server_timing_solo_con_la_opcion_activa(app, client, instrumentada):
+    with app.app_context():
+        crear_usuario_prueba("ana", saldo=10)
+    iniciar_sesion(client, "ana")
+
+    cabecera = client.get("/historial").headers["Server-Timing"]
+    medida = re.fullmatch(r'db;dur=([\d.]+);desc="(\d+) consultas.*", total;dur=([\d.]+)', cabecera)
+    assert medida, cabecera
+    assert int(medida[2]) >= 1
+    assert float(medida[1]) <= float(medida[3])
+    assert not instrumentada.exists()  # Nada pasa de 100 ms
+
+    app.config["INSTRUMENTACION_SQL"] = False
+    assert "Server-Timing" not in client.get("/historial").headers
+
+
+def test_sentencias_lentas_van_al_fichero_con_su_ruta(app, client, instrumentada):
+    with app.app_context():
+        crear_usuario_prueba("ana", saldo=10)
+    iniciar_sesion(client, "ana")
+    app.config["CONSULTAS_LENTAS_MS"] = 0  # Todas cuentan como lentas
+
+    client.get("/historial")
+    lineas = instrumentada.read_text(encoding="utf-8").splitlines()
+    assert any("| GET /historial (main.historial) | SELECT" in linea for linea in lineas)
+    assert not any("pbkdf2" in linea for linea in lineas)  # Sin parámetros
+
+
+def test_misma_sentencia_repetida_se_avisa(app, instrumentada, caplog):
+    with app.app_context():
+        ids = [crear_usuario_prueba(f"u{n}").id for n in range(6)]
+    with app.test_request_context("/prueba"):
+        _al_empezar_peticion()
+        for id_usuario in ids:  # Un N+1 de manual
+            db.session.get(Usuario, id_usuario)
+        with caplog.at_level(logging.WARNING):
+            respuesta = _al_terminar_peticion(Response())
+    assert "max. 6 iguales" in respuesta.headers["Server-Timing"]
+    assert "Posible N+1" in caplog.text and "6 veces" in caplog.text
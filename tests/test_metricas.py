@@ -0,0 +1,169 @@
+"""Endpoint /metrics: histogramas por endpoint, contadores de servicios y acumuladores por hilo."""
+
+import os
+import re
+import threading
+
+import pytest
+
+import metricas
+from conftest import crear_usuario_prueba, iniciar_sesion
+from services import TransferenciaRechazada, transferir, transferir_lote
+
+
+@pytest.fixture(autouse=True)
+def _metricas_a_cero():
+    metricas.reiniciar()
+
+
+def _valor(texto, linea):
+    encontrado = re.search(rf"^{re.escape(linea)} (\S+)$", texto, re.MULTILINE)
+    return float(encontrado[1]) if encontrado else None
+
+
+def test_latencia_por_endpoint_hash_y_pool(app, client):
+    with app.app_context():
+        crear_usuario_prueba("ana", saldo=10)
+    iniciar_sesion(client, "ana")
+    for _ in range(3):
+        client.get("/historial")
+    client.get("/no-existe")
+
+    respuesta = client.get("/metrics")
+    assert respuesta.mimetype == "text/plain"
+    texto = respuesta.get_data(as_text=True)
+
+    historial = 'app_peticion_duracion_segundos_count{endpoint="main.historial"}'
+    assert _valor(texto, historial) == 3
+    inf = 'app_peticion_duracion_segundos_bucket{endpoint="main.historial",le="+Inf"}'
+    assert _valor(texto, inf) == 3
+    # Cubetas acumuladas: nunca decrecen
+    cubetas = [
+        float(v)
+        for v in re.findall(
+            r'^app_peticion_duracion_segundos_bucket\{endpoint="main\.historial",le="[^"]+"\} (\S+)$',
+            texto,
+            re.MULTILINE,
+        )
+    ]
+    assert cubetas == sorted(cubetas)
+    assert _valor(texto, 'app_peticiones_total{codigo="302",endpoint="auth.login"}') == 1
+    assert _valor(texto, 'app_peticiones_total{codigo="404",endpoint="sin_ruta"}') == 1
+    assert _valor(texto, 'app_hash_contrasena_segundos_count{operacion="verificar"}') == 1
+    assert _valor(texto, "app_bd_conexiones_total") >= 4
+    assert _valor(texto, "app_bd_espera_conexion_segundos_count") >= 4
+    assert _valor(texto, 'app_cola_tareas{estado="pendientes"}') == 0
+
+    app.config["METRICAS_ACTIVAS"] = False
+    try:
+        assert client.get("/metrics").status_code == 404
+    finally:
+        app.config["METRICAS_ACTIVAS"] = True
+
+
+def test_metrics_solo_con_token_o_desde_la_maquina(app, client):
+    # Sin token: la petición local pasa, una de fuera no
+    assert client.get("/metrics").status_code == 200
+    fuera = {"REMOTE_ADDR": "10.0.0.7"}
+    assert client.get("/metrics", environ_base=fuera).status_code == 403
+
+    app.config["METRICAS_TOKEN"] = "secreto"
+    try:
+        respuesta = client.get("/metrics")
+        assert respuesta.status_code == 401
+        assert respuesta.headers["WWW-Authenticate"].startswith("Bearer")
+        otro = {"Authorization": "Bearer otro"}
+        assert client.get("/metrics", headers=otro).status_code == 401
+        bueno = {"Authorization": "Bearer secreto"}
+        assert client.get("/metrics", headers=bueno, environ_base=fuera).status_code == 200
+    finally:
+        app.config["METRICAS_TOKEN"] = None
+
+
+def test_transferencias_y_suma_de_hilos(app):
+    with app.app_context():
+        ana = crear_usuario_prueba("ana", saldo=10).cartera.id
+        bea = crear_usuario_prueba("bea").cartera.id
+        transferir(ana, bea, "1")
+        with pytest.raises(TransferenciaRechazada):
+            transferir(ana, bea, "100")
+        transferir_lote(ana, [("bea", "2"), ("nadie", "1")])
+
+    # Hilos que anotan y terminan: lo suyo no se pierde al recoger
+    hilos = [
+        threading.Thread(
+            target=lambda: [metricas.incrementar("app_bd_conexiones_total") for _ in range(1000)]
+        )
+        for _ in range(4)
+    ]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    texto = metricas.exponer()
+    total = "app_transferencias_total"
+    assert _valor(texto, f'{total}{{resultado="confirmada",tipo="individual"}}') == 1
+    assert _valor(texto, f'{total}{{resultado="rechazada",tipo="individual"}}') == 1
+    assert _valor(texto, f'{total}{{resultado="confirmada",tipo="lote"}}') == 1
+    assert _valor(texto, f'{total}{{resultado="rechazada",tipo="lote"}}') == 1
+    assert _valor(texto, "app_bd_conexiones_total") >= 4000
+    assert "# TYPE app_peticion_duracion_segundos histogram" in texto
+
+
+def _en_hijo(tarea):
+    """Ejecuta `tarea` en un proceso bifurcado y espera a que termine bien."""
+
+    pid = os.fork()
+    if pid == 0:  # Hijo: nunca vuelve a pytest
+        codigo = 1
+        try:
+            tarea()
+            codigo = 0
+        finally:
+            os._exit(codigo)
+    _, estado = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(estado) == 0
+    return pid
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="Sin fork en esta plataforma")
+def test_metrics_suma_todos_los_procesos(app, client, tmp_path):
+    directorio = str(tmp_path)
+    app.config["METRICAS_DIRECTORIO"] = directorio
+    linea = 'app_transferencias_total{resultado="prueba",tipo="individual"}'
+
+    def anotar(veces):
+        for _ in range(veces):
+            metricas.incrementar("app_transferencias_total", tipo="individual", resultado="prueba")
+
+    try:
+        anotar(2)
+
+        # Un proceso vivo (su último volcado) y otro que ya ha terminado
+        def vivo():
+            anotar(5)  # Lo del padre no se hereda: empieza de cero
+            metricas.volcar(directorio)
+
+        def retirado():
+            anotar(3)
+            metricas.volcar(directorio)
+            metricas.retirar_proceso(directorio)
+
+        pid_vivo = _en_hijo(vivo)
+        pid_retirado = _en_hijo(retirado)
+        ficheros = set(os.listdir(directorio))
+        assert f"{pid_vivo}.json" in ficheros
+        assert f"{pid_retirado}.json" not in ficheros
+
+        texto = client.get("/metrics").get_data(as_text=True)
+        assert _valor(texto, linea) == 10
+        assert f"{os.getpid()}.json" in os.listdir(directorio)
+        assert _valor(texto, f'app_bd_conexiones_en_uso{{pid="{os.getpid()}"}}') is not None
+
+        # Al terminar este proceso lo suyo sigue contando
+        metricas.retirar_proceso(directorio)
+        assert _valor(metricas.exponer(directorio=directorio), linea) == 10
+    finally:
+        metricas.detener_volcado()
+        app.config.pop("METRICAS_DIRECTORIO")
@@ -0,0 +1,35 @@
+"""Cada conexión SQLite nueva sale con el perfil de producción aplicado."""
+
+from app import create_app
+from database import PERFIL_SQLITE, db
+
+
+def _pragma(conexion, nombre):
+    return conexion.exec_driver_sql(f"PRAGMA {nombre}").scalar()
+
+
+def test_perfil_sqlite_aplicado(app):
+    with app.app_context(), db.engine.connect() as conexion:
+        assert _pragma(conexion, "journal_mode") == "wal"
+        assert _pragma(conexion, "foreign_keys") == 1
+        assert _pragma(conexion, "synchronous") == 1  # NORMAL
+        assert _pragma(conexion, "temp_store") == 2  # MEMORY
+        assert _pragma(conexion, "busy_timeout") == PERFIL_SQLITE["busy_timeout"]
+        assert _pragma(conexion, "cache_size") == PERFIL_SQLITE["cache_size"]
+
+
+def test_pragmas_configurables(tmp_path):
+    app = create_app(
+        {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'pragmas.db'}",
+            "COLA_TRABAJADORES": 0,
+            "SQLITE_PRAGMAS": {"foreign_keys": "OFF", "cache_size": -64000},
+        }
+    )
+    with app.app_context(), db.engine.connect() as conexion:
+        assert _pragma(conexion, "foreign_keys") == 0
+        assert _pragma(conexion, "cache_size") == -64000
+        # El resto del perfil se mantiene
+        assert _pragma(conexion, "journal_mode") == "wal"
+    with app.app_context():
+        db.engine.dispose()
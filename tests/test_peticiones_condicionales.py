@@ -0,0 +1,118 @@
+"""ETag / Last-Modified en los endpoints JSON: 304 sin recalcular si la cartera no cambia."""
+
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import pytest
+from sqlalchemy import event
+
+from conftest import crear_usuario_prueba, iniciar_sesion
+from database import db
+from models import Cartera
+from services import transferir
+
+URLS = ("/api/grafico/semanal", "/api/historial?draw=1&length=10")
+
+
+@pytest.fixture
+def consultas_movimientos(app):
+    """SELECT sobre las tablas de movimientos lanzadas durante el test."""
+
+    sentencias = []
+
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("SELECT") and any(
+            tabla in statement for tabla in ("TRANSACCIONES", "SALDOS_DIARIOS")
+        ):
+            sentencias.append(statement)
+
+    with app.app_context():
+        motor = db.engine
+    event.listen(motor, "before_cursor_execute", _antes)
+    yield sentencias
+    event.remove(motor, "before_cursor_execute", _antes)
+
+
+@pytest.mark.parametrize("url", URLS)
+def test_etag_responde_304_sin_consultar(app, client, consultas_movimientos, url):
+    with app.app_context():
+        crear_usuario_prueba("ana", saldo=10)
+    iniciar_sesion(client, "ana")
+
+    primera = client.get(url)
+    assert primera.status_code == 200
+    assert primera.headers["Cache-Control"] == "private, no-cache"
+    etag = primera.headers["ETag"]
+
+    consultas_movimientos.clear()
+    segunda = client.get(url, headers={"If-None-Match": etag})
+    assert segunda.status_code == 304
+    assert segunda.headers["ETag"] == etag
+    assert consultas_movimientos == []
+
+
+@pytest.mark.parametrize("url", URLS)
+def test_movimiento_invalida_etag(app, client, url):
+    with app.app_context():
+        ana = crear_usuario_prueba("ana", saldo=10).cartera.id
+        bea = crear_usuario_prueba("bea").cartera.id
+    iniciar_sesion(client, "ana")
+    etag = client.get(url).headers["ETag"]
+
+    with app.app_context():
+        transferir(ana, bea, "1")
+
+    respuesta = client.get(url, headers={"If-None-Match": etag})
+    assert respuesta.status_code == 200
+    assert respuesta.headers["ETag"] != etag
+
+
+def test_if_modified_since(app, client):
+    with app.app_context():
+        ana = crear_usuario_prueba("ana", saldo=10).cartera.id
+        bea = crear_usuario_prueba("bea").cartera.id
+        transferir(ana, bea, "1")
+    iniciar_sesion(client, "ana")
+
+    url = "/api/historial?draw=1&length=10"
+    ultima = client.get(url).headers["Last-Modified"]
+    assert client.get(url, headers={"If-Modified-Since": ultima}).status_code == 304
+
+
+def test_historial_304_con_otro_draw(app, client):
+    with app.app_context():
+        crear_usuario_prueba("ana", saldo=10)
+    iniciar_sesion(client, "ana")
+
+    primera = client.get("/api/historial?draw=1&length=10")
+    assert primera.get_json()["draw"] == 1
+    etag = primera.headers["ETag"]
+
+    # DataTables incrementa `draw` en cada petición: no cambia los datos
+    respuesta = client.get("/api/historial?draw=7&length=10", headers={"If-None-Match": etag})
+    assert respuesta.status_code == 304
+
+
+def test_last_modified_en_utc(app, client, monkeypatch):
+    # Hora local distinta de UTC: la fecha guardada (local) debe enviarse convertida
+    monkeypatch.setenv("TZ", "America/Bogota")  # UTC-5, sin horario de verano
+    time.tzset()
+    try:
+        with app.app_context():
+            ana = crear_usuario_prueba("ana", saldo=10).cartera.id
+            bea = crear_usuario_prueba("bea").cartera.id
+            transferir(ana, bea, "1")
+            modificada = db.session.get(Cartera, ana).modificada
+        iniciar_sesion(client, "ana")
+
+        url = "/api/historial?draw=1&length=10"
+        ultima = client.get(url).headers["Last-Modified"]
+        assert parsedate_to_datetime(ultima) == modificada.astimezone(timezone.utc).replace(
+            microsecond=0
+        )
+        assert abs(parsedate_to_datetime(ultima) - datetime.now(timezone.utc)).total_seconds() < 60
+        assert client.get(url, headers={"If-Modified-Since": ultima}).status_code == 304
+    finally:
+        monkeypatch.delenv("TZ")
+        time.tzset()
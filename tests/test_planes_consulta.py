@@ -0,0 +1,158 @@
+"""Guarda de regresión: ninguna consulta de servicios/rutas debe recorrer una tabla entera.
+
+Se ejecuta un recorrido por todas las rutas capturando cada sentencia SQL que
+llega al motor y se vuelve a lanzar con `EXPLAIN QUERY PLAN`. Si SQLite decide
+hacer un `SCAN` de alguna tabla del modelo, aunque sea de un índice entero, el
+test falla indicando la consulta culpable.
+"""
+
+import re
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from conftest import crear_usuario_prueba, iniciar_sesion
+from database import db
+from models import Tarjeta, Transaccion
+from services import compactar_fracciones, fraccionar_cartera
+
+# "SCAN TABLA", con o sin "USING [COVERING] INDEX", recorre la tabla o el índice
+# entero: O(n) igual. Solo "SEARCH" acota el recorrido (SQLite >= 3.36)
+PATRON_SCAN = re.compile(r"^SCAN (\w+)")
+# Tablas que no crecen con el uso y se pueden recorrer enteras: la cola solo
+# guarda las tareas pendientes, en curso o fallidas (las hechas se borran)
+TABLAS_PEQUENAS = {"TAREAS"}
+TABLAS_VIGILADAS = {tabla.name for tabla in db.metadata.sorted_tables} - TABLAS_PEQUENAS
+
+
+def _capturar_sentencias(app, recorrido):
+    sentencias = []
+
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "INSERT")):
+            if executemany:
+                parameters = parameters[0] if parameters else ()
+            sentencias.append((statement, parameters))
+
+    with app.app_context():
+        motor = db.engine
+    event.listen(motor, "before_cursor_execute", _antes)
+    try:
+        recorrido()
+    finally:
+        event.remove(motor, "before_cursor_execute", _antes)
+    return sentencias
+
+
+def _recorridos_completos(app, sentencias):
+    problemas = []
+    with app.app_context():
+        conexion = db.engine.connect()
+        try:
+            for statement, parameters in sentencias:
+                plan = conexion.exec_driver_sql(
+                    "EXPLAIN QUERY PLAN " + statement, parameters
+                ).all()
+                for fila in plan:
+                    detalle = fila[-1]
+                    encontrado = PATRON_SCAN.match(detalle)
+                    if encontrado and encontrado.group(1) in TABLAS_VIGILADAS:
+                        problemas.append(f"{detalle}\n    en: {statement}")
+        finally:
+            conexion.close()
+    return problemas
+
+
+def test_ninguna_ruta_hace_scan_completo(app, client):
+    with app.app_context():
+        ana = crear_usuario_prueba("ana", saldo=100)
+        bea = crear_usuario_prueba("bea", saldo=50)
+        ahora = datetime.now()
+        db.session.add_all(
+            [
+                Transaccion(
+                    cantidad=5,
+                    id_cartera_enviado=ana.cartera.id,
+                    id_cartera_recibido=bea.cartera.id,
+                    fecha=ahora - timedelta(days=d),
+                )
+                for d in range(10)
+            ]
+        )
+        db.session.add(
+            Tarjeta(
+                numero="4000123456789010",
+                caducidad="12/30",
+                cvc=123,
+                propietario_nombre="Ana",
+                id_usuario=ana.id,
+            )
+        )
+        db.session.commit()
+        id_tarjeta = Tarjeta.query.first().id
+        # bea recibe por fracciones: sus abonos y lecturas también se comprueban
+        id_bea = bea.cartera.id
+        fraccionar_cartera(id_bea, 4)
+
+    def recorrido():
+        iniciar_sesion(client, "ana")
+        for url in (
+            "/",
+            "/api/grafico/semanal",
+            "/api/grafico/mensual",
+            "/api/grafico/anual",
+            "/api/graficos",
+            "/historial",
+            "/transferir",
+            "/ingresar",
+            "/configuracion/cuenta",
+            "/configuracion/opciones-de-pago",
+            "/configuracion/mis-tarjetas",
+            "/metrics",
+        ):
+            assert client.get(url).status_code == 200, url
+        client.get("/historial/exportar?formato=jsonl").get_data()
+        pagina = client.get("/api/historial?draw=1&length=3").get_json()
+        client.get(f"/api/historial?draw=2&length=3&cursor={pagina['cursor']}")
+        client.post("/ingresar", data={"cantidad_transferir": "10", "ingresarcartera": ""})
+        client.post("/transferir", data={"usu_transferir": "bea", "cantidad_transferir": "5"})
+        client.post(
+            "/api/transferir-lote",
+            json=[
+                {"destinatario": "bea", "cantidad": 1},
+                {"destinatario": "bea@example.com", "cantidad": 2},
+            ],
+        )
+        client.get("/api/graficos?metricas=saldo,gastos&rangos=semanal,anual")
+        hace_90_dias = (datetime.now() - timedelta(days=90)).date().isoformat()
+        for granularidad in ("hora", "dia", "mes"):
+            client.get(f"/api/graficos/serie?desde={hace_90_dias}&granularidad={granularidad}")
+        client.post(
+            "/configuracion/anadir-tarjeta",
+            data={
+                "propietario": "Ana",
+                "numero": "4000123456789011",
+                "caducidad": "11/29",
+                "cvc": "321",
+            },
+        )
+        client.post(
+            "/configuracion/compartir-tarjeta",
+            data={"tarjeta_id": id_tarjeta, "usuario_nombre": "Bea"},
+        )
+        client.post(
+            "/configuracion/cuenta/actualizar_email",
+            data={"nuevo_email": "ana.nueva@example.com"},
+        )
+        client.post("/configuracion/eliminar-tarjeta", data={"tarjeta_id": id_tarjeta})
+        client.get("/logout")
+        with app.app_context():
+            compactar_fracciones(id_bea)
+
+    sentencias = _capturar_sentencias(app, recorrido)
+    assert sentencias, "El recorrido no ha ejecutado ninguna consulta"
+
+    problemas = _recorridos_completos(app, sentencias)
+    assert not problemas, "Consultas con recorrido completo de tabla:\n" + "\n".join(
+        problemas
+    )
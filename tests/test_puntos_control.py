@@ -0,0 +1,116 @@
+"""Puntos de control de saldo: saldo en cualquier instante sin recorrer todo el historial."""
+
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from conftest import crear_usuario_prueba
+from database import db
+from models import PuntoControl, Recargar, Transaccion
+from services import crear_punto_control, generar_puntos_control, obtener_saldo_en
+
+# (días atrás, importe para ana: positivo lo recibe de beto, negativo se lo envía)
+MOVIMIENTOS = [(110, "100"), (95, "-30.25"), (70, "45.10"), (40, "-12"), (3, "7.77")]
+RECARGA = (60, "20")
+
+
+def _historial():
+    """Carteras de ana y beto con movimientos repartidos en los últimos cuatro meses."""
+
+    total = sum(Decimal(i) for _, i in [*MOVIMIENTOS, RECARGA])
+    ana = crear_usuario_prueba("ana", saldo=total).cartera.id
+    beto = crear_usuario_prueba("beto", saldo=500).cartera.id
+    ahora = datetime.now().replace(microsecond=0)
+    for dias, importe in MOVIMIENTOS:
+        cantidad = Decimal(importe)
+        origen, destino = (beto, ana) if cantidad > 0 else (ana, beto)
+        db.session.add(
+            Transaccion(
+                cantidad=abs(cantidad),
+                fecha=ahora - timedelta(days=dias),
+                id_cartera_enviado=origen,
+                id_cartera_recibido=destino,
+            )
+        )
+    dias, importe = RECARGA
+    db.session.add(
+        Recargar(id_cartera=ana, cantidad=Decimal(importe), fecha=ahora - timedelta(days=dias))
+    )
+    db.session.commit()
+    return ana, ahora
+
+
+def _esperado(ahora, momento):
+    """Saldo de ana en `momento`, sumando el historial desde el principio."""
+
+    return sum(
+        (Decimal(i) for d, i in [*MOVIMIENTOS, RECARGA] if ahora - timedelta(days=d) < momento),
+        Decimal("0.00"),
+    )
+
+
+def _momentos(ahora):
+    inicio_mes = datetime.combine(date.today().replace(day=1), datetime.min.time())
+    return [ahora - timedelta(days=d, hours=h) for d in range(0, 130, 9) for h in (0, 5)] + [
+        inicio_mes,
+        ahora - timedelta(days=110),  # Justo en un movimiento: aún no cuenta
+    ]
+
+
+def test_saldo_en_con_y_sin_puntos_de_control(app):
+    with app.app_context():
+        ana, ahora = _historial()
+
+        # Sin puntos: hacia atrás desde el saldo actual
+        for momento in _momentos(ahora):
+            assert obtener_saldo_en(ana, momento) == _esperado(ahora, momento), momento
+
+        escritos = generar_puntos_control()
+        puntos = PuntoControl.query.filter_by(id_cartera=ana).order_by(PuntoControl.fecha).all()
+        assert escritos >= 2 * len(puntos) - 1  # También los de beto
+        assert puntos[-1].fecha == date.today().replace(day=1)
+        for punto in puntos:
+            inicio = datetime.combine(punto.fecha, datetime.min.time())
+            assert punto.saldo == _esperado(ahora, inicio)
+        # Un punto por mes, sin huecos, desde el mes del primer movimiento
+        assert puntos[0].fecha == (ahora - timedelta(days=110)).date().replace(day=1)
+        assert len({(p.fecha.year, p.fecha.month) for p in puntos}) == len(puntos)
+
+        # Con puntos: hacia delante desde el último anterior
+        for momento in _momentos(ahora):
+            assert obtener_saldo_en(ana, momento) == _esperado(ahora, momento), momento
+
+
+def test_generar_es_incremental_y_crear_punto_a_demanda(app):
+    with app.app_context():
+        ana, ahora = _historial()
+        mes_anterior = (date.today().replace(day=1) - timedelta(days=1)).replace(day=1)
+
+        primeros = generar_puntos_control(ana, hasta=mes_anterior)
+        assert PuntoControl.query.filter_by(fecha=date.today().replace(day=1)).count() == 0
+        assert generar_puntos_control(ana) == 1  # Solo falta el mes actual
+        assert generar_puntos_control(ana) == 0
+        assert PuntoControl.query.count() == primeros + 1
+
+        # Un punto a mitad de mes: lo siguiente parte de él
+        dia = (ahora - timedelta(days=50)).date()
+        assert crear_punto_control(ana, dia) == _esperado(
+            ahora, datetime.combine(dia, datetime.min.time())
+        )
+        for momento in _momentos(ahora):
+            assert obtener_saldo_en(ana, momento) == _esperado(ahora, momento), momento
+
+        with pytest.raises(ValueError, match="no existe"):
+            obtener_saldo_en(9999, ahora)
+
+
+def test_comando_generar_puntos_control(app):
+    with app.app_context():
+        ana, _ = _historial()
+        resultado = app.test_cli_runner().invoke(
+            args=["generar-puntos-control", "--cartera", str(ana)]
+        )
+        assert resultado.exit_code == 0, resultado.output
+        assert "Puntos de control escritos" in resultado.output
+        assert PuntoControl.query.filter_by(id_cartera=ana).count() >= 4
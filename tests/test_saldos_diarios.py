@@ -0,0 +1,129 @@
+"""Resúmenes diarios y mensuales: mantenimiento incremental, reconstrucción y cobertura parcial."""
+
+from datetime import date, datetime
+
+from conftest import crear_usuario_prueba
+from database import db
+from models import Recargar, ResumenMensual, SaldoDiario, Transaccion
+from services import (
+    fraccionar_cartera,
+    obtener_gastos_mes,
+    recargar_cartera,
+    reconstruir_saldos_diarios,
+    registrar_movimiento,
+    transferir,
+    transferir_lote,
+)
+from utils import obtener_serie_grafico
+
+
+def _resumenes():
+    diarios = {
+        (f.id_cartera, f.fecha): (f.entradas, f.salidas, f.saldo_cierre)
+        for f in SaldoDiario.query.all()
+    }
+    mensuales = {
+        (f.id_cartera, f.mes): (f.ingresos, f.gastos) for f in ResumenMensual.query.all()
+    }
+    return diarios, mensuales
+
+
+def test_incremental_coincide_con_reconstruccion(app):
+    with app.app_context():
+        ana = crear_usuario_prueba("ana", saldo=100).cartera.id
+        bea = crear_usuario_prueba("bea").cartera.id
+        cris = crear_usuario_prueba("cris", saldo=20).cartera.id
+        fraccionar_cartera(cris, 3)
+
+        transferir(ana, bea, "30")
+        transferir(bea, cris, "12.50")
+        transferir_lote(ana, [("bea", "5.25"), ("cris", "4.75"), ("cris", "1")])
+        recargar_cartera(bea, "7")
+        recargar_cartera(cris, "3.10")
+
+        incremental = _resumenes()
+        assert incremental[0][(ana, date.today())][2] == 59  # Saldo de cierre
+        assert len(incremental[0]) == 3
+
+        reconstruir_saldos_diarios()
+        assert _resumenes() == incremental
+
+        # Reconstruir una sola cartera no toca las demás
+        db.session.execute(db.delete(SaldoDiario).where(SaldoDiario.id_cartera == bea))
+        db.session.commit()
+        reconstruir_saldos_diarios(bea)
+        assert _resumenes() == incremental
+
+
+def test_historial_anterior_a_los_resumenes(app):
+    with app.app_context():
+        ana = crear_usuario_prueba("ana", saldo=500).cartera.id
+        bea = crear_usuario_prueba("bea").cartera.id
+        # Historial de antes de existir los resúmenes: sin filas en SALDOS_DIARIOS
+        db.session.add_all(
+            [
+                Transaccion(
+                    cantidad=40,
+                    fecha=datetime(2025, 2, 10, 9),
+                    id_cartera_enviado=bea,
+                    id_cartera_recibido=ana,
+                ),
+                Transaccion(
+                    cantidad=15,
+                    fecha=datetime(2025, 3, 3, 9),
+                    id_cartera_enviado=ana,
+                    id_cartera_recibido=bea,
+                ),
+                Recargar(id_cartera=ana, cantidad=8, fecha=datetime(2025, 3, 5, 18)),
+            ]
+        )
+        # Primer movimiento con los resúmenes ya en marcha
+        fecha = datetime(2025, 3, 20, 10)
+        db.session.add(
+            Transaccion(cantidad=20, fecha=fecha, id_cartera_enviado=ana, id_cartera_recibido=bea)
+        )
+        registrar_movimiento(ana, salida=20, fecha=fecha)
+        registrar_movimiento(bea, entrada=20, fecha=fecha)
+        db.session.commit()
+
+        def lecturas():
+            return (
+                obtener_gastos_mes(ana, fecha),
+                obtener_serie_grafico(
+                    ana, datetime(2025, 2, 1), datetime(2025, 4, 1), "semana", ["saldo", "gastos"]
+                ),
+                obtener_serie_grafico(
+                    ana, datetime(2025, 3, 1), datetime(2025, 4, 1), "dia", ["ingresos"]
+                ),
+            )
+
+        parciales = lecturas()
+        assert parciales[0] == 35
+        assert sum(parciales[1]["gastos"]) == 35
+
+        reconstruir_saldos_diarios()
+        assert lecturas() == parciales
+
+
+def test_actualizar_esquema_reconstruye_resumenes_incompletos(app):
+    with app.app_context():
+        ana = crear_usuario_prueba("ana", saldo=100).cartera.id
+        bea = crear_usuario_prueba("bea").cartera.id
+        transferir(ana, bea, "10")
+        db.session.add(
+            Transaccion(
+                cantidad=5,
+                fecha=datetime(2025, 1, 2),
+                id_cartera_enviado=ana,
+                id_cartera_recibido=bea,
+            )
+        )
+        db.session.commit()
+
+        resultado = app.test_cli_runner().invoke(args=["actualizar-esquema"])
+        assert "Resúmenes reconstruidos (2 carteras incompletas)" in resultado.output
+        assert db.session.get(ResumenMensual, (ana, date(2025, 1, 1))).gastos == 5
+
+        # Ya al día: no se vuelve a reconstruir
+        resultado = app.test_cli_runner().invoke(args=["actualizar-esquema"])
+        assert "Resúmenes reconstruidos" not in resultado.output
@@ -0,0 +1,121 @@
+"""Series para ventanas de fechas arbitrarias y granularidad de hora a mes."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import crear_usuario_prueba, iniciar_sesion
+from database import db
+from services import generar_puntos_control, reconstruir_saldos_diarios, transferir
+from test_graficos_panel import _poblar
+from utils import calendario_serie, obtener_serie_grafico
+
+
+def test_calendario_ajusta_ventana_etiqueta_y_limita_puntos():
+    granularidad, limites, etiquetas = calendario_serie(
+        datetime(2026, 3, 30, 15, 20), datetime(2026, 4, 2), "dia"
+    )
+    assert granularidad == "dia"
+    assert limites == [datetime(2026, 3, d) for d in (30, 31)] + [
+        datetime(2026, 4, d) for d in (1, 2)
+    ]
+    assert etiquetas == ["30 mar", "31 mar", "1 abr"]
+
+    _, limites, etiquetas = calendario_serie(
+        datetime(2025, 12, 31, 22, 30), datetime(2026, 1, 1, 1), "hora"
+    )
+    assert etiquetas == ["31 dic 2025 22:00", "31 dic 2025 23:00", "1 ene 2026 00:00"]
+
+    _, limites, etiquetas = calendario_serie(datetime(2026, 1, 14), datetime(2026, 1, 20), "semana")
+    assert limites == [datetime(2026, 1, 12), datetime(2026, 1, 19), datetime(2026, 1, 26)]
+    assert etiquetas == ["Sem. 12 ene", "Sem. 19 ene"]
+
+    _, limites, etiquetas = calendario_serie(datetime(2024, 11, 5), datetime(2025, 2, 1), "mes")
+    assert etiquetas == ["Noviembre 2024", "Diciembre 2024", "Enero 2025"]
+    assert limites[-1] == datetime(2025, 2, 1)
+
+    # Tres años por horas no caben: se pasa a semanas
+    granularidad, limites, _ = calendario_serie(
+        datetime(2023, 1, 1), datetime(2026, 1, 1), "hora", max_puntos=200
+    )
+    assert granularidad == "semana"
+    assert len(limites) - 1 <= 200
+
+    with pytest.raises(ValueError):
+        calendario_serie(datetime(2026, 1, 2), datetime(2026, 1, 1), "dia")
+    with pytest.raises(ValueError):
+        calendario_serie(datetime(2026, 1, 1), datetime(2026, 1, 2), "minuto")
+    with pytest.raises(ValueError, match="meses"):
+        calendario_serie(datetime(1900, 1, 1), datetime(2026, 1, 1), "mes", max_puntos=12)
+
+
+@pytest.mark.parametrize("con_resumen", [False, True])
+@pytest.mark.parametrize(
+    "dias, granularidad", [(3, "hora"), (90, "dia"), (200, "semana"), (800, "mes")]
+)
+def test_serie_coincide_con_los_movimientos(app, con_resumen, dias, granularidad):
+    with app.app_context():
+        ana = crear_usuario_prueba("ana", saldo=500).cartera.id
+        bea = crear_usuario_prueba("bea").cartera.id
+        movimientos = _poblar(ana, bea)
+        if con_resumen:
+            reconstruir_saldos_diarios()
+            generar_puntos_control()
+        db.session.expunge_all()
+
+        ahora = datetime.now()
+        desde = ahora - timedelta(days=dias)
+        datos = obtener_serie_grafico(ana, desde, ahora + timedelta(days=1), granularidad)
+        _, limites, etiquetas = calendario_serie(desde, ahora + timedelta(days=1), granularidad)
+
+        assert datos["granularidad"] == granularidad
+        assert datos["labels"] == etiquetas
+        for i, etiqueta in enumerate(etiquetas):
+            inicio, fin = limites[i], limites[i + 1]
+            if inicio > ahora:
+                assert datos["saldo"][i] is datos["gastos"][i] is None, etiqueta
+                continue
+            en_cubeta = [m for m in movimientos if inicio <= m[0] < fin]
+            assert datos["ingresos"][i] == pytest.approx(float(sum(m[1] for m in en_cubeta)))
+            assert datos["gastos"][i] == pytest.approx(float(sum(m[2] for m in en_cubeta)))
+            # Saldo al cierre de la cubeta: el actual menos lo que vino después
+            posterior = sum(m[1] - m[2] for m in movimientos if m[0] >= fin)
+            assert datos["saldo"][i] == pytest.approx(float(500 - posterior)), etiqueta
+
+
+def test_ruta_serie_valida_y_revalida(app, client):
+    with app.app_context():
+        ana = crear_usuario_prueba("ana", saldo=100).cartera.id
+        bea = crear_usuario_prueba("bea", saldo=50).cartera.id
+    iniciar_sesion(client, "ana")
+    desde = (datetime.now() - timedelta(days=89)).date().isoformat()
+    url = f"/api/graficos/serie?desde={desde}&metricas=ingresos,saldo"
+
+    respuesta = client.get(url)
+    datos = respuesta.get_json()
+    assert datos["granularidad"] == "dia"
+    assert len(datos["labels"]) == 90
+    assert set(datos) == {"granularidad", "desde", "hasta", "labels", "ingresos", "saldo"}
+    assert datos["saldo"][-1] == 100
+
+    etag = respuesta.headers["ETag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    with app.app_context():
+        transferir(bea, ana, "20")
+    respuesta = client.get(url, headers={"If-None-Match": etag})
+    assert respuesta.status_code == 200
+    assert respuesta.get_json()["ingresos"][-1] == 20
+
+    anual = client.get("/api/graficos/serie?desde=2020-01-01&hasta=2026-01-01&granularidad=hora")
+    assert anual.status_code == 200
+    assert anual.get_json()["granularidad"] == "semana"
+
+    for malo in (
+        "",
+        "?desde=ayer",
+        "?desde=2026-02-01&hasta=2026-01-01",
+        "?desde=2026-01-01&granularidad=minuto",
+        "?desde=2026-01-01T00:00:00%2B02:00",
+        "?desde=2026-01-01&metricas=nada",
+    ):
+        assert client.get("/api/graficos/serie" + malo).status_code == 400, malo
@@ -0,0 +1,81 @@
+"""Servidor de producción: opciones de gunicorn, procesos hijos tras el fork y apagado."""
+
+import os
+import threading
+
+import pytest
+from sqlalchemy import select
+
+from conftest import crear_usuario_prueba
+from database import db
+from models import Cartera
+from servidor import al_bifurcar, al_terminar, opciones_servidor
+from services import iniciar_trabajadores, transferir
+
+
+def test_opciones_por_defecto_y_desde_el_entorno():
+    opciones = opciones_servidor({})
+    assert opciones["workers"] == (os.cpu_count() or 1)  # Todos los núcleos
+    assert (opciones["threads"], opciones["worker_class"]) == (4, "gthread")
+    assert opciones["preload_app"] is True
+    assert (opciones["bind"], opciones["max_requests"]) == ("0.0.0.0:8000", 0)
+
+    opciones = opciones_servidor(
+        {"WEB_PROCESOS": "3", "WEB_HILOS": "1", "WEB_BIND": "127.0.0.1:9000", "WEB_MAX_PETICIONES": "1000"}
+    )
+    assert (opciones["workers"], opciones["threads"], opciones["worker_class"]) == (3, 1, "sync")
+    assert opciones["bind"] == "127.0.0.1:9000"
+    assert (opciones["max_requests"], opciones["max_requests_jitter"]) == (1000, 100)
+
+    with pytest.raises(ValueError, match="WEB_PROCESOS"):
+        opciones_servidor({"WEB_PROCESOS": "0"})
+    with pytest.raises(ValueError, match="WEB_HILOS"):
+        opciones_servidor({"WEB_HILOS": "muchos"})
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="Sin fork en esta plataforma")
+def test_hijo_bifurcado_usa_conexiones_propias(app):
+    with app.app_context():
+        ana = crear_usuario_prueba("ana", saldo=10).cartera.id
+        bea = crear_usuario_prueba("bea").cartera.id
+        db.session.execute(select(1))  # El maestro deja una conexión en el pool
+        db.session.remove()
+        assert db.engine.pool.checkedin() >= 1
+        pool_padre = db.engine.pool
+    hash_configurado = app.config["PASSWORD_HASH_WORKERS"]
+
+    pid = os.fork()
+    if pid == 0:  # Hijo: nunca vuelve a pytest
+        codigo = 1
+        try:
+            app.config["PASSWORD_HASH_WORKERS"] = None
+            al_bifurcar(app, procesos=max(os.cpu_count() or 1, 2))
+            with app.app_context():
+                assert db.engine.pool is not pool_padre
+                assert db.engine.pool.checkedin() == 0
+                transferir(ana, bea, "1")
+            assert app.config["PASSWORD_HASH_WORKERS"] == 1
+            codigo = 0
+        finally:
+            os._exit(codigo)
+
+    _, estado = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(estado) == 0
+    app.config["PASSWORD_HASH_WORKERS"] = hash_configurado
+    # El maestro sigue usando sus conexiones y ve lo que escribió el hijo
+    with app.app_context():
+        assert db.engine.pool is pool_padre
+        assert db.session.get(Cartera, bea).cantidad == 1
+
+
+def test_apagado_para_la_cola_y_cierra_conexiones(app):
+    iniciar_trabajadores(app, 2)
+    assert any(h.name.startswith("cola-") for h in threading.enumerate())
+    with app.app_context():
+        db.session.execute(select(1))
+        db.session.remove()
+
+    al_terminar(app)
+    assert not any(h.name.startswith("cola-") for h in threading.enumerate())
+    with app.app_context():
+        assert db.engine.pool.checkedin() == 0
@@ -0,0 +1,47 @@
+"""Borrado de tarjetas con la integridad referencial de SQLite activada."""
+
+from conftest import crear_usuario_prueba, iniciar_sesion
+from database import db
+from models import Recargar, Tarjeta
+
+
+def _tarjeta(usuario):
+    tarjeta = Tarjeta(
+        numero="4000123456789010",
+        caducidad="12/30",
+        cvc=123,
+        propietario_nombre=usuario.nombre,
+        id_usuario=usuario.id,
+    )
+    db.session.add(tarjeta)
+    db.session.commit()
+    return tarjeta.id
+
+
+def test_eliminar_tarjeta_sin_recargas(app, client):
+    with app.app_context():
+        id_tarjeta = _tarjeta(crear_usuario_prueba("ana"))
+    iniciar_sesion(client, "ana")
+
+    respuesta = client.post("/configuracion/eliminar-tarjeta", data={"tarjeta_id": id_tarjeta})
+    assert respuesta.status_code == 302
+    with app.app_context():
+        assert db.session.get(Tarjeta, id_tarjeta) is None
+
+
+def test_eliminar_tarjeta_con_recargas_no_da_error(app, client):
+    with app.app_context():
+        ana = crear_usuario_prueba("ana")
+        id_tarjeta = _tarjeta(ana)
+        db.session.add(Recargar(id_cartera=ana.cartera.id, id_tarjeta=id_tarjeta, cantidad=5))
+        db.session.commit()
+    iniciar_sesion(client, "ana")
+
+    respuesta = client.post("/configuracion/eliminar-tarjeta", data={"tarjeta_id": id_tarjeta})
+    assert respuesta.status_code == 302
+    with client.session_transaction() as sesion:
+        assert sesion["_flashes"][-1:] == [
+            ("danger", "No se puede eliminar una tarjeta con recargas registradas")
+        ]
+    with app.app_context():
+        assert db.session.get(Tarjeta, id_tarjeta) is not None
@@ -0,0 +1,254 @@
+"""Transferencias atómicas: cargo condicionado, abono y registro en una sola transacción."""
+
+import threading
+from decimal import Decimal
+
+import pytest
+
+from conftest import crear_usuario_prueba, iniciar_sesion
+from database import db
+from models import Cartera, Recargar, SaldoDiario, Transaccion
+from services import (
+    TransferenciaRechazada,
+    recargar_cartera,
+    transferir,
+    transferir_lote,
+)
+
+
+def _saldo(id_cartera):
+    db.session.expire_all()
+    return Decimal(str(db.session.get(Cartera, id_cartera).cantidad))
+
+
+def test_transferir_mueve_saldo_y_registra(app):
+    with app.app_context():
+        ana = crear_usuario_prueba("ana", saldo=100).cartera.id
+        bea = crear_usuario_prueba("bea", saldo=0).cartera.id
+
+        id_transaccion = transferir(ana, bea, "30.50")
+
+        assert _saldo(ana) == Decimal("69.50")
+        assert _saldo(bea) == Decimal("30.50")
+        transaccion = db.session.get(Transaccion, id_transaccion)
+        assert (transaccion.id_cartera_enviado, transaccion.id_cartera_recibido) == (ana, bea)
+        resumen = {fila.id_cartera: fila for fila in SaldoDiario.query.all()}
+        assert resumen[ana].salidas == Decimal("30.50")
+        assert resumen[bea].saldo_cierre == Decimal("30.50")
+
+
+def test_movimientos_guardan_la_fecha_local_de_sus_resumenes(app):
+    with app.app_context():
+        ana = crear_usuario_prueba("ana", saldo=100).cartera.id
+        bea = crear_usuario_prueba("bea").cartera.id
+
+        id_transaccion = transferir(ana, bea, "1")
+        recargar_cartera(bea, "2")
+
+        transaccion = db.session.get(Transaccion, id_transaccion)
+        recarga = Recargar.query.one()
+        dias = {(fila.id_cartera, fila.fecha) for fila in SaldoDiario.query.all()}
+        assert dias == {(ana, transaccion.fecha.date()), (bea, recarga.fecha.date())}
+        # Fecha local escrita por la aplicación, no el CURRENT_TIMESTAMP (UTC) de SQLite
+        guardadas = db.session.execute(
+            db.text('SELECT fecha FROM "TRANSACCIONES" UNION ALL SELECT fecha FROM "RECARGAS"')
+        ).scalars()
+        assert all("." in fecha for fecha in guardadas)
+
+
+@pytest.mark.parametrize(
+    "origen, destino, cantidad, mensaje",
+    [
+        ("ana", "bea", "100.01", "Saldo insuficiente"),
+        ("ana", "ana", "1", "a ti mismo"),
+        ("ana", None, "1", "destino no existe"),
+        ("ana", "bea", "0", "mayor a 0"),
+    ],
+)
+def test_transferencia_rechazada_no_cambia_nada(app, origen, destino, cantidad, mensaje):
+    with app.app_context():
+        carteras = {
+            "ana": crear_usuario_prueba("ana", saldo=100).cartera.id,
+            "bea": crear_usuario_prueba("bea", saldo=5).cartera.id,
+            None: 9999,
+        }
+
+        with pytest.raises(TransferenciaRechazada, match=mensaje):
+            transferir(carteras[origen], carteras[destino], cantidad)
+
+        assert _saldo(carteras["ana"]) == Decimal("100")
+        assert _saldo(carteras["bea"]) == Decimal("5")
+        assert Transaccion.query.count() == 0
+
+
+def test_escritura_no_confirma_cambios_ajenos(app):
+    with app.app_context():
+        ana = crear_usuario_prueba("ana", saldo=100).cartera.id
+        bea = crear_usuario_prueba("bea").cartera.id
+
+        # Cambio sin confirmar, en memoria o ya enviado con flush
+        for enviar in (False, True):
+            db.session.add(Recargar(id_cartera=ana, cantidad=1))
+            if enviar:
+                db.session.flush()
+            with pytest.raises(RuntimeError, match="cambios sin confirmar"):
+                transferir(ana, bea, "10")
+            db.session.rollback()
+
+        assert _saldo(ana) == Decimal("100")
+        assert Recargar.query.count() == Transaccion.query.count() == 0
+
+
+def test_transferencias_concurrentes_conservan_el_saldo(app):
+    with app.app_context():
+        carteras = [crear_usuario_prueba(f"u{i}", saldo=50).cartera.id for i in range(4)]
+    rechazadas = []
+
+    def trabajador(n):
+        with app.app_context():
+            for i in range(50):
+                origen = carteras[(n + i) % 4]
+                destino = carteras[(n + i + 1) % 4]
+                try:
+                    transferir(origen, destino, "7")
+                except TransferenciaRechazada:
+                    rechazadas.append(origen)
+            db.session.remove()
+
+    hilos = [threading.Thread(target=trabajador, args=(n,)) for n in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    with app.app_context():
+        saldos = [_saldo(c) for c in carteras]
+        assert sum(saldos) == Decimal("200")
+        assert min(saldos) >= 0
+        assert Transaccion.query.count() == 8 * 50 - len(rechazadas)
+
+
+def test_recargas_concurrentes_no_pierden_ingresos(app):
+    with app.app_context():
+        cartera = crear_usuario_prueba("ana").cartera.id
+
+    def trabajador():
+        with app.app_context():
+            for _ in range(25):
+                recargar_cartera(cartera, "2")
+            db.session.remove()
+
+    hilos = [threading.Thread(target=trabajador) for _ in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    with app.app_context():
+        assert _saldo(cartera) == Decimal("400")
+
+
+def test_ruta_transferir(app, client):
+    with app.app_context():
+        crear_usuario_prueba("ana", saldo=20)
+        bea = crear_usuario_prueba("bea").cartera.id
+    iniciar_sesion(client, "ana")
+
+    respuesta = client.post(
+        "/transferir", data={"usu_transferir": "bea", "cantidad_transferir": "15"}
+    )
+    assert respuesta.status_code == 200
+    assert "Transferencia realizada con éxito" in respuesta.get_data(as_text=True)
+
+    respuesta = client.post(
+        "/transferir", data={"usu_transferir": "bea", "cantidad_transferir": "15"}
+    )
+    assert "Saldo insuficiente" in respuesta.get_data(as_text=True)
+
+    with app.app_context():
+        assert _saldo(bea) == Decimal("15")
+
+
+def test_transferir_lote_aplica_validas_e_informa(app):
+    with app.app_context():
+        ana = crear_usuario_prueba("ana", saldo=100).cartera.id
+        bea = crear_usuario_prueba("bea").cartera.id
+        cris = crear_usuario_prueba("cris").cartera.id
+
+        informe = transferir_lote(
+            ana,
+            [
+                ("bea", "10"),
+                ("cris@example.com", "20.50"),
+                ("bea", "5"),
+                ("nadie", "1"),
+                ("cris", "abc"),
+                ("ana", "1"),
+            ],
+        )
+
+        assert [f["estado"] for f in informe] == ["ok", "ok", "ok", "error", "error", "error"]
+        assert informe[3]["mensaje"] == "El destinatario no existe"
+        assert informe[4]["mensaje"] == "Cantidad inválida"
+        assert _saldo(ana) == Decimal("64.50")
+        assert _saldo(bea) == Decimal("15")
+        assert _saldo(cris) == Decimal("20.50")
+        assert Transaccion.query.count() == 3
+        resumen = {fila.id_cartera: fila for fila in SaldoDiario.query.all()}
+        assert resumen[ana].salidas == Decimal("35.50")
+        assert resumen[bea].entradas == Decimal("15")
+
+
+def test_transferir_lote_sin_fondos_no_aplica_nada(app):
+    with app.app_context():
+        ana = crear_usuario_prueba("ana", saldo=10).cartera.id
+        crear_usuario_prueba("bea")
+
+        informe = transferir_lote(ana, [("bea", "6"), ("bea", "6")])
+
+        assert all(f["estado"] == "error" for f in informe)
+        assert "Saldo insuficiente" in informe[0]["mensaje"]
+        assert _saldo(ana) == Decimal("10")
+        assert Transaccion.query.count() == 0
+
+
+def test_ruta_transferir_lote_csv_y_json(app, client):
+    with app.app_context():
+        crear_usuario_prueba("ana", saldo=100)
+        bea = crear_usuario_prueba("bea").cartera.id
+    iniciar_sesion(client, "ana")
+
+    respuesta = client.post(
+        "/api/transferir-lote",
+        data="destinatario,cantidad\nbea,10\nnadie,3\n",
+        content_type="text/csv",
+    )
+    datos = respuesta.get_json()
+    assert (datos["correctas"], datos["erroneas"], datos["total"]) == (1, 1, "10.00")
+
+    respuesta = client.post(
+        "/api/transferir-lote", json=[{"destinatario": "bea@example.com", "cantidad": 5}]
+    )
+    assert respuesta.get_json()["correctas"] == 1
+
+    assert client.post("/api/transferir-lote", json={"no": "lista"}).status_code == 400
+
+    with app.app_context():
+        assert _saldo(bea) == Decimal("15")
+
+
+def test_ruta_transferir_lote_informa_lo_movido(app, client):
+    with app.app_context():
+        ana = crear_usuario_prueba("ana", saldo=100).cartera.id
+        crear_usuario_prueba("bea")
+    iniciar_sesion(client, "ana")
+
+    # 0.005 se redondea a 0.01: el total es lo que sale de la cartera
+    datos = client.post(
+        "/api/transferir-lote", data="bea,0.005\nbea,1.004\n", content_type="text/csv"
+    ).get_json()
+
+    assert [f["importe"] for f in datos["lineas"]] == ["0.01", "1.00"]
+    assert datos["total"] == "1.01"
+    with app.app_context():
+        assert _saldo(ana) == Decimal("98.99")
@@ -0,0 +1,58 @@
+"""El usuario actual se resuelve una vez por petición y sin cargas perezosas."""
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import InvalidRequestError
+
+from conftest import crear_usuario_prueba, iniciar_sesion
+from database import db
+from models import Usuario
+
+PAGINAS = (
+    "/",
+    "/historial",
+    "/transferir",
+    "/ingresar",
+    "/configuracion/cuenta",
+    "/configuracion/opciones-de-pago",
+    "/configuracion/mis-tarjetas",
+)
+
+
+@pytest.fixture
+def consultas_usuarios(app):
+    """Cuenta las SELECT que tocan USUARIOS durante el test."""
+
+    contador = []
+
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("SELECT") and 'FROM "USUARIOS"' in statement:
+            contador.append(statement)
+
+    with app.app_context():
+        motor = db.engine
+    event.listen(motor, "before_cursor_execute", _antes)
+    yield contador
+    event.remove(motor, "before_cursor_execute", _antes)
+
+
+@pytest.mark.parametrize("url", PAGINAS)
+def test_usuario_actual_una_consulta_por_peticion(app, client, consultas_usuarios, url):
+    with app.app_context():
+        crear_usuario_prueba("ana", saldo=10)
+    iniciar_sesion(client, "ana")
+    consultas_usuarios.clear()
+
+    # Sin cargas perezosas: el modo estricto convertiría cualquiera en un error 500
+    assert client.get(url).status_code == 200
+    assert len(consultas_usuarios) == 1
+
+
+def test_modo_estricto_detecta_carga_perezosa(app):
+    with app.app_context():
+        crear_usuario_prueba("ana")
+        db.session.expunge_all()
+
+        usuario = Usuario.query.filter_by(usuario="ana").one()
+        with pytest.raises(InvalidRequestError):
+            usuario.cartera